@@ -0,0 +1,393 @@
+"""CLI de mesure des requetes du chemin d'estimation (latence, plans)."""
+
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import click
+
+# Ajouter le projet au path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import text
+
+from src.db import get_engine
+from src.transform.staging_to_core import cluster_core_transactions
+from src.estimation.comparable_cache import candidate_cache, level1_candidates
+from src.estimation.comparables import find_comparables
+from src.estimation.queries import (
+    COMPARABLES_ZONES,
+    FALLBACK_LEVELS,
+    ZONE_STATS,
+    explain_timings,
+    prepare,
+    read_df,
+    surface_band,
+)
+from src.estimation.zone_config import ZoneConfig
+
+# Points de reference (zones denses et moins denses des departements charges)
+SAMPLE_POINTS = [
+    {"name": "Paris 15e", "lat": 48.8417, "lon": 2.2994, "code_commune": "75115"},
+    {"name": "Boulogne-Billancourt", "lat": 48.8353, "lon": 2.2400, "code_commune": "92012"},
+    {"name": "Saint-Denis", "lat": 48.9362, "lon": 2.3574, "code_commune": "93066"},
+    {"name": "Versailles", "lat": 48.8049, "lon": 2.1204, "code_commune": "78646"},
+    {"name": "Marseille 1er", "lat": 43.2965, "lon": 5.3698, "code_commune": "13201"},
+]
+
+
+# Parametres declares par les requetes mesurees : aucune cle morte dans _params
+_QUERY_PARAMS = {
+    name
+    for query in (COMPARABLES_ZONES, *(lvl["query"] for lvl in FALLBACK_LEVELS), ZONE_STATS)
+    for name in query.param_names
+}
+
+
+def _params(point: dict, type_bien: str, max_comp: int) -> dict:
+    params = {
+        "lat": point["lat"],
+        "lon": point["lon"],
+        "code_commune": point["code_commune"],
+        "code_departement": point["code_commune"][:2],
+        "type_bien": type_bien,
+        "radius_m": ZoneConfig().radius_3_km * 1000,
+        "surface_min": 25,
+        "surface_max": 100 if type_bien == "appartement" else 200,
+        "max_comp": max_comp,
+    }
+    assert params.keys() == _QUERY_PARAMS, params.keys() ^ _QUERY_PARAMS
+    return params
+
+
+# Fallback departement avant restructuration (distance dans la liste SELECT,
+# calculee pour chaque ligne triee si le plan trie avant le LIMIT)
+LEGACY_DEPARTEMENT_SQL = """
+    SELECT t.id_mutation, t.date_mutation, t.valeur_fonciere, t.type_bien,
+           t.surface, t.nb_pieces, t.prix_m2,
+           t.code_commune, t.nom_commune, t.code_departement,
+           t.adresse, t.code_postal, t.latitude, t.longitude,
+           CASE WHEN t.geom IS NOT NULL THEN
+               ST_Distance(t.geom::geography, ST_SetSRID(ST_MakePoint(:lon, :lat), 4326)::geography)
+           ELSE NULL END AS distance_m
+    FROM core.transactions t
+    WHERE t.type_bien = :type_bien
+      AND NOT t.is_outlier
+      AND t.code_departement = :code_departement
+      AND t.date_mutation >= CURRENT_DATE - INTERVAL '24 months'
+      AND t.surface BETWEEN :surface_min AND :surface_max
+    ORDER BY t.date_mutation DESC
+    LIMIT :max_comp
+"""
+
+
+def _plan_nodes(plan: dict) -> list[dict]:
+    """Aplatit un plan EXPLAIN (FORMAT JSON) en liste de noeuds."""
+    nodes = [plan]
+    for child in plan.get("Plans", []):
+        nodes.extend(_plan_nodes(child))
+    return nodes
+
+
+def _summarize_plan(conn, sql: str, params: dict) -> str:
+    raw = conn.execute(text(f"EXPLAIN (FORMAT JSON) {sql}"), params).scalar()
+    plan = (raw if isinstance(raw, list) else json.loads(raw))[0]["Plan"]
+    parts = []
+    for node in _plan_nodes(plan):
+        label = node["Node Type"]
+        if node.get("Index Name"):
+            label += f" ({node['Index Name']})"
+        parts.append(label)
+    return " > ".join(parts)
+
+
+def _buffers(conn, sql: str, params: dict) -> dict:
+    """Blocs partages lus depuis le cache (hit) et depuis le disque/OS (read)."""
+    raw = conn.execute(text(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql}"), params).scalar()
+    plan = (raw if isinstance(raw, list) else json.loads(raw))[0]["Plan"]
+    return {"hit": plan.get("Shared Hit Blocks", 0), "read": plan.get("Shared Read Blocks", 0)}
+
+
+def _measure_buffers(conn, type_bien: str, max_comp: int) -> dict:
+    """Buffers par (point, requete) des comparables (niveau 1 + fallbacks)."""
+    queries = [COMPARABLES_ZONES, *(lvl["query"] for lvl in FALLBACK_LEVELS)]
+    results = {}
+    for point in SAMPLE_POINTS:
+        params = _params(point, type_bien, max_comp)
+        for query in queries:
+            results[(point["name"], query.name)] = _buffers(conn, query.sql, params)
+    return results
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+@click.group()
+def cli():
+    """Benchmarks du chemin d'estimation (necessite une base chargee)."""
+    pass
+
+
+@cli.command()
+@click.option("--type-bien", default="appartement", type=click.Choice(["appartement", "maison"]))
+@click.option("--runs", default=20, help="Executions par requete (apres 1 warm-up).")
+@click.option("--max-comp", default=500, help="LIMIT des requetes.")
+def fallbacks(type_bien, runs, max_comp):
+    """Latence p50/p95 des fallbacks niveaux 2-4 et plan choisi."""
+    engine = get_engine()
+    with engine.connect() as conn:
+        for point in SAMPLE_POINTS:
+            click.echo(f"\n=== {point['name']} ({point['code_commune']}) ===")
+            params = _params(point, type_bien, max_comp)
+            for lvl in FALLBACK_LEVELS:
+                sql = lvl["query"].sql
+                conn.execute(text(sql), params).fetchall()  # warm-up (cache)
+
+                timings = []
+                n_rows = 0
+                for _ in range(runs):
+                    start = time.perf_counter()
+                    n_rows = len(conn.execute(text(sql), params).fetchall())
+                    timings.append((time.perf_counter() - start) * 1000)
+
+                click.echo(
+                    f"  niveau {lvl['level']} : {n_rows:>4} lignes | "
+                    f"p50 {statistics.median(timings):7.2f} ms | "
+                    f"p95 {_percentile(timings, 95):7.2f} ms"
+                )
+                click.echo(f"    plan : {_summarize_plan(conn, sql, params)}")
+
+
+@cli.command()
+@click.option("--type-bien", default="appartement", type=click.Choice(["appartement", "maison"]))
+@click.option("--runs", default=20, help="Executions par requete (apres 1 warm-up).")
+@click.option("--max-comp", default=500, help="LIMIT des requetes.")
+@click.option("--departement", "departements", multiple=True, default=("75", "92"),
+              help="Departements denses a mesurer (repetable).")
+def distance(type_bien, runs, max_comp, departements):
+    """Fallback departement : distance calculee avant vs apres le LIMIT."""
+    query = next(lvl["query"] for lvl in FALLBACK_LEVELS if lvl["level"] == 4)
+    points = [p for p in SAMPLE_POINTS if p["code_commune"][:2] in departements]
+    engine = get_engine()
+    with engine.connect() as conn:
+        for point in points:
+            click.echo(f"\n=== {point['name']} (departement {point['code_commune'][:2]}) ===")
+            params = _params(point, type_bien, max_comp)
+            for label, sql in (("avant", LEGACY_DEPARTEMENT_SQL), ("apres", query.sql)):
+                conn.execute(text(sql), params).fetchall()  # warm-up (cache)
+                samples = []
+                for _ in range(runs):
+                    raw = conn.execute(text(f"EXPLAIN (ANALYZE, FORMAT JSON) {sql}"), params).scalar()
+                    samples.append((raw if isinstance(raw, list) else json.loads(raw))[0]["Execution Time"])
+                click.echo(
+                    f"  {label} | p50 {statistics.median(samples):7.2f} ms | "
+                    f"p95 {_percentile(samples, 95):7.2f} ms"
+                )
+                click.echo(f"    plan : {_summarize_plan(conn, sql, params)}")
+
+
+@cli.command()
+@click.option("--type-bien", default="appartement", type=click.Choice(["appartement", "maison"]))
+@click.option("--runs", default=10, help="Executions par requete (apres 5 warm-ups).")
+@click.option("--max-comp", default=500, help="LIMIT des requetes.")
+def plans(type_bien, runs, max_comp):
+    """Temps de planification vs execution : SQL texte vs EXECUTE prepare."""
+    queries = [COMPARABLES_ZONES, *(lvl["query"] for lvl in FALLBACK_LEVELS), ZONE_STATS]
+    engine = get_engine()
+    with engine.connect() as conn:
+        for point in SAMPLE_POINTS:
+            click.echo(f"\n=== {point['name']} ({point['code_commune']}) ===")
+            params = _params(point, type_bien, max_comp)
+            for query in queries:
+                prepare(conn, query)
+                # PostgreSQL bascule sur un plan generique apres 5 executions
+                for _ in range(5):
+                    explain_timings(conn, query, params, prepared=True)
+
+                for prepared in (False, True):
+                    samples = [explain_timings(conn, query, params, prepared) for _ in range(runs)]
+                    plan_ms = statistics.median(t["planning_ms"] for t in samples)
+                    exec_ms = statistics.median(t["execution_ms"] for t in samples)
+                    mode = "prepare" if prepared else "texte  "
+                    click.echo(
+                        f"  {query.name:<34} {mode} | "
+                        f"planning {plan_ms:7.3f} ms | execution {exec_ms:7.3f} ms"
+                    )
+
+
+
+@cli.command()
+@click.option("--type-bien", default="appartement", type=click.Choice(["appartement", "maison"]))
+@click.option("--max-comp", default=500, help="LIMIT des requetes.")
+@click.option("--cluster", "do_cluster", is_flag=True,
+              help="Mesure, reordonne la table (CLUSTER), puis mesure a nouveau.")
+def buffers(type_bien, max_comp, do_cluster):
+    """Buffers partages (hit/read) par requete de comparables, avant/apres cluster."""
+    engine = get_engine()
+    with engine.connect() as conn:
+        before = _measure_buffers(conn, type_bien, max_comp)
+    after = None
+    if do_cluster:
+        cluster_core_transactions()
+        with engine.connect() as conn:
+            after = _measure_buffers(conn, type_bien, max_comp)
+
+    for (point_name, query_name), b in before.items():
+        line = f"  {point_name:<22} {query_name:<34} hit {b['hit']:>7} | read {b['read']:>7}"
+        if after is not None:
+            a = after[(point_name, query_name)]
+            total_b, total_a = b["hit"] + b["read"], a["hit"] + a["read"]
+            line += (
+                f"  ->  hit {a['hit']:>7} | read {a['read']:>7}"
+                f"  ({100 * (total_a - total_b) / max(total_b, 1):+.0f}% blocs)"
+            )
+        click.echo(line)
+
+
+@cli.command()
+@click.option("--type-bien", default="appartement", type=click.Choice(["appartement", "maison"]))
+@click.option("--requests", "n_requests", default=100, help="Recherches par point de reference.")
+@click.option("--spread-m", default=300.0, help="Dispersion des recherches autour du point (m).")
+@click.option("--max-comp", default=500, help="LIMIT des requetes.")
+def cache(type_bien, n_requests, spread_m, max_comp):
+    """Cache de cellules : latence et taux de hit sur des recherches voisines.
+
+    Compare chaque recherche servie par le cache a la requete directe.
+    """
+    rng = random.Random(42)
+    engine = get_engine()
+    with engine.connect() as conn:
+        for point in SAMPLE_POINTS:
+            candidate_cache.reset()
+            direct_ms, cached_ms, mismatches = [], [], 0
+            for _ in range(n_requests):
+                surface = rng.uniform(30, 90)
+                surface_min, surface_max = surface_band(surface)
+                params = {
+                    **_params(point, type_bien, max_comp),
+                    "lat": point["lat"] + rng.uniform(-1, 1) * spread_m / 111_320,
+                    "lon": point["lon"] + rng.uniform(-1, 1) * spread_m / 73_000,
+                    "surface": surface,
+                    "surface_min": surface_min,
+                    "surface_max": surface_max,
+                }
+                start = time.perf_counter()
+                direct = read_df(COMPARABLES_ZONES, params, conn)
+                direct_ms.append((time.perf_counter() - start) * 1000)
+
+                start = time.perf_counter()
+                cached = level1_candidates(params, conn)
+                cached_ms.append((time.perf_counter() - start) * 1000)
+                mismatches += set(direct["id_mutation"]) != set(cached["id_mutation"])
+
+            stats = candidate_cache.stats()
+            click.echo(
+                f"  {point['name']:<22} direct p50 {statistics.median(direct_ms):7.2f} ms | "
+                f"cache p50 {statistics.median(cached_ms):7.2f} ms | "
+                f"hit ratio {stats['hit_ratio']} | {stats['entries']} cellules, "
+                f"{stats['bytes'] / 1e6:.1f} Mo | ecarts {mismatches}"
+            )
+
+
+@cli.command()
+@click.option("--type-bien", default="maison", type=click.Choice(["appartement", "maison"]))
+@click.option("--runs", default=10, help="Recherches par point et par mode (apres 1 warm-up).")
+@click.option("--surface", default=120.0, help="Surface du bien recherche.")
+def knn(type_bien, runs, surface):
+    """find_comparables : rayon fixe + fallbacks vs plus proches voisins (KNN)."""
+    max_bytes, candidate_cache.max_bytes = candidate_cache.max_bytes, 0  # sans cache de cellules
+    try:
+        for point in SAMPLE_POINTS:
+            click.echo(f"\n=== {point['name']} ({point['code_commune']}) ===")
+            for mode in ("radius", "knn"):
+                def _search():
+                    return find_comparables(
+                        point["lat"], point["lon"], point["code_commune"], type_bien,
+                        surface=surface, mode=mode,
+                    )
+                search = _search()
+                timings = []
+                for _ in range(runs):
+                    start = time.perf_counter()
+                    _search()
+                    timings.append((time.perf_counter() - start) * 1000)
+                click.echo(
+                    f"  {mode:<6} niveau {search.level} | {len(search.comparables):>4} comparables | "
+                    f"p50 {statistics.median(timings):7.2f} ms | {search.level_desc}"
+                )
+    finally:
+        candidate_cache.max_bytes = max_bytes
+
+
+def _wait_for(url: str, start: float, timeout: float) -> float:
+    """Secondes (depuis start) avant que url reponde 200."""
+    import requests
+    while time.perf_counter() - start < timeout:
+        try:
+            if requests.get(url, timeout=1).status_code == 200:
+                return time.perf_counter() - start
+        except requests.ConnectionError:
+            pass
+        time.sleep(0.05)
+    raise click.ClickException(f"{url} indisponible apres {timeout}s")
+
+
+@cli.command()
+@click.option("--runs", default=5, help="Imports a froid de src.api.main (processus neufs).")
+@click.option("--port", default=8765, help="Port de l'API lancee pour la mesure.")
+@click.option("--timeout", default=120.0, help="Attente max de la sonde de disponibilite (s).")
+@click.option("--address", default="12 Rue de Rivoli, 75004 Paris", help="Adresse de la premiere estimation.")
+def startup(runs, port, timeout, address):
+    """Demarrage a froid de l'API : import, sondes, premiere estimation (avec / sans warm-up)."""
+    import requests
+
+    root = Path(__file__).resolve().parent.parent
+    code = "import time; t = time.perf_counter(); import src.api.main; print(time.perf_counter() - t)"
+    imports_ms = [
+        float(subprocess.run(
+            [sys.executable, "-c", code], cwd=root, capture_output=True, text=True, check=True,
+        ).stdout) * 1000
+        for _ in range(runs)
+    ]
+    click.echo(f"import src.api.main : p50 {statistics.median(imports_ms):.0f} ms ({runs} processus)")
+
+    base = f"http://127.0.0.1:{port}"
+    payload = {"address": address, "property_type": "appartement", "surface": 50}
+    for warm in ("true", "false"):
+        start = time.perf_counter()
+        proc = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "src.api.main:app", "--port", str(port)],
+            cwd=root, env={**os.environ, "API_WARMUP": warm},
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        try:
+            live_s = _wait_for(f"{base}/api/v1/health/live", start, timeout)
+            ready_s = _wait_for(f"{base}/api/v1/health/ready", start, timeout)
+            state = requests.get(f"{base}/api/v1/health/ready", timeout=5).json()["warmup"]
+            latencies = []
+            for _ in range(2):
+                t0 = time.perf_counter()
+                requests.post(f"{base}/api/v1/estimate", json=payload, timeout=60).raise_for_status()
+                latencies.append((time.perf_counter() - t0) * 1000)
+        finally:
+            proc.terminate()
+            proc.wait()
+        click.echo(
+            f"\nAPI_WARMUP={warm} : vivante {live_s:.2f} s | prete {ready_s:.2f} s | "
+            f"1re estimation {latencies[0]:.0f} ms | 2e {latencies[1]:.0f} ms"
+        )
+        if state["steps"]:
+            click.echo(f"  warm-up {state['total_s']} s : {state['steps']}"
+                       + (f" | echecs {state['errors']}" if state["errors"] else ""))
+
+
+if __name__ == "__main__":
+    cli()
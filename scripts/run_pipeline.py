@@ -9,23 +9,31 @@ import click
 # Ajouter le projet au path
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
 
-from src.db import check_connection
-from src.ingestion.metadata import init_ingestion_log, log_start, log_finish
+from src.config import DEPARTEMENTS_DVF
+from src.db import check_connection, set_pool_profile
+from src.ingestion.metadata import init_ingestion_log, log_start, log_finish, last_failed_run
 from src.ingestion.download import download_dvf_etalab
 from src.ingestion.load_csv import (
     create_staging_table,
     load_and_transform,
     detect_outliers,
 )
-from src.transform.staging_to_core import create_core_tables
+from src.ingestion.national import run_national, save_report
+from src.transform.staging_to_core import (
+    create_core_tables,
+    create_core_indexes,
+    cluster_core_transactions,
+    vacuum_analyze_core,
+)
 from src.transform.core_to_mart import refresh_marts
 from src.transform.quality import run_quality_checks
+from src.pipeline import PIPELINE_STEP, build_etl_steps, run_dag
 
 
 @click.group()
 def cli():
     """STTA-DVF Pipeline ETL."""
-    pass
+    set_pool_profile("pipeline")
 
 
 @cli.command()
@@ -39,7 +47,13 @@ def check():
 
 
 @cli.command()
-def init_db():
+@click.option(
+    "--partitioning",
+    type=click.Choice(["none", "departement", "departement_annee"]),
+    default=None,
+    help="Layout de core.transactions (defaut: CORE_PARTITIONING).",
+)
+def init_db(partitioning):
     """Cree les schemas et tables (staging + core + mart)."""
     from src.db import get_engine
     from sqlalchemy import text
@@ -53,7 +67,7 @@ def init_db():
     click.echo("Schemas crees.")
 
     create_staging_table()
-    create_core_tables()
+    create_core_tables(partitioning)
     click.echo("Tables staging + core creees.")
 
     from src.transform.core_to_mart import create_mart_tables
@@ -68,17 +82,21 @@ def init_db():
 @click.option("--year", type=int, default=None, help="Annee specifique (ex: 2024).")
 @click.option("--dep", default=None, help="Departement specifique (ex: 75).")
 @click.option("--force", is_flag=True, help="Re-telecharger meme si existant.")
-def download(year, dep, force):
-    """Telecharge les CSV DVF Etalab."""
+@click.option("--concurrency", type=int, default=None, help="Telechargements simultanes (defaut: DOWNLOAD_CONCURRENCY).")
+def download(year, dep, force, concurrency):
+    """Telecharge les CSV DVF Etalab (reprise des .part, revalidation ETag)."""
     years = [year] if year else None
     departements = [dep] if dep else None
-    download_dvf_etalab(years=years, departements=departements, force=force)
+    download_dvf_etalab(years=years, departements=departements, force=force, concurrency=concurrency)
 
 
 @cli.command()
 @click.option("--year", type=int, default=None, help="Annee specifique (ex: 2024).")
 @click.option("--dep", default=None, help="Departement specifique (ex: 75).")
-def load(year, dep):
+@click.option("--force", is_flag=True, help="Recharger les departement x annee deja presents.")
+@click.option("--prefilter/--no-prefilter", default=None,
+              help="Filtrer les lots cote client avant staging (defaut: LOAD_PREFILTER).")
+def load(year, dep, force, prefilter):
     """Charge les CSV dans staging puis transforme vers core."""
     years = [year] if year else None
     departements = [dep] if dep else None
@@ -87,7 +105,7 @@ def load(year, dep):
     run_id = str(uuid.uuid4())[:8]
     log_id = log_start(run_id, "load_and_transform")
 
-    load_and_transform(years=years, departements=departements)
+    load_and_transform(years=years, departements=departements, force=force, prefilter=prefilter)
 
     log_finish(log_id, "success")
 
@@ -96,6 +114,21 @@ def load(year, dep):
 def outliers():
     """Detecte les outliers dans core.transactions."""
     detect_outliers()
+    vacuum_analyze_core()
+
+
+@cli.command()
+def indexes():
+    """Applique les index de core.transactions puis VACUUM ANALYZE."""
+    create_core_indexes()
+    vacuum_analyze_core()
+
+
+@cli.command()
+def cluster():
+    """Reordonne core.transactions par (type_bien, geohash) (maintenance)."""
+    click.echo("Clustering spatial de core.transactions (table verrouillee)...")
+    cluster_core_transactions()
 
 
 @cli.command()
@@ -106,21 +139,74 @@ def mart():
 
 
 @cli.command()
-def quality():
+@click.option("--sample", type=float, default=None, help="Rapport rapide sur un echantillon (pourcentage, TABLESAMPLE).")
+def quality(sample):
     """Execute les controles qualite."""
     click.echo("Controles qualite...")
-    run_quality_checks()
+    run_quality_checks(sample_pct=sample)
 
 
 @cli.command()
-@click.option("--year", type=int, default=None, help="Annee specifique.")
-@click.option("--dep", default=None, help="Departement specifique.")
-def run_all(year, dep):
-    """Execute le pipeline complet : init -> download -> load -> outliers -> mart -> quality."""
+@click.option("--year", "years", type=int, multiple=True, help="Annee (repetable, defaut: DVF_YEARS).")
+@click.option("--dep", "deps", multiple=True,
+              help='Departement (repetable, "all" pour tous les departements DVF, defaut: DVF_DEPARTEMENTS).')
+@click.option("--force", is_flag=True, help="Recharger les unites deja inscrites au registre.")
+@click.option("--prefilter/--no-prefilter", default=True, help="Filtrer les lots cote client avant staging.")
+@click.option("--download/--no-download", default=True, help="Telecharger / revalider les fichiers (sinon : landing seul).")
+@click.option("--post/--no-post", "post_load", default=True, help="Outliers, VACUUM ANALYZE et marts apres chargement.")
+@click.option("--concurrency", type=int, default=None, help="Telechargements simultanes (defaut: DOWNLOAD_CONCURRENCY).")
+@click.option("--prefetch", type=int, default=None, help="Unites telechargees d'avance (defaut: NATIONAL_PREFETCH_UNITS).")
+@click.option("--report", "report_path", type=click.Path(path_type=Path), default=None,
+              help="Ecrire le bilan (debits, durees par unite) en JSON.")
+def national(years, deps, force, prefilter, download, post_load, concurrency, prefetch, report_path):
+    """Ingestion nationale : telechargement et chargement par departement x annee.
+
+    Les unites en echec sont retentees independamment ; les unites deja
+    chargees (registre staging.ingestion_files) sont sautees.
+    """
+    departements = list(deps) or None
+    if departements and "all" in departements:
+        departements = DEPARTEMENTS_DVF
+
+    init_ingestion_log()
     run_id = str(uuid.uuid4())[:8]
+    log_id = log_start(run_id, "national", departements=departements)
+
+    try:
+        report = run_national(
+            years=list(years) or None, departements=departements, force=force,
+            prefilter=prefilter, download=download, post_load=post_load,
+            concurrency=concurrency, prefetch=prefetch,
+        )
+    except Exception as e:
+        log_finish(log_id, "failed", notes=f"{type(e).__name__}: {e}")
+        raise
+
+    report.print_summary()
+    if report_path:
+        save_report(report, report_path)
+        click.echo(f"Bilan ecrit dans {report_path}")
+    failed = report.counts().get("failed", 0)
+    log_finish(
+        log_id, "failed" if failed else "success",
+        row_count=report.totals()["rows_inserted"],
+        notes=f"{failed} unites en echec" if failed else None,
+    )
+    if failed:
+        sys.exit(1)
 
-    # Etape 0 : Init DB
-    click.echo("\n=== ETAPE 0 : Initialisation DB ===")
+
+@cli.command()
+@click.option("--year", type=int, default=None, help="Annee specifique.")
+@click.option("--dep", default=None, help="Departement specifique.")
+@click.option("--force", is_flag=True, help="Executer toutes les etapes, meme a entrees inchangees.")
+@click.option("--resume", is_flag=True, help="Reprendre le dernier run en echec a l'etape en echec.")
+def run_all(year, dep, force, resume):
+    """Execute le pipeline complet : init -> download -> load -> outliers/cluster -> mart -> quality.
+
+    Les etapes dont les entrees (manifest, registre des fichiers charges, SQL) n'ont pas
+    change depuis leur dernier succes sont sautees.
+    """
     from src.db import get_engine
     from sqlalchemy import text
     engine = get_engine()
@@ -129,37 +215,32 @@ def run_all(year, dep):
         conn.execute(text("CREATE SCHEMA IF NOT EXISTS core"))
         conn.execute(text("CREATE SCHEMA IF NOT EXISTS mart"))
         conn.execute(text("CREATE EXTENSION IF NOT EXISTS postgis"))
-
     init_ingestion_log()
-    log_id = log_start(run_id, "full_pipeline")
 
-    create_staging_table()
-    create_core_tables()
+    run_id = None
+    if resume:
+        run_id = last_failed_run(PIPELINE_STEP)
+        if run_id is None:
+            click.echo("Aucun run en echec a reprendre.")
+            return
+        click.echo(f"Reprise du run {run_id}")
+    run_id = run_id or str(uuid.uuid4())[:8]
+    log_id = log_start(run_id, PIPELINE_STEP)
 
-    # Etape 1 : Download
-    click.echo("\n=== ETAPE 1 : Telechargement ===")
     years = [year] if year else None
     departements = [dep] if dep else None
-    download_dvf_etalab(years=years, departements=departements)
-
-    # Etape 2 : Load + Transform
-    click.echo("\n=== ETAPE 2 : Chargement + Transformation ===")
-    load_and_transform(years=years, departements=departements)
-
-    # Etape 3 : Outliers
-    click.echo("\n=== ETAPE 3 : Detection outliers ===")
-    detect_outliers()
-
-    # Etape 4 : Mart
-    click.echo("\n=== ETAPE 4 : Marts ===")
-    refresh_marts()
-
-    # Etape 5 : Quality
-    click.echo("\n=== ETAPE 5 : Qualite ===")
-    run_quality_checks()
+    steps = build_etl_steps(years=years, departements=departements)
+    try:
+        outcomes = run_dag(steps, run_id, force=force, resume=resume)
+    except Exception as e:
+        log_finish(log_id, "failed", notes=f"{type(e).__name__}: {e}")
+        click.echo(f"\n=== Pipeline en echec (run {run_id}) : relancer avec --resume ===")
+        raise
 
     log_finish(log_id, "success")
     click.echo("\n=== Pipeline termine ===")
+    for o in outcomes:
+        click.echo(f"  {o.name:<10} {o.status:<8} {o.duration_s:6.1f}s")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,24 @@
+-- ============================================================
+-- Ordre physique de core.transactions : type_bien puis geohash
+-- ============================================================
+-- Les lignes arrivent dans l'ordre des fichiers (annee puis departement) :
+-- une recherche par rayon lit des pages dispersees dans toute la table.
+-- Le geohash (courbe de Morton sur lat/lon) rapproche physiquement les
+-- points voisins, ce qui reduit les pages lues par le GIST.
+--
+-- CLUSTER prend un verrou ACCESS EXCLUSIVE et reecrit la table :
+-- etape de maintenance, a relancer apres les gros chargements.
+-- Execute hors transaction (requis pour CLUSTER sur table partitionnee).
+-- CLUSTER sur une table partitionnee demande PostgreSQL 15+.
+-- La colonne geo_key des bases anterieures est ajoutee par migrate_core_tables().
+
+UPDATE core.transactions
+SET geo_key = ST_GeoHash(geom, 12)
+WHERE geo_key IS NULL AND geom IS NOT NULL;
+
+-- Index btree temporaire : CLUSTER exige un index pour l'ordre de tri
+CREATE INDEX IF NOT EXISTS idx_tx_cluster ON core.transactions (type_bien, geo_key);
+
+CLUSTER core.transactions USING idx_tx_cluster;
+
+DROP INDEX IF EXISTS core.idx_tx_cluster;
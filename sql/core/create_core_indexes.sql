@@ -0,0 +1,47 @@
+-- ============================================================
+-- Index de core.transactions
+-- Communs aux deux layouts (table simple ou partitionnee) :
+-- sur une table partitionnee, chaque index declare sur le parent
+-- est cree automatiquement sur chaque partition (GIST compris).
+-- ============================================================
+
+-- Remplaces par les index couvrants idx_tx_cmp_* ci-dessous
+DROP INDEX IF EXISTS core.idx_tx_commune_type;
+DROP INDEX IF EXISTS core.idx_tx_dept_type;
+DROP INDEX IF EXISTS core.idx_tx_not_outlier;
+
+CREATE INDEX IF NOT EXISTS idx_tx_date ON core.transactions (date_mutation);
+CREATE INDEX IF NOT EXISTS idx_tx_prix_m2 ON core.transactions (prix_m2);
+CREATE INDEX IF NOT EXISTS idx_tx_geom ON core.transactions USING GIST (geom);
+
+-- BRIN sur date_mutation (min/max par bloc de pages, quelques Ko) : pertinent
+-- tant que l'ordre physique suit la date (ordre de chargement, feuilles annee
+-- du layout departement_annee). Aucune requete ne filtre sur geo_key : pas
+-- d'index dessus (la colonne ne sert qu'a l'ordre physique de cluster_core.sql).
+DROP INDEX IF EXISTS core.idx_tx_geo_key_brin;
+CREATE INDEX IF NOT EXISTS idx_tx_date_brin
+    ON core.transactions USING BRIN (date_mutation) WITH (pages_per_range = 32);
+
+-- Fallbacks niveaux 2-4 de find_comparables :
+--   WHERE type_bien = ? AND NOT is_outlier AND code_commune|code_departement = ?
+--     AND date_mutation >= ? [AND surface BETWEEN ? AND ?]
+--   ORDER BY date_mutation DESC LIMIT ?
+-- Cle = egalites puis date dans l'ordre du ORDER BY (pas de tri),
+-- INCLUDE = colonnes selectionnees (index-only scan apres VACUUM).
+CREATE INDEX IF NOT EXISTS idx_tx_cmp_commune
+    ON core.transactions (code_commune, type_bien, date_mutation DESC)
+    INCLUDE (
+        surface, prix_m2, valeur_fonciere, nb_pieces, id_mutation,
+        nom_commune, code_departement, adresse, code_postal,
+        latitude, longitude, geom
+    )
+    WHERE NOT is_outlier;
+
+CREATE INDEX IF NOT EXISTS idx_tx_cmp_departement
+    ON core.transactions (code_departement, type_bien, date_mutation DESC)
+    INCLUDE (
+        surface, prix_m2, valeur_fonciere, nb_pieces, id_mutation,
+        code_commune, nom_commune, adresse, code_postal,
+        latitude, longitude, geom
+    )
+    WHERE NOT is_outlier;
@@ -28,6 +28,7 @@ CREATE TABLE core.transactions (
     latitude            NUMERIC(10,7),
     longitude           NUMERIC(10,7),
     geom                GEOMETRY(Point, 4326),
+    geo_key             TEXT,               -- geohash du point (ordre physique, cf. cluster_core.sql)
 
     -- Calcule
     prix_m2             NUMERIC(10,2) NOT NULL,
@@ -39,10 +40,3 @@ CREATE TABLE core.transactions (
     CONSTRAINT chk_surface_pos CHECK (surface > 0),
     CONSTRAINT chk_valeur_pos CHECK (valeur_fonciere > 0)
 );
-
-CREATE INDEX IF NOT EXISTS idx_tx_commune_type ON core.transactions (code_commune, type_bien);
-CREATE INDEX IF NOT EXISTS idx_tx_dept_type ON core.transactions (code_departement, type_bien);
-CREATE INDEX IF NOT EXISTS idx_tx_date ON core.transactions (date_mutation);
-CREATE INDEX IF NOT EXISTS idx_tx_prix_m2 ON core.transactions (prix_m2);
-CREATE INDEX IF NOT EXISTS idx_tx_geom ON core.transactions USING GIST (geom);
-CREATE INDEX IF NOT EXISTS idx_tx_not_outlier ON core.transactions (is_outlier) WHERE NOT is_outlier;
@@ -0,0 +1,57 @@
+-- ============================================================
+-- Layout partitionne de core.transactions
+-- LIST (code_departement), avec sous-partitions LIST (annee)
+-- optionnelles (CORE_PARTITIONING=departement_annee).
+--
+-- Les partitions par departement (et par annee) sont creees a la
+-- demande par src.transform.staging_to_core.ensure_core_partitions.
+-- La partition DEFAULT recoit les departements non prevus.
+-- ============================================================
+
+CREATE SCHEMA IF NOT EXISTS core;
+
+DROP TABLE IF EXISTS core.transactions CASCADE;
+
+CREATE TABLE core.transactions (
+    id                  BIGSERIAL,
+    id_mutation         TEXT NOT NULL,
+    date_mutation       DATE NOT NULL,
+    annee               INTEGER NOT NULL,
+    mois                INTEGER NOT NULL,
+    valeur_fonciere     NUMERIC(15,2) NOT NULL,
+
+    -- Type simplifie
+    type_bien           TEXT NOT NULL,
+
+    -- Surface et pieces
+    surface             NUMERIC(10,2) NOT NULL,
+    nb_pieces           INTEGER,
+
+    -- Geographie
+    code_departement    TEXT NOT NULL,
+    code_commune        TEXT NOT NULL,
+    nom_commune         TEXT,
+    code_postal         TEXT,
+    adresse             TEXT,
+
+    -- Coordonnees
+    latitude            NUMERIC(10,7),
+    longitude           NUMERIC(10,7),
+    geom                GEOMETRY(Point, 4326),
+    geo_key             TEXT,               -- geohash du point (ordre physique, cf. cluster_core.sql)
+
+    -- Calcule
+    prix_m2             NUMERIC(10,2) NOT NULL,
+
+    -- Qualite
+    is_outlier          BOOLEAN DEFAULT FALSE,
+
+    -- La cle primaire doit contenir les cles de partitionnement
+    PRIMARY KEY (id, code_departement, annee),
+
+    CONSTRAINT chk_prix_m2_pos CHECK (prix_m2 > 0),
+    CONSTRAINT chk_surface_pos CHECK (surface > 0),
+    CONSTRAINT chk_valeur_pos CHECK (valeur_fonciere > 0)
+) PARTITION BY LIST (code_departement);
+
+CREATE TABLE core.transactions_default PARTITION OF core.transactions DEFAULT;
@@ -16,7 +16,7 @@ INSERT INTO core.transactions (
     valeur_fonciere, type_bien,
     surface, nb_pieces,
     code_departement, code_commune, nom_commune, code_postal, adresse,
-    latitude, longitude, geom,
+    latitude, longitude, geom, geo_key,
     prix_m2
 )
 WITH lots_residentiels AS (
@@ -82,6 +82,10 @@ SELECT
         WHEN latitude IS NOT NULL AND longitude IS NOT NULL
         THEN ST_SetSRID(ST_MakePoint(longitude, latitude), 4326)
     END AS geom,
+    CASE
+        WHEN latitude IS NOT NULL AND longitude IS NOT NULL
+        THEN ST_GeoHash(ST_SetSRID(ST_MakePoint(longitude, latitude), 4326), 12)
+    END AS geo_key,
     valeur_fonciere / surface_reelle_bati AS prix_m2
 FROM mono_bien
 WHERE valeur_fonciere / surface_reelle_bati > 0
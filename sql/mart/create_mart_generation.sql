@@ -0,0 +1,14 @@
+-- Generation des donnees servies : incrementee a la fin de chaque refresh
+-- des marts, utilisee comme cle d'invalidation par les caches applicatifs.
+-- Pas de DROP : le compteur doit survivre aux recreations des marts.
+CREATE TABLE IF NOT EXISTS mart.data_generation (
+    id              INTEGER PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+    generation      BIGINT NOT NULL DEFAULT 0,
+    refreshed_at    TIMESTAMPTZ NOT NULL DEFAULT now(),
+    transactions_count BIGINT           -- COUNT(*) de core.transactions au refresh (health check)
+);
+
+-- Tables creees avant l'ajout du comptage
+ALTER TABLE mart.data_generation ADD COLUMN IF NOT EXISTS transactions_count BIGINT;
+
+INSERT INTO mart.data_generation (id) VALUES (1) ON CONFLICT (id) DO NOTHING;
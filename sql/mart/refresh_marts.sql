@@ -120,3 +120,10 @@ WHERE i.code_commune = sub.code_commune
   AND i.type_bien = sub.type_bien
   AND i.annee = sub.annee
   AND i.mois = sub.mois;
+
+-- 5. Nouvelle generation de donnees (invalide les caches applicatifs)
+-- et comptage de core servi par le health check (evite un COUNT(*) par sonde)
+UPDATE mart.data_generation
+SET generation = generation + 1, refreshed_at = now(),
+    transactions_count = (SELECT COUNT(*) FROM core.transactions)
+WHERE id = 1;
@@ -1,60 +1,34 @@
 -- ============================================================
 -- Controles qualite des donnees core
+-- Les metriques departement / type / annee sont calculees en un
+-- seul passage sur core.transactions (GROUPING SETS) puis
+-- decoupees en rapports par src/transform/quality.py.
+-- /*sample*/ est remplace par TABLESAMPLE en mode echantillon.
 -- ============================================================
 
--- 1. Comptages par couche
-SELECT 'staging.dvf' AS table_name, COUNT(*) AS row_count FROM staging.dvf
-UNION ALL
-SELECT 'core.transactions', COUNT(*) FROM core.transactions
-UNION ALL
-SELECT 'core.transactions (hors outliers)', COUNT(*) FROM core.transactions WHERE NOT is_outlier;
+-- 1. Comptage staging
+SELECT COUNT(*) AS row_count FROM staging.dvf;
 
--- 2. Taux de surfaces nulles par departement
-SELECT code_departement, type_bien,
-    COUNT(*) AS total,
-    SUM(CASE WHEN surface IS NULL OR surface = 0 THEN 1 ELSE 0 END) AS null_surface,
-    ROUND(100.0 * SUM(CASE WHEN surface IS NULL OR surface = 0 THEN 1 ELSE 0 END) / COUNT(*), 2) AS pct_null
-FROM core.transactions
-GROUP BY code_departement, type_bien
-ORDER BY pct_null DESC;
-
--- 3. Distribution des prix/m2 par departement
-SELECT code_departement, type_bien,
-    COUNT(*) AS nb,
-    PERCENTILE_CONT(0.01) WITHIN GROUP (ORDER BY prix_m2) AS p01,
-    PERCENTILE_CONT(0.10) WITHIN GROUP (ORDER BY prix_m2) AS p10,
-    PERCENTILE_CONT(0.25) WITHIN GROUP (ORDER BY prix_m2) AS p25,
-    PERCENTILE_CONT(0.50) WITHIN GROUP (ORDER BY prix_m2) AS p50,
-    PERCENTILE_CONT(0.75) WITHIN GROUP (ORDER BY prix_m2) AS p75,
-    PERCENTILE_CONT(0.90) WITHIN GROUP (ORDER BY prix_m2) AS p90,
-    PERCENTILE_CONT(0.99) WITHIN GROUP (ORDER BY prix_m2) AS p99
-FROM core.transactions
-WHERE NOT is_outlier
-GROUP BY code_departement, type_bien;
-
--- 4. Nombre de transactions par annee (detecter les trous)
-SELECT annee, type_bien, COUNT(*) AS nb_transactions
-FROM core.transactions
-WHERE NOT is_outlier
-GROUP BY annee, type_bien
-ORDER BY annee, type_bien;
-
--- 5. Couverture geographique
+-- 2. Metriques core (un seul scan)
+-- grp = GROUPING(code_departement, type_bien, annee) :
+--   1 -> (departement, type), 4 -> (annee, type), 7 -> total
 SELECT
-    COUNT(DISTINCT code_commune) AS communes_avec_transactions,
-    COUNT(DISTINCT code_departement) AS departements_couverts,
-    SUM(CASE WHEN geom IS NOT NULL THEN 1 ELSE 0 END) AS transactions_geolocalisees,
-    COUNT(*) AS transactions_total,
-    ROUND(100.0 * SUM(CASE WHEN geom IS NOT NULL THEN 1 ELSE 0 END) / NULLIF(COUNT(*), 0), 1)
-        AS pct_geolocalisees
-FROM core.transactions
-WHERE NOT is_outlier;
-
--- 6. Taux d'outliers par departement
-SELECT code_departement, type_bien,
+    GROUPING(code_departement, type_bien, annee) AS grp,
+    code_departement,
+    type_bien,
+    annee,
     COUNT(*) AS total,
-    SUM(CASE WHEN is_outlier THEN 1 ELSE 0 END) AS nb_outliers,
-    ROUND(100.0 * SUM(CASE WHEN is_outlier THEN 1 ELSE 0 END) / COUNT(*), 2) AS pct_outliers
-FROM core.transactions
-GROUP BY code_departement, type_bien
-ORDER BY pct_outliers DESC;
+    COUNT(*) FILTER (WHERE NOT is_outlier) AS total_hors_outliers,
+    COUNT(*) FILTER (WHERE surface IS NULL OR surface = 0) AS null_surface,
+    COUNT(*) FILTER (WHERE is_outlier) AS nb_outliers,
+    COUNT(*) FILTER (WHERE NOT is_outlier AND geom IS NOT NULL) AS geolocalisees,
+    COUNT(DISTINCT code_commune) FILTER (WHERE NOT is_outlier) AS communes,
+    COUNT(DISTINCT code_departement) FILTER (WHERE NOT is_outlier) AS departements,
+    PERCENTILE_CONT(ARRAY[0.01, 0.10, 0.25, 0.50, 0.75, 0.90, 0.99])
+        WITHIN GROUP (ORDER BY prix_m2) FILTER (WHERE NOT is_outlier) AS quantiles
+FROM core.transactions /*sample*/
+GROUP BY GROUPING SETS (
+    (code_departement, type_bien),
+    (annee, type_bien),
+    ()
+);
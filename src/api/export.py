@@ -0,0 +1,329 @@
+"""Export en flux de core.transactions (CSV, NDJSON, Arrow IPC).
+
+CSV : COPY ... TO STDOUT, lu par un thread producteur dans une file bornee
+(la lecture de la base s'arrete quand le client ne consomme plus).
+NDJSON / Arrow : curseur serveur (nomme) lu par lots de EXPORT_BATCH_ROWS.
+Memoire constante dans les deux cas ; gzip optionnel en flux.
+"""
+
+import datetime as dt
+import json
+import queue
+import threading
+import uuid
+import zlib
+from dataclasses import dataclass, field
+from decimal import Decimal
+
+from src.config import EXPORT_BATCH_ROWS, EXPORT_CHUNK_BYTES, EXPORT_MAX_CONCURRENT, EXPORT_QUEUE_CHUNKS
+from src.db import get_raw_connection
+
+EXPORT_FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrow"),
+}
+
+# (colonne, expression SQL, type Arrow)
+EXPORT_COLUMNS = [
+    ("id_mutation", "t.id_mutation", "string"),
+    ("date_mutation", "t.date_mutation", "date32"),
+    ("annee", "t.annee", "int32"),
+    ("valeur_fonciere", "t.valeur_fonciere::float8", "float64"),
+    ("type_bien", "t.type_bien", "string"),
+    ("surface", "t.surface::float8", "float64"),
+    ("nb_pieces", "t.nb_pieces", "int32"),
+    ("code_departement", "t.code_departement", "string"),
+    ("code_commune", "t.code_commune", "string"),
+    ("nom_commune", "t.nom_commune", "string"),
+    ("code_postal", "t.code_postal", "string"),
+    ("adresse", "t.adresse", "string"),
+    ("latitude", "t.latitude::float8", "float64"),
+    ("longitude", "t.longitude::float8", "float64"),
+    ("prix_m2", "t.prix_m2::float8", "float64"),
+]
+
+# Fin d'un flux Arrow IPC (marqueur de continuation + longueur 0)
+_ARROW_EOS = b"\xff\xff\xff\xff\x00\x00\x00\x00"
+
+
+@dataclass
+class ExportFilters:
+    """Filtres de l'export (None = pas de filtre)."""
+    departements: list[str] = field(default_factory=list)
+    communes: list[str] = field(default_factory=list)
+    type_bien: str | None = None
+    date_min: dt.date | None = None
+    date_max: dt.date | None = None
+    bbox: tuple[float, float, float, float] | None = None  # (lon_min, lat_min, lon_max, lat_max)
+    include_outliers: bool = False
+    limit: int | None = None
+
+
+def parse_bbox(value: str | None) -> tuple[float, float, float, float] | None:
+    """'lon_min,lat_min,lon_max,lat_max' -> tuple (ValueError si invalide)."""
+    if not value:
+        return None
+    parts = [float(v) for v in value.split(",")]
+    if len(parts) != 4 or parts[0] >= parts[2] or parts[1] >= parts[3]:
+        raise ValueError(f"bbox invalide: {value!r} (attendu: lon_min,lat_min,lon_max,lat_max)")
+    return tuple(parts)
+
+
+def build_export_query(filters: ExportFilters) -> tuple[str, dict]:
+    """SELECT de l'export, au format psycopg2 (%(nom)s) avec ses parametres."""
+    where, params = [], {}
+    if not filters.include_outliers:
+        where.append("NOT t.is_outlier")
+    if filters.departements:
+        where.append("t.code_departement = ANY(%(departements)s)")
+        params["departements"] = list(filters.departements)
+    if filters.communes:
+        where.append("t.code_commune = ANY(%(communes)s)")
+        params["communes"] = list(filters.communes)
+    if filters.type_bien:
+        where.append("t.type_bien = %(type_bien)s")
+        params["type_bien"] = filters.type_bien
+    if filters.date_min:
+        where.append("t.date_mutation >= %(date_min)s")
+        params["date_min"] = filters.date_min
+    if filters.date_max:
+        where.append("t.date_mutation <= %(date_max)s")
+        params["date_max"] = filters.date_max
+    if filters.bbox:
+        where.append("t.geom && ST_MakeEnvelope(%(lon_min)s, %(lat_min)s, %(lon_max)s, %(lat_max)s, 4326)")
+        params.update(zip(("lon_min", "lat_min", "lon_max", "lat_max"), filters.bbox))
+
+    columns = ", ".join(f"{expr} AS {name}" for name, expr, _ in EXPORT_COLUMNS)
+    sql = f"SELECT {columns} FROM core.transactions t"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    if filters.limit:
+        sql += " LIMIT %(limit)s"
+        params["limit"] = int(filters.limit)
+    return sql, params
+
+
+class ExportSlots:
+    """Exports simultanes limites (chacun garde une connexion du pool)."""
+
+    def __init__(self, max_active: int):
+        self.max_active = max_active
+        self.active = 0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Reserve une place : fonction de liberation (idempotente) ou None si complet."""
+        with self._lock:
+            if self.active >= self.max_active:
+                return None
+            self.active += 1
+        released = []
+
+        def release():
+            with self._lock:
+                if not released:
+                    released.append(True)
+                    self.active -= 1
+        return release
+
+
+export_slots = ExportSlots(EXPORT_MAX_CONCURRENT)
+
+
+# ---------------------------------------------------------------------------
+# Sources
+# ---------------------------------------------------------------------------
+
+class _Cancelled(Exception):
+    pass
+
+
+class _QueueWriter:
+    """Fichier pour copy_expert : regroupe les lignes en blocs et les met en file."""
+
+    def __init__(self, out: queue.Queue, cancelled: threading.Event):
+        self.out = out
+        self.cancelled = cancelled
+        self.buffer = bytearray()
+
+    def write(self, data):
+        self.buffer += data.encode("utf-8") if isinstance(data, str) else data
+        if len(self.buffer) >= EXPORT_CHUNK_BYTES:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            _put(self.out, bytes(self.buffer), self.cancelled)
+            self.buffer.clear()
+
+
+def _put(out: queue.Queue, item, cancelled: threading.Event):
+    """put bloquant (file pleine = client lent) mais interrompu si le client est parti."""
+    while True:
+        if cancelled.is_set():
+            raise _Cancelled()
+        try:
+            out.put(item, timeout=0.5)
+            return
+        except queue.Full:
+            continue
+
+
+def iter_copy_csv(sql: str, params: dict):
+    """Blocs CSV (avec en-tete) de COPY (sql) TO STDOUT.
+
+    La connexion appartient au thread producteur, qui la libere des sa
+    sortie. Fermer le generateur (client parti) ne bloque pas : il arrete le
+    producteur (file) et annule le COPY cote serveur (conn.cancel()).
+    """
+    conn = get_raw_connection()
+    out: queue.Queue = queue.Queue(maxsize=EXPORT_QUEUE_CHUNKS)
+    cancelled = threading.Event()
+    conn_lock = threading.Lock()
+    conn_released = []
+    done = object()
+
+    def _produce():
+        completed = False
+        try:
+            cursor = conn.cursor()
+            query = cursor.mogrify(sql, params).decode("utf-8")
+            writer = _QueueWriter(out, cancelled)
+            cursor.copy_expert(f"COPY ({query}) TO STDOUT WITH (FORMAT csv, HEADER true)", writer)
+            writer.flush()
+            cursor.close()
+            completed = True
+            _put(out, done, cancelled)
+        except _Cancelled:
+            pass
+        except Exception as e:
+            if not cancelled.is_set():
+                try:
+                    _put(out, e, cancelled)
+                except _Cancelled:
+                    pass
+        finally:
+            with conn_lock:
+                conn_released.append(True)
+                if completed:
+                    conn.rollback()
+                    conn.close()
+                else:
+                    # COPY interrompu : la connexion n'est pas reutilisable
+                    conn.invalidate()
+
+    producer = threading.Thread(target=_produce, name="export-copy", daemon=True)
+    producer.start()
+    finished = False
+    try:
+        while True:
+            item = out.get()
+            if item is done or isinstance(item, Exception):
+                finished = True
+            if item is done:
+                return
+            if finished:
+                raise item
+            yield item
+    finally:
+        cancelled.set()
+        with conn_lock:
+            if not finished and not conn_released:
+                # Producteur peut-etre en attente du serveur : interrompre le COPY
+                try:
+                    conn.cancel()
+                except Exception:
+                    pass
+
+
+def iter_batches(sql: str, params: dict, batch_size: int | None = None):
+    """Lots de lignes d'un curseur serveur : (noms de colonnes, lignes)."""
+    batch_size = batch_size or EXPORT_BATCH_ROWS
+    conn = get_raw_connection()
+    try:
+        cursor = conn.cursor(name=f"stta_export_{uuid.uuid4().hex[:12]}")
+        cursor.itersize = batch_size
+        cursor.execute(sql, params)
+        columns = None
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if columns is None:
+                columns = [d[0] for d in cursor.description]
+            if not rows:
+                break
+            yield columns, rows
+        cursor.close()
+    finally:
+        conn.rollback()
+        conn.close()
+
+
+# ---------------------------------------------------------------------------
+# Formats
+# ---------------------------------------------------------------------------
+
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (dt.date, dt.datetime)):
+        return value.isoformat()
+    raise TypeError(f"Type non serialisable: {type(value).__name__}")
+
+
+def ndjson_chunks(batches):
+    """Une ligne JSON par transaction, un bloc par lot."""
+    for columns, rows in batches:
+        lines = (json.dumps(dict(zip(columns, row)), default=_json_default) for row in rows)
+        yield ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def arrow_chunks(batches):
+    """Flux Arrow IPC : schema, un RecordBatch par lot, fin de flux."""
+    import pyarrow as pa  # optionnel : verifie par export_transactions
+
+    schema = pa.schema([(name, getattr(pa, arrow_type)()) for name, _, arrow_type in EXPORT_COLUMNS])
+    yield schema.serialize().to_pybytes()
+    for _, rows in batches:
+        columns = list(zip(*rows))
+        arrays = [pa.array(col, type=f.type) for col, f in zip(columns, schema)]
+        yield pa.RecordBatch.from_arrays(arrays, schema=schema).serialize().to_pybytes()
+    yield _ARROW_EOS
+
+
+def gzip_chunks(chunks):
+    """Compression gzip en flux (un bloc compresse par bloc d'entree non vide)."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_transactions(filters: ExportFilters, fmt: str = "csv", gzip: bool = False):
+    """Prepare un export : (iterateur de blocs, media type, nom de fichier).
+
+    Leve ValueError si le format est inconnu (ou arrow sans pyarrow).
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"format invalide: {fmt!r} (attendu: {', '.join(EXPORT_FORMATS)})")
+    if fmt == "arrow":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError as e:
+            raise ValueError("format arrow indisponible (pyarrow non installe)") from e
+
+    sql, params = build_export_query(filters)
+    if fmt == "csv":
+        chunks = iter_copy_csv(sql, params)
+    elif fmt == "ndjson":
+        chunks = ndjson_chunks(iter_batches(sql, params))
+    else:
+        chunks = arrow_chunks(iter_batches(sql, params))
+
+    media_type, extension = EXPORT_FORMATS[fmt]
+    filename = f"transactions.{extension}"
+    if gzip:
+        return gzip_chunks(chunks), "application/gzip", filename + ".gz"
+    return chunks, media_type, filename
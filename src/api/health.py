@@ -0,0 +1,128 @@
+"""Sondes de sante de l'API (liveness / readiness) sans scan de table.
+
+Le nombre de transactions vient de mart.data_generation (ecrit par le refresh
+des marts) ou, a defaut, de pg_class.reltuples. L'etat base est mis en cache
+HEALTH_CACHE_TTL_S secondes : une sonde repetee ne fait aucune requete.
+"""
+
+import threading
+import time
+
+from sqlalchemy import text
+
+from src.config import HEALTH_CACHE_TTL_S
+from src.db import get_engine, pool_metrics
+
+# Estimation du nombre de lignes (feuilles si core.transactions est partitionnee)
+_RELTUPLES_SQL = """
+SELECT COALESCE(SUM(GREATEST(c.reltuples, 0)), 0)::BIGINT
+FROM pg_partition_tree('core.transactions') t
+JOIN pg_class c ON c.oid = t.relid
+WHERE t.isleaf
+"""
+
+# Le verrou ne protege que _cache : la sonde s'execute hors verrou, une seule a la fois
+_lock = threading.Lock()
+_probe_done = threading.Condition(_lock)
+_cache: dict = {"at": 0.0, "value": None, "probing": False}
+
+
+def _probe_database() -> dict:
+    """Interroge la base : PostGIS, generation et comptage (sans COUNT(*))."""
+    engine = get_engine()
+    with engine.connect() as conn:
+        postgis_version = conn.execute(text("SELECT PostGIS_Version()")).scalar()
+
+        stats = None
+        if conn.execute(text("SELECT to_regclass('mart.data_generation')")).scalar() is not None:
+            stats = conn.execute(text(
+                "SELECT generation, transactions_count, refreshed_at FROM mart.data_generation WHERE id = 1"
+            )).fetchone()
+
+        count, source = None, None
+        if stats is not None and stats[1] is not None:
+            count, source = int(stats[1]), "stats"
+        elif conn.execute(text("SELECT to_regclass('core.transactions')")).scalar() is not None:
+            count, source = conn.execute(text(_RELTUPLES_SQL)).scalar(), "reltuples"
+
+    return {
+        "postgis_version": postgis_version,
+        "transactions_count": count,
+        "transactions_count_source": source,
+        "data_generation": int(stats[0]) if stats is not None else None,
+        "refreshed_at": stats[2].isoformat() if stats is not None and stats[2] else None,
+    }
+
+
+def database_status(max_age_s: float | None = None) -> dict:
+    """Etat base, relu au plus une fois par max_age_s (defaut: HEALTH_CACHE_TTL_S).
+
+    Retourne un dict avec "database" ("connected" ou message d'erreur), les
+    champs de _probe_database et "age_s" (anciennete de la mesure). Pendant
+    une sonde en cours, les autres appels renvoient la mesure precedente
+    (ou l'attendent s'il n'y en a pas encore).
+    """
+    if max_age_s is None:
+        max_age_s = HEALTH_CACHE_TTL_S
+    with _lock:
+        while True:
+            now = time.monotonic()
+            cached = _cache["value"]
+            if cached is not None and (now - _cache["at"] <= max_age_s or _cache["probing"]):
+                return {**cached, "age_s": round(now - _cache["at"], 3)}
+            if not _cache["probing"]:
+                _cache["probing"] = True
+                break
+            _probe_done.wait()
+
+    value = None
+    try:
+        value = {"database": "connected", **_probe_database()}
+    except Exception as e:
+        value = {"database": f"{type(e).__name__}: {e}"}
+    finally:
+        with _lock:
+            if value is not None:
+                _cache["value"], _cache["at"] = value, time.monotonic()
+            _cache["probing"] = False
+            _probe_done.notify_all()
+    return {**value, "age_s": 0.0}
+
+
+def reset_cache():
+    """Vide le cache (tests, rechargement)."""
+    with _lock:
+        _cache["value"], _cache["at"] = None, 0.0
+
+
+def pool_status() -> dict:
+    """Occupation du pool et compteurs de checkout (en memoire, sans requete)."""
+    pool = get_engine().pool
+    status = {"pool_class": type(pool).__name__, **pool_metrics.snapshot()}
+    if not hasattr(pool, "checkedout"):
+        return status  # NullPool (mode pgbouncer)
+
+    size = pool.size()
+    max_overflow = getattr(pool, "_max_overflow", 0)
+    checked_out = pool.checkedout()
+    capacity = size + max(max_overflow, 0)
+    return {
+        **status,
+        "size": size,
+        "max_overflow": max_overflow,
+        "checked_out": checked_out,
+        "overflow": max(pool.overflow(), 0),
+        "saturation": round(checked_out / capacity, 3) if capacity else None,
+    }
+
+
+def comparable_cache_status() -> dict:
+    """Occupation et taux de hit du cache de candidats (en memoire)."""
+    from src.estimation.comparable_cache import candidate_cache  # pandas / NumPy : import differe
+    return candidate_cache.stats()
+
+
+def mart_mirror_status() -> dict:
+    """Generation et taille de la copie en memoire des marts."""
+    from src.api.mart_mirror import mart_mirror  # pandas : import differe
+    return mart_mirror.status()
@@ -1,25 +1,63 @@
 """Application FastAPI STTA-DVF."""
 
+import json
 import os
 import time
+from contextlib import asynccontextmanager
+from datetime import date
 
 from dotenv import load_dotenv
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, RedirectResponse
-from sqlalchemy import text
+from fastapi.responses import JSONResponse, RedirectResponse, StreamingResponse
+from pydantic import BaseModel
+from starlette.background import BackgroundTask
 
-from src.db import get_engine
-from src.app.models.adjustments import get_default_coefficients
-from src.api.schemas import EstimationRequest, EstimationResponse, HealthResponse
-from src.api.service import process_estimation
+from src.config import API_WARMUP
+from src.api.export import ExportFilters, export_slots, export_transactions, parse_bbox
+from src.api.health import comparable_cache_status, database_status, mart_mirror_status, pool_status
+from src.api.schemas import (
+    CoordinatesEstimationRequest,
+    EstimationRequest,
+    EstimationResponse,
+    ComparableCacheSchema,
+    HealthResponse,
+    LivenessResponse,
+    MartMirrorSchema,
+    PoolStatusSchema,
+    ReadinessResponse,
+    RezoneRequest,
+    SweepRequest,
+    SweepResponse,
+    WarmupSchema,
+)
+from src.api.warmup import warmup
 
 load_dotenv()
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Demarrage : warm-up en arriere-plan (imports, pool, geocodeur, marts)."""
+    if API_WARMUP:
+        warmup.start()
+    yield
+    from src.api.mart_mirror import mart_mirror
+    mart_mirror.stop()
+
+
+def _service():
+    """Orchestration de l'estimation (pandas, NumPy, modeles) : importee au warm-up
+    ou au premier appel, pas au chargement de l'application."""
+    from src.api import service
+    return service
+
+
 app = FastAPI(
     title="STTA-DVF API",
     version="1.0.0",
     description="API d'estimation immobiliere basee sur les donnees DVF.",
+    lifespan=lifespan,
 )
 
 # CORS
@@ -50,34 +88,47 @@ def root():
 
 @app.get("/api/v1/health", response_model=HealthResponse)
 def health():
-    """Health check : verifie la connexion DB et PostGIS."""
-    try:
-        engine = get_engine()
-        with engine.connect() as conn:
-            # PostGIS version
-            row = conn.execute(text("SELECT PostGIS_Version()")).fetchone()
-            postgis_version = row[0] if row else None
-
-            # Transactions count
-            row = conn.execute(text("SELECT COUNT(*) FROM core.transactions")).fetchone()
-            count = row[0] if row else 0
-
-        return HealthResponse(
-            status="ok",
-            database="connected",
-            postgis_version=postgis_version,
-            transactions_count=count,
-        )
-    except Exception as e:
-        return HealthResponse(
-            status="error",
-            database=str(e),
-        )
+    """Health check : connexion DB, PostGIS et comptage (cache, sans COUNT(*))."""
+    db = database_status()
+    if db["database"] != "connected":
+        return HealthResponse(status="error", database=db["database"])
+    return HealthResponse(
+        status="ok",
+        database=db["database"],
+        postgis_version=db["postgis_version"],
+        transactions_count=db["transactions_count"],
+        data_generation=db["data_generation"],
+    )
+
+
+@app.get("/api/v1/health/live", response_model=LivenessResponse)
+def liveness():
+    """Sonde de vie : le processus repond (aucun acces base)."""
+    return LivenessResponse(status="ok")
+
+
+@app.get("/api/v1/health/ready", response_model=ReadinessResponse)
+def readiness():
+    """Sonde de disponibilite : warm-up termine, base joignable (cache), generation des donnees, pool, caches."""
+    db = database_status()
+    ready = db["database"] == "connected" and warmup.ready
+    response = ReadinessResponse(
+        status="ready" if ready else "not_ready",
+        pool=PoolStatusSchema(**pool_status()),
+        comparable_cache=ComparableCacheSchema(**comparable_cache_status()),
+        mart_mirror=MartMirrorSchema(**mart_mirror_status()),
+        warmup=WarmupSchema(**warmup.state()),
+        **db,
+    )
+    if not ready:
+        return JSONResponse(status_code=503, content=response.model_dump())
+    return response
 
 
 @app.get("/api/v1/defaults")
 def defaults():
     """Retourne les coefficients par defaut (pour les sliders admin frontend)."""
+    from src.app.models.adjustments import get_default_coefficients
     return get_default_coefficients()
 
 
@@ -85,7 +136,7 @@ def defaults():
 def estimate(request: EstimationRequest):
     """Endpoint principal d'estimation immobiliere."""
     try:
-        return process_estimation(request)
+        return _service().process_estimation(request)
     except ValueError as e:
         return JSONResponse(
             status_code=422,
@@ -96,3 +147,165 @@ def estimate(request: EstimationRequest):
             status_code=500,
             content={"detail": f"Erreur interne: {type(e).__name__}: {e}"},
         )
+
+
+@app.post("/api/v1/estimate/coordinates", response_model=EstimationResponse)
+def estimate_coordinates(request: CoordinatesEstimationRequest):
+    """Estimation a partir de coordonnees WGS84 (et code INSEE optionnel), sans geocodage."""
+    try:
+        return _service().process_coordinates_estimation(request)
+    except ValueError as e:
+        return JSONResponse(
+            status_code=422,
+            content={"detail": str(e)},
+        )
+    except Exception as e:
+        return JSONResponse(
+            status_code=500,
+            content={"detail": f"Erreur interne: {type(e).__name__}: {e}"},
+        )
+
+
+def _sse_event(name: str, payload) -> str:
+    data = payload.model_dump_json() if isinstance(payload, BaseModel) else json.dumps(payload)
+    return f"event: {name}\ndata: {data}\n\n"
+
+
+@app.post("/api/v1/estimate/stream")
+def estimate_stream(request: EstimationRequest):
+    """Estimation progressive (Server-Sent Events) : un evenement par section."""
+    try:
+        events = _service().stream_estimation(request)
+    except ValueError as e:
+        return JSONResponse(
+            status_code=422,
+            content={"detail": str(e)},
+        )
+
+    def _body():
+        try:
+            for name, payload in events:
+                yield _sse_event(name, payload)
+        except Exception as e:
+            yield _sse_event("error", {"detail": f"Erreur interne: {type(e).__name__}: {e}"})
+
+    return StreamingResponse(
+        _body(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.post("/api/v1/estimate/rezone", response_model=EstimationResponse)
+def rezone(request: RezoneRequest):
+    """Recalcule une estimation avec d'autres zones / poids, sans nouvelle recherche."""
+    try:
+        response = _service().process_rezone(request)
+    except ValueError as e:
+        return JSONResponse(
+            status_code=422,
+            content={"detail": str(e)},
+        )
+    except Exception as e:
+        return JSONResponse(
+            status_code=500,
+            content={"detail": f"Erreur interne: {type(e).__name__}: {e}"},
+        )
+    if response is None:
+        return JSONResponse(
+            status_code=404,
+            content={"detail": f"search_id inconnu ou expire: {request.search_id}"},
+        )
+    return response
+
+
+@app.post("/api/v1/estimate/sweep", response_model=SweepResponse)
+def sweep(request: SweepRequest):
+    """Sensibilite de l'estimation sur une grille de coefficients / zones (une seule recherche)."""
+    try:
+        return _service().process_sweep(request)
+    except ValueError as e:
+        return JSONResponse(
+            status_code=422,
+            content={"detail": str(e)},
+        )
+    except Exception as e:
+        return JSONResponse(
+            status_code=500,
+            content={"detail": f"Erreur interne: {type(e).__name__}: {e}"},
+        )
+
+
+class _ExportResponse(StreamingResponse):
+    """Ferme le flux des la fin de la reponse, client deconnecte compris (sans attendre le GC)."""
+
+    def __init__(self, content, **kwargs):
+        super().__init__(content, **kwargs)
+        self._content = content
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self._content.close()
+
+
+@app.get("/api/v1/export/transactions")
+def export_transactions_endpoint(
+    format: str = Query("csv", description="csv, ndjson ou arrow (flux Arrow IPC)"),
+    departement: list[str] | None = Query(None, description="Code(s) departement"),
+    commune: list[str] | None = Query(None, description="Code(s) INSEE commune"),
+    type_bien: str | None = Query(None, description="appartement ou maison"),
+    date_min: date | None = Query(None),
+    date_max: date | None = Query(None),
+    bbox: str | None = Query(None, description="lon_min,lat_min,lon_max,lat_max (WGS84)"),
+    include_outliers: bool = Query(False),
+    limit: int | None = Query(None, ge=1),
+    gzip: bool = Query(False, description="Compression gzip du flux"),
+):
+    """Export en flux des transactions filtrees (memoire constante cote API)."""
+    try:
+        filters = ExportFilters(
+            departements=departement or [],
+            communes=commune or [],
+            type_bien=type_bien,
+            date_min=date_min,
+            date_max=date_max,
+            bbox=parse_bbox(bbox),
+            include_outliers=include_outliers,
+            limit=limit,
+        )
+        release = export_slots.acquire()
+        if release is None:
+            return JSONResponse(
+                status_code=429,
+                content={"detail": "Trop d'exports en cours, reessayer plus tard"},
+            )
+        try:
+            chunks, media_type, filename = export_transactions(filters, format, gzip)
+        except Exception:
+            release()
+            raise
+    except ValueError as e:
+        return JSONResponse(
+            status_code=422,
+            content={"detail": str(e)},
+        )
+    except Exception as e:
+        return JSONResponse(
+            status_code=500,
+            content={"detail": f"Erreur interne: {type(e).__name__}: {e}"},
+        )
+
+    def _body():
+        try:
+            yield from chunks
+        finally:
+            release()
+
+    return _ExportResponse(
+        _body(),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+        background=BackgroundTask(release),
+    )
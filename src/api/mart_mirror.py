@@ -0,0 +1,209 @@
+"""Copie en memoire des marts servis par l'API.
+
+mart.zone_stats, mart.stats_commune, mart.stats_departement et
+mart.indices_temporels sont lus en une fois (instantane REPEATABLE READ) et
+indexes par (code_commune, type_bien) / (code_departement, type_bien) :
+les sections zone_stats et evolution ne font alors aucune requete. Un thread
+relit la generation toutes les API_MART_MIRROR_CHECK_S secondes et remplace
+l'instantane d'un bloc quand elle change.
+"""
+
+import threading
+import time
+from dataclasses import dataclass
+
+import pandas as pd
+from sqlalchemy import text
+
+from src.config import API_MART_MIRROR_CHECK_S
+from src.db import get_engine
+from src.estimation.queries import DATA_GENERATION
+
+_ZONE_STATS_SQL = """
+    SELECT code_commune, type_bien, total_transactions, last_12m_transactions,
+           median_prix_m2_12m, stddev_prix_m2_12m, trend_12m, data_quality_flag
+    FROM mart.zone_stats
+"""
+
+_SEMESTER_COMMUNE_SQL = """
+    SELECT code_commune, type_bien, annee, semestre, nb_transactions,
+           median_prix_m2, q1_prix_m2, q3_prix_m2
+    FROM mart.stats_commune
+    ORDER BY code_commune, type_bien, annee, semestre
+"""
+
+_SEMESTER_DEPARTEMENT_SQL = """
+    SELECT code_departement, type_bien, annee, semestre, nb_transactions,
+           median_prix_m2, q1_prix_m2, q3_prix_m2
+    FROM mart.stats_departement
+    ORDER BY code_departement, type_bien, annee, semestre
+"""
+
+_MONTHLY_COMMUNE_SQL = """
+    SELECT code_commune, type_bien,
+           annee || '-' || LPAD(mois::TEXT, 2, '0') AS annee_mois,
+           nb_transactions, median_prix_m2, rolling_median_6m
+    FROM mart.indices_temporels
+    ORDER BY code_commune, type_bien, annee, mois
+"""
+
+
+class KeyedRows:
+    """Lignes triees par cle : colonnes numpy + tranche de lignes par cle."""
+
+    def __init__(self, df: pd.DataFrame, key_cols: list[str]):
+        value_cols = [c for c in df.columns if c not in key_cols]
+        self.columns = {c: df[c].to_numpy() for c in value_cols}
+        self.slices = {}
+        if len(df):
+            for key, positions in df.groupby(key_cols, sort=False).indices.items():
+                self.slices[key] = slice(positions[0], positions[-1] + 1)
+        self.rows = len(df)
+
+    def records(self, key: tuple) -> list[dict]:
+        """Lignes de la cle (dans l'ordre du SELECT), [] si absente."""
+        s = self.slices.get(key)
+        if s is None:
+            return []
+        values = [col[s] for col in self.columns.values()]
+        return [dict(zip(self.columns, row)) for row in zip(*values)]
+
+
+def _optional_int(value):
+    return int(value) if pd.notna(value) else None
+
+
+def _optional_float(value):
+    # Meme conversion que get_zone_stats (0 et NULL -> None)
+    return float(value) if value and pd.notna(value) else None
+
+
+@dataclass
+class MartSnapshot:
+    """Instantane des marts a une generation donnee."""
+    generation: int
+    loaded_at: float
+    load_s: float
+    zone_stats: dict
+    semester_commune: KeyedRows
+    semester_departement: KeyedRows
+    monthly_commune: KeyedRows
+
+    @classmethod
+    def load(cls, conn, generation: int) -> "MartSnapshot":
+        start = time.perf_counter()
+        zone_df = pd.read_sql(text(_ZONE_STATS_SQL), conn, coerce_float=True)
+        zone_stats = {
+            (row.code_commune, row.type_bien): {
+                "total_transactions": _optional_int(row.total_transactions),
+                "last_12m_transactions": _optional_int(row.last_12m_transactions),
+                "median_prix_m2_12m": _optional_float(row.median_prix_m2_12m),
+                "stddev_prix_m2_12m": _optional_float(row.stddev_prix_m2_12m),
+                "trend_12m": _optional_float(row.trend_12m),
+                "data_quality_flag": row.data_quality_flag,
+            }
+            for row in zone_df.itertuples(index=False)
+        }
+        commune_key, departement_key = ["code_commune", "type_bien"], ["code_departement", "type_bien"]
+        semester_commune = KeyedRows(pd.read_sql(text(_SEMESTER_COMMUNE_SQL), conn, coerce_float=True), commune_key)
+        semester_departement = KeyedRows(
+            pd.read_sql(text(_SEMESTER_DEPARTEMENT_SQL), conn, coerce_float=True), departement_key,
+        )
+        monthly_commune = KeyedRows(pd.read_sql(text(_MONTHLY_COMMUNE_SQL), conn, coerce_float=True), commune_key)
+        return cls(
+            generation=generation,
+            loaded_at=time.time(),
+            load_s=round(time.perf_counter() - start, 3),
+            zone_stats=zone_stats,
+            semester_commune=semester_commune,
+            semester_departement=semester_departement,
+            monthly_commune=monthly_commune,
+        )
+
+    @property
+    def rows(self) -> int:
+        return (len(self.zone_stats) + self.semester_commune.rows
+                + self.semester_departement.rows + self.monthly_commune.rows)
+
+
+def _read_generation(conn) -> int:
+    if conn.execute(text("SELECT to_regclass('mart.data_generation')")).scalar() is None:
+        return 0
+    return int(conn.execute(DATA_GENERATION.statement).scalar() or 0)
+
+
+class MartMirror:
+    """Instantane courant des marts et son rechargement en arriere-plan."""
+
+    def __init__(self):
+        self.snapshot: MartSnapshot | None = None
+        self.reloads = 0
+        self.last_error: str | None = None
+        self._load_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def load(self) -> MartSnapshot:
+        """Relit les marts et remplace l'instantane (les lecteurs gardent l'ancien)."""
+        with self._load_lock:
+            engine = get_engine()
+            with engine.connect().execution_options(isolation_level="REPEATABLE READ") as conn:
+                snapshot = MartSnapshot.load(conn, _read_generation(conn))
+            self.snapshot = snapshot
+            self.reloads += 1
+            self.last_error = None
+            print(f"[MART_MIRROR] generation {snapshot.generation}: {snapshot.rows} lignes en {snapshot.load_s}s")
+            return snapshot
+
+    def refresh_if_stale(self) -> bool:
+        """Recharge si la generation en base differe de l'instantane."""
+        with get_engine().connect() as conn:
+            generation = _read_generation(conn)
+        if self.snapshot is not None and self.snapshot.generation == generation:
+            return False
+        self.load()
+        return True
+
+    def _run(self, interval_s: float):
+        while not self._stop.wait(interval_s):
+            try:
+                self.refresh_if_stale()
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+                print(f"[MART_MIRROR] Rechargement echoue: {self.last_error}")
+
+    def start(self, interval_s: float | None = None):
+        """Charge les marts (erreur loggee, l'API retombe sur la base) et lance le suivi."""
+        try:
+            self.load()
+        except Exception as e:
+            self.last_error = f"{type(e).__name__}: {e}"
+            print(f"[MART_MIRROR] Chargement echoue, lecture en base: {self.last_error}")
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._run, args=(interval_s or API_MART_MIRROR_CHECK_S,),
+                name="mart-mirror", daemon=True,
+            )
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def status(self) -> dict:
+        snapshot = self.snapshot
+        return {
+            "loaded": snapshot is not None,
+            "generation": snapshot.generation if snapshot else None,
+            "rows": snapshot.rows if snapshot else 0,
+            "load_s": snapshot.load_s if snapshot else None,
+            "age_s": round(time.time() - snapshot.loaded_at, 1) if snapshot else None,
+            "reloads": self.reloads,
+            "last_error": self.last_error,
+        }
+
+
+mart_mirror = MartMirror()
@@ -92,6 +92,37 @@ class EstimationRequest(BaseModel):
     include: list[str] | None = None
 
 
+class CoordinatesEstimationRequest(EstimationRequest):
+    """Requete d'estimation a partir de coordonnees WGS84 (sans geocodage externe)."""
+
+    address: str | None = None  # Libelle libre, repris dans geocoding.label
+    latitude: float = Field(..., ge=-90, le=90)
+    longitude: float = Field(..., ge=-180, le=180)
+    # Code INSEE ; absent : commune de la transaction la plus proche
+    citycode: str | None = Field(None, pattern=r"^[0-9][0-9AB][0-9]{3}$")
+
+
+class RezoneRequest(BaseModel):
+    """Recalcul d'une estimation precedente avec d'autres zones (sans nouvelle recherche)."""
+
+    search_id: str
+    zone_config: ZoneConfigSchema
+    coefficient_overrides: CoefficientOverridesSchema | None = None  # None = ceux de l'estimation
+    include: list[str] | None = None  # None = ceux de l'estimation
+
+
+class SweepRequest(EstimationRequest):
+    """Grille de sensibilite : un bien, plusieurs jeux de coefficients / zones.
+
+    Chaque liste absente reprend la valeur unique de la requete.
+    """
+
+    conditions: list[str] | None = None
+    qualities: list[str] | None = None
+    floor_params_grid: list[FloorParamsSchema] | None = None
+    zone_configs: list[ZoneConfigSchema] | None = None
+
+
 # ---------------------------------------------------------------------------
 # Response sub-schemas
 # ---------------------------------------------------------------------------
@@ -236,6 +267,7 @@ class EstimationResponse(BaseModel):
     """Reponse complete de l'API d'estimation."""
 
     status: str  # "ok" | "geocoding_failed" | "no_data"
+    search_id: str | None = None  # Reutilisable via /api/v1/estimate/rezone
 
     geocoding: GeocodingSection | None = None
     estimation: EstimationSection | None = None
@@ -245,10 +277,110 @@ class EstimationResponse(BaseModel):
     comparables: ComparablesSection | None = None
 
 
+class SweepZoneItem(BaseModel):
+    """Estimation de base pour une zone_config de la grille."""
+
+    zone_config: ZoneConfigSchema | None = None  # None = fallback sans zones
+    nb_comparables: int
+    niveau_geo: str
+    prix_m2_base: float | None = None
+    adjustment_factor: float | None = None
+    confidence_level: str | None = None
+
+
+class SweepResponse(BaseModel):
+    """Matrice de sensibilite : une ligne par combinaison (zone, etat, qualite, etage)."""
+
+    status: str  # "ok" | "geocoding_failed" | "no_data"
+    conditions: list[str] = []
+    qualities: list[str] = []
+    floor_params: list[FloorParamsSchema | None] = []
+    zones: list[SweepZoneItem] = []
+    columns: list[str] = []  # 4 indices dans les axes ci-dessus, puis les valeurs
+    rows: list[list[float | None]] = []
+
+
 class HealthResponse(BaseModel):
     """Reponse du health check."""
 
     status: str
     database: str
     postgis_version: str | None = None
+    transactions_count: int | None = None  # Comptage du dernier refresh (ou estimation reltuples)
+    data_generation: int | None = None
+
+
+class LivenessResponse(BaseModel):
+    """Reponse de la sonde de vie (processus seulement, sans base)."""
+
+    status: str
+
+
+class PoolStatusSchema(BaseModel):
+    """Occupation du pool de connexions."""
+
+    pool_class: str
+    size: int | None = None
+    max_overflow: int | None = None
+    checked_out: int | None = None
+    overflow: int | None = None
+    saturation: float | None = None  # checked_out / (size + max_overflow)
+    checkouts: int = 0
+    wait_ms_avg: float = 0.0  # Attente d'une connexion libre
+    wait_ms_max: float = 0.0
+    overflow_checkouts: int = 0
+    timeouts: int = 0
+    validation_failures: int = 0
+
+
+class ComparableCacheSchema(BaseModel):
+    """Cache des candidats comparables par cellule spatiale."""
+
+    entries: int
+    bytes: int
+    max_bytes: int
+    hits: int
+    misses: int
+    hit_ratio: float | None = None
+    evictions: int
+    invalidations: int  # Purges suite a un changement de generation
+    bypassed: int  # Sur-ensembles trop gros (LIMIT ou memoire) : requete directe
+    dense_cells: int = 0  # Cellules memorisees comme trop denses pour le cache
+
+
+class MartMirrorSchema(BaseModel):
+    """Copie en memoire des marts (zone_stats, evolution)."""
+
+    loaded: bool  # False : sections lues en base
+    generation: int | None = None
+    rows: int
+    load_s: float | None = None
+    age_s: float | None = None
+    reloads: int
+    last_error: str | None = None
+
+
+class WarmupSchema(BaseModel):
+    """Warm-up du demarrage (imports, pool, geocodeur, marts)."""
+
+    status: str  # "off" (non lance) | "running" | "done"
+    total_s: float | None = None
+    steps: dict[str, float] = {}  # Duree de chaque etape (s)
+    errors: dict[str, str] = {}  # Etapes en echec (l'API demarre quand meme)
+
+
+class ReadinessResponse(BaseModel):
+    """Reponse de la sonde de disponibilite."""
+
+    status: str  # "ready" | "not_ready"
+    database: str
+    postgis_version: str | None = None
     transactions_count: int | None = None
+    transactions_count_source: str | None = None  # "stats" | "reltuples"
+    data_generation: int | None = None
+    refreshed_at: str | None = None
+    age_s: float  # Anciennete de l'etat base (cache)
+    pool: PoolStatusSchema
+    comparable_cache: ComparableCacheSchema
+    mart_mirror: MartMirrorSchema
+    warmup: WarmupSchema
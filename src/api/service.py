@@ -1,18 +1,29 @@
 """Orchestration de l'estimation : appelle les modules existants et assemble la reponse."""
 
+import threading
+import uuid
+from collections import OrderedDict
+from dataclasses import asdict, replace
+
 import numpy as np
 import pandas as pd
-from sqlalchemy import text
 
-from src.db import get_engine
-from src.estimation.geocoder import geocode_best
-from src.estimation.comparables import find_comparables
+from src.config import API_SEARCH_CACHE_SIZE, API_SWEEP_MAX_COMBINATIONS
+from src.estimation.geocoder import departement_of, geocode_best, http_session
+from src.estimation.comparables import ComparableSearch, find_comparables, rezone_comparables
 from src.estimation.estimator import (
     compute_surface_adjustment,
     compute_weighted_median,
+    geocoding_from_coordinates,
     get_zone_stats,
 )
 from src.estimation.confidence import compute_confidence
+from src.estimation.queries import (
+    MONTHLY_COMMUNE,
+    SEMESTER_COMMUNE,
+    SEMESTER_DEPARTEMENT,
+    read_df,
+)
 from src.estimation.zone_config import ZoneConfig
 from src.app.models.property_input import (
     PropertyInput,
@@ -23,16 +34,25 @@ from src.app.models.property_input import (
 )
 from src.app.models.adjustments import (
     compute_adjustments,
+    compute_adjustments_batch,
+    round_array,
     CoefficientOverrides,
     FloorParams,
 )
+from src.api.mart_mirror import MartSnapshot, mart_mirror
 from src.api.schemas import (
+    CoordinatesEstimationRequest,
     EstimationRequest,
     EstimationResponse,
+    RezoneRequest,
+    SweepRequest,
+    SweepResponse,
+    SweepZoneItem,
     GeocodingSection,
     ConfidenceSchema,
     ZoneBreakdownItem,
     ZoneConfigSchema,
+    FloorParamsSchema,
     EstimationSection,
     AdjustmentDetail,
     AdjustmentsSection,
@@ -48,9 +68,12 @@ from src.api.schemas import (
 
 def _build_zone_config(req: EstimationRequest) -> ZoneConfig | None:
     """Convertit le schema Pydantic en ZoneConfig dataclass."""
-    if req.zone_config is None:
+    return _zone_config_from_schema(req.zone_config)
+
+
+def _zone_config_from_schema(zc: ZoneConfigSchema | None) -> ZoneConfig | None:
+    if zc is None:
         return None
-    zc = req.zone_config
     return ZoneConfig(
         radius_1_km=zc.radius_1_km,
         radius_2_km=zc.radius_2_km,
@@ -61,6 +84,19 @@ def _build_zone_config(req: EstimationRequest) -> ZoneConfig | None:
     )
 
 
+def _zone_config_schema(zc: ZoneConfig | None) -> ZoneConfigSchema | None:
+    if zc is None:
+        return None
+    return ZoneConfigSchema(
+        radius_1_km=zc.radius_1_km,
+        radius_2_km=zc.radius_2_km,
+        radius_3_km=zc.radius_3_km,
+        weight_1=zc.weight_1,
+        weight_2=zc.weight_2,
+        weight_3=zc.weight_3,
+    )
+
+
 def _build_property_input(req: EstimationRequest) -> PropertyInput:
     """Convertit la requete en PropertyInput dataclass."""
     return PropertyInput(
@@ -90,17 +126,7 @@ def _build_coefficient_overrides(req: EstimationRequest) -> CoefficientOverrides
     if req.coefficient_overrides is None:
         return None
     ov = req.coefficient_overrides
-    floor_params = None
-    if ov.floor_params:
-        fp = ov.floor_params
-        floor_params = FloorParams(
-            ground_floor_discount=fp.ground_floor_discount,
-            elevator_bonus_per_floor=fp.elevator_bonus_per_floor,
-            no_elevator_penalty_per_floor=fp.no_elevator_penalty_per_floor,
-            last_floor_bonus=fp.last_floor_bonus,
-            max_elevator_bonus=fp.max_elevator_bonus,
-            max_no_elevator_penalty=fp.max_no_elevator_penalty,
-        )
+    floor_params = _floor_params_from_schema(ov.floor_params)
 
     zone_config = _build_zone_config(req)
 
@@ -115,34 +141,43 @@ def _build_coefficient_overrides(req: EstimationRequest) -> CoefficientOverrides
     )
 
 
+def _floor_params_from_schema(fp: FloorParamsSchema | None) -> FloorParams | None:
+    if fp is None:
+        return None
+    return FloorParams(
+        ground_floor_discount=fp.ground_floor_discount,
+        elevator_bonus_per_floor=fp.elevator_bonus_per_floor,
+        no_elevator_penalty_per_floor=fp.no_elevator_penalty_per_floor,
+        last_floor_bonus=fp.last_floor_bonus,
+        max_elevator_bonus=fp.max_elevator_bonus,
+        max_no_elevator_penalty=fp.max_no_elevator_penalty,
+    )
+
+
 def _get_evolution_data(
     code_commune: str,
     code_departement: str,
     type_bien: str,
+    marts: MartSnapshot | None = None,
 ) -> EvolutionSection:
-    """Recupere les donnees d'evolution (semestrielle + mensuelle)."""
-    engine = get_engine()
+    """Recupere les donnees d'evolution (semestrielle + mensuelle).
 
+    Lues dans l'instantane des marts s'il est charge, sinon en base.
+    """
     # Semestre : commune puis fallback departement
-    query = text("""
-        SELECT annee, semestre, nb_transactions, median_prix_m2,
-               q1_prix_m2, q3_prix_m2
-        FROM mart.stats_commune
-        WHERE code_commune = :code_commune AND type_bien = :type_bien
-        ORDER BY annee, semestre
-    """)
-    df = pd.read_sql(query, engine, params={"code_commune": code_commune, "type_bien": type_bien})
+    if marts is not None:
+        rows = marts.semester_commune.records((code_commune, type_bien))
+    else:
+        rows = read_df(SEMESTER_COMMUNE, {"code_commune": code_commune, "type_bien": type_bien}).to_dict("records")
 
     source = "commune"
-    if len(df) < 2:
-        query = text("""
-            SELECT annee, semestre, nb_transactions, median_prix_m2,
-                   q1_prix_m2, q3_prix_m2
-            FROM mart.stats_departement
-            WHERE code_departement = :code_departement AND type_bien = :type_bien
-            ORDER BY annee, semestre
-        """)
-        df = pd.read_sql(query, engine, params={"code_departement": code_departement, "type_bien": type_bien})
+    if len(rows) < 2:
+        if marts is not None:
+            rows = marts.semester_departement.records((code_departement, type_bien))
+        else:
+            rows = read_df(
+                SEMESTER_DEPARTEMENT, {"code_departement": code_departement, "type_bien": type_bien}
+            ).to_dict("records")
         source = "departement"
 
     semester = [
@@ -154,18 +189,14 @@ def _get_evolution_data(
             q1_prix_m2=float(row["q1_prix_m2"]) if pd.notna(row.get("q1_prix_m2")) else None,
             q3_prix_m2=float(row["q3_prix_m2"]) if pd.notna(row.get("q3_prix_m2")) else None,
         )
-        for _, row in df.iterrows()
+        for row in rows
     ]
 
     # Mensuel : indices_temporels (colonnes: annee, mois)
-    query_monthly = text("""
-        SELECT annee || '-' || LPAD(mois::TEXT, 2, '0') AS annee_mois,
-               nb_transactions, median_prix_m2, rolling_median_6m
-        FROM mart.indices_temporels
-        WHERE code_commune = :code_commune AND type_bien = :type_bien
-        ORDER BY annee, mois
-    """)
-    df_monthly = pd.read_sql(query_monthly, engine, params={"code_commune": code_commune, "type_bien": type_bien})
+    if marts is not None:
+        rows = marts.monthly_commune.records((code_commune, type_bien))
+    else:
+        rows = read_df(MONTHLY_COMMUNE, {"code_commune": code_commune, "type_bien": type_bien}).to_dict("records")
 
     monthly = [
         MonthlyItem(
@@ -174,7 +205,7 @@ def _get_evolution_data(
             median_prix_m2=float(row["median_prix_m2"]),
             rolling_median_6m=float(row["rolling_median_6m"]) if pd.notna(row.get("rolling_median_6m")) else None,
         )
-        for _, row in df_monthly.iterrows()
+        for row in rows
     ]
 
     return EvolutionSection(source=source, semester=semester, monthly=monthly)
@@ -203,70 +234,94 @@ def _comparables_to_items(df: pd.DataFrame) -> list[ComparableItem]:
     return items
 
 
-def process_estimation(request: EstimationRequest) -> EstimationResponse:
-    """Traite une requete d'estimation et retourne la reponse complete."""
+class _SearchStore:
+    """Recherches recentes (LRU, locale au process) pour /estimate/rezone."""
 
-    # Sections demandees
-    sections = set(request.include) & VALID_SECTIONS if request.include else VALID_SECTIONS
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple] = OrderedDict()
+        self._lock = threading.Lock()
 
-    # 1. Geocodage
-    geo = geocode_best(request.address, postcode=request.postcode)
-    if geo is None:
-        return EstimationResponse(status="geocoding_failed")
+    def put(self, request: EstimationRequest, geo, search: ComparableSearch) -> str:
+        search_id = uuid.uuid4().hex
+        self.replace(search_id, request, geo, search)
+        return search_id
 
-    geocoding_section = None
-    if "geocoding" in sections:
-        geocoding_section = GeocodingSection(
-            label=geo.label,
-            score=geo.score,
-            latitude=geo.latitude,
-            longitude=geo.longitude,
-            citycode=geo.citycode,
-            city=geo.city,
-            postcode=geo.postcode,
-            context=geo.context,
-        )
+    def replace(self, search_id: str, request: EstimationRequest, geo, search: ComparableSearch):
+        with self._lock:
+            self._entries[search_id] = (request, geo, search)
+            self._entries.move_to_end(search_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
 
-    # 2. Comparables
-    zone_config = _build_zone_config(request)
-    dvf_type = PropertyType(request.property_type).dvf_type
+    def get(self, search_id: str) -> tuple | None:
+        with self._lock:
+            entry = self._entries.get(search_id)
+            if entry is not None:
+                self._entries.move_to_end(search_id)
+            return entry
 
-    search = find_comparables(
-        latitude=geo.latitude,
-        longitude=geo.longitude,
-        code_commune=geo.citycode,
-        type_bien=dvf_type,
-        surface=request.surface,
-        nb_pieces=request.nb_pieces,
-        zone_config=zone_config,
-    )
-    comparables_df = search.comparables
 
-    if len(comparables_df) == 0:
-        return EstimationResponse(
-            status="no_data",
-            geocoding=geocoding_section,
-        )
+_search_store = _SearchStore(API_SEARCH_CACHE_SIZE)
+
+
+def _base_estimate(search: ComparableSearch, surface: float):
+    """Mediane de base, ajustement surface et confiance d'une recherche non vide.
 
-    # 3. Mediane (ponderee par zone si multi-zones)
-    zone_breakdown_raw = None
+    Returns:
+        (base_median, zone_breakdown, adjustment_factor, confidence)
+    """
+    comparables_df = search.comparables
+    zone_breakdown = None
     if search.zone_config and "zone" in comparables_df.columns:
-        base_median, zone_breakdown_raw = compute_weighted_median(comparables_df, search.zone_config)
+        base_median, zone_breakdown = compute_weighted_median(comparables_df, search.zone_config)
     else:
         base_median = float(np.median(comparables_df["prix_m2"]))
 
-    # 4. Ajustement surface
-    adjustment_factor = compute_surface_adjustment(request.surface, comparables_df)
-    prix_m2_base = base_median * adjustment_factor
-    prix_total_base = prix_m2_base * request.surface
-
-    # 5. Confiance
+    adjustment_factor = compute_surface_adjustment(surface, comparables_df)
     confidence = compute_confidence(
         comparables=comparables_df,
         search_level=search.level,
-        surface=request.surface,
+        surface=surface,
         adjustment=adjustment_factor,
     )
+    return base_median, zone_breakdown, adjustment_factor, confidence
+
+
+def _geocoding_section(geo) -> GeocodingSection:
+    return GeocodingSection(
+        label=geo.label,
+        score=geo.score,
+        latitude=geo.latitude,
+        longitude=geo.longitude,
+        citycode=geo.citycode,
+        city=geo.city,
+        postcode=geo.postcode,
+        context=geo.context,
+    )
+
+
+def _iter_sections(request: EstimationRequest, geo, search: ComparableSearch, sections: set[str]):
+    """Calcule les sections demandees (hors geocodage) dans l'ordre ou elles sont disponibles.
+
+    Les sections en memoire (estimation, adjustments) sortent d'abord, puis
+    celles issues des marts (zone_stats, evolution : instantane en memoire
+    s'il est charge, sinon requetes). Suppose des comparables non vides.
+
+    Yields:
+        (nom de section, section Pydantic ou None)
+    """
+    dvf_type = PropertyType(request.property_type).dvf_type
+    comparables_df = search.comparables
+    # Un seul instantane par reponse, meme si un rechargement a lieu entre deux sections
+    marts = mart_mirror.snapshot
+
+    # 3-5. Mediane (ponderee par zone si multi-zones), ajustement surface, confiance
+    base_median, zone_breakdown_raw, adjustment_factor, confidence = _base_estimate(
+        search, request.surface
+    )
+    prix_m2_base = base_median * adjustment_factor
+    prix_total_base = prix_m2_base * request.surface
 
     # 6. Ajustements heuristiques
     prop = _build_property_input(request)
@@ -283,7 +338,6 @@ def process_estimation(request: EstimationRequest) -> EstimationResponse:
 
     # 7. Assembler les sections
 
-    estimation_section = None
     if "estimation" in sections:
         # Zone breakdown
         zb_schema = None
@@ -297,19 +351,9 @@ def process_estimation(request: EstimationRequest) -> EstimationResponse:
                 )
 
         # Zone config retournee
-        zc_schema = None
-        if search.zone_config:
-            zc = search.zone_config
-            zc_schema = ZoneConfigSchema(
-                radius_1_km=zc.radius_1_km,
-                radius_2_km=zc.radius_2_km,
-                radius_3_km=zc.radius_3_km,
-                weight_1=zc.weight_1,
-                weight_2=zc.weight_2,
-                weight_3=zc.weight_3,
-            )
+        zc_schema = _zone_config_schema(search.zone_config)
 
-        estimation_section = EstimationSection(
+        yield "estimation", EstimationSection(
             prix_m2_base=round(prix_m2_base, 2),
             prix_total_base=round(prix_total_base, 0),
             adjustment_factor=round(adjustment_factor, 4),
@@ -328,7 +372,6 @@ def process_estimation(request: EstimationRequest) -> EstimationResponse:
             zone_config=zc_schema,
         )
 
-    adjustments_section = None
     if "adjustments" in sections:
         details = []
         # Map adjustment names from AdjustmentBreakdown
@@ -351,16 +394,19 @@ def process_estimation(request: EstimationRequest) -> EstimationResponse:
                 ))
                 expl_idx += 1
 
-        adjustments_section = AdjustmentsSection(
+        yield "adjustments", AdjustmentsSection(
             base_price=round(prix_total_base, 0),
             adjusted_price=round(prix_total_ajuste, 0),
             total_multiplier=total_multiplier,
             details=details,
         )
 
-    zone_stats_section = None
     if "zone_stats" in sections:
-        stats = get_zone_stats(geo.citycode, dvf_type)
+        if marts is not None:
+            stats = marts.zone_stats.get((geo.citycode, dvf_type))
+        else:
+            stats = get_zone_stats(geo.citycode, dvf_type)
+        zone_stats_section = None
         if stats:
             zone_stats_section = ZoneStatsSection(
                 total_transactions=stats["total_transactions"],
@@ -370,25 +416,284 @@ def process_estimation(request: EstimationRequest) -> EstimationResponse:
                 trend_12m=stats["trend_12m"],
                 data_quality_flag=stats["data_quality_flag"],
             )
+        yield "zone_stats", zone_stats_section
 
-    evolution_section = None
     if "evolution" in sections:
-        code_departement = geo.citycode[:2] if len(geo.citycode) >= 2 else geo.citycode
-        evolution_section = _get_evolution_data(geo.citycode, code_departement, dvf_type)
+        yield "evolution", _get_evolution_data(geo.citycode, departement_of(geo.citycode), dvf_type, marts)
 
-    comparables_section = None
     if "comparables" in sections:
-        comparables_section = ComparablesSection(
+        yield "comparables", ComparablesSection(
             count=len(comparables_df),
             items=_comparables_to_items(comparables_df),
         )
 
+
+def _build_response(
+    request: EstimationRequest,
+    geo,
+    search: ComparableSearch,
+    sections: set[str],
+    search_id: str | None = None,
+) -> EstimationResponse:
+    """Calcule l'estimation et assemble les sections demandees."""
+    geocoding_section = _geocoding_section(geo) if "geocoding" in sections else None
+
+    if len(search.comparables) == 0:
+        return EstimationResponse(
+            status="no_data",
+            search_id=search_id,
+            geocoding=geocoding_section,
+        )
+
     return EstimationResponse(
         status="ok",
+        search_id=search_id,
         geocoding=geocoding_section,
-        estimation=estimation_section,
-        adjustments=adjustments_section,
-        zone_stats=zone_stats_section,
-        evolution=evolution_section,
-        comparables=comparables_section,
+        **dict(_iter_sections(request, geo, search, sections)),
+    )
+
+
+def _search(request: EstimationRequest, geo) -> tuple[ComparableSearch, str]:
+    """Recherche les comparables et conserve la recherche pour /estimate/rezone."""
+    search = find_comparables(
+        latitude=geo.latitude,
+        longitude=geo.longitude,
+        code_commune=geo.citycode,
+        type_bien=PropertyType(request.property_type).dvf_type,
+        surface=request.surface,
+        nb_pieces=request.nb_pieces,
+        zone_config=_build_zone_config(request),
+    )
+    return search, _search_store.put(request, geo, search)
+
+
+def process_estimation(request: EstimationRequest) -> EstimationResponse:
+    """Traite une requete d'estimation et retourne la reponse complete."""
+
+    # 1. Geocodage
+    geo = geocode_best(request.address, postcode=request.postcode, session=http_session())
+    return _estimate_at(request, geo)
+
+
+def process_coordinates_estimation(request: CoordinatesEstimationRequest) -> EstimationResponse:
+    """Estimation a partir de coordonnees : pas d'appel au geocodeur.
+
+    La commune vient de citycode ou, a defaut, de la transaction geolocalisee
+    la plus proche (requete KNN sur l'index GIST).
+    """
+    geo = geocoding_from_coordinates(
+        request.latitude,
+        request.longitude,
+        citycode=request.citycode,
+        postcode=request.postcode,
+        label=request.address,
+    )
+    return _estimate_at(request, geo)
+
+
+def _estimate_at(request: EstimationRequest, geo) -> EstimationResponse:
+    """Recherche de comparables et reponse pour une position deja geocodee."""
+    if geo is None:
+        return EstimationResponse(status="geocoding_failed")
+
+    # Sections demandees
+    sections = set(request.include) & VALID_SECTIONS if request.include else VALID_SECTIONS
+
+    # 2. Comparables
+    search, search_id = _search(request, geo)
+
+    return _build_response(request, geo, search, sections, search_id)
+
+
+def stream_estimation(request: EstimationRequest):
+    """Estimation section par section, des qu'elles sont disponibles (SSE).
+
+    Le geocodage sort avant la recherche de comparables ; l'evenement final
+    "status" porte le statut et le search_id (memes valeurs que /estimate).
+    Les valeurs invalides levent ValueError avant le premier evenement.
+
+    Yields:
+        (nom d'evenement, section Pydantic ou dict)
+    """
+    _build_property_input(request)
+    sections = set(request.include) & VALID_SECTIONS if request.include else VALID_SECTIONS
+
+    def _events():
+        geo = geocode_best(request.address, postcode=request.postcode, session=http_session())
+        if geo is None:
+            yield "status", {"status": "geocoding_failed", "search_id": None}
+            return
+        if "geocoding" in sections:
+            yield "geocoding", _geocoding_section(geo)
+
+        search, search_id = _search(request, geo)
+        if len(search.comparables) == 0:
+            yield "status", {"status": "no_data", "search_id": search_id}
+            return
+
+        yield from _iter_sections(request, geo, search, sections)
+        yield "status", {"status": "ok", "search_id": search_id}
+
+    return _events()
+
+
+def process_rezone(request: RezoneRequest) -> EstimationResponse | None:
+    """Recalcule une estimation precedente avec d'autres zones / coefficients.
+
+    Les comparables de la recherche d'origine sont re-decoupes en memoire ;
+    une nouvelle recherche (sans geocodage) n'a lieu que si les zones
+    depassent les candidats recuperes. Retourne None si search_id est inconnu.
+    """
+    stored = _search_store.get(request.search_id)
+    if stored is None:
+        return None
+    original, geo, search = stored
+
+    merged = original.model_copy(update={
+        "zone_config": request.zone_config,
+        "coefficient_overrides": request.coefficient_overrides or original.coefficient_overrides,
+        "include": request.include if request.include is not None else original.include,
+    })
+    sections = set(merged.include) & VALID_SECTIONS if merged.include else VALID_SECTIONS
+    zone_config = _build_zone_config(merged) or ZoneConfig()
+
+    rezoned = rezone_comparables(search, zone_config)
+    if rezoned is None:
+        rezoned = find_comparables(
+            latitude=geo.latitude,
+            longitude=geo.longitude,
+            code_commune=geo.citycode,
+            type_bien=PropertyType(merged.property_type).dvf_type,
+            surface=merged.surface,
+            nb_pieces=merged.nb_pieces,
+            zone_config=zone_config,
+        )
+        _search_store.replace(request.search_id, merged, geo, rezoned)
+
+    return _build_response(merged, geo, rezoned, sections, request.search_id)
+
+
+SWEEP_COLUMNS = [
+    "zone", "condition", "quality", "floor_params",
+    "total_multiplier", "prix_m2_ajuste", "prix_total_ajuste", "low_estimate", "high_estimate",
+]
+
+
+def process_sweep(request: SweepRequest) -> SweepResponse:
+    """Evalue l'estimation sur une grille zones x etat x qualite x parametres etage.
+
+    Les comparables sont recherches une fois (rayon le plus large de la
+    grille) puis re-decoupes en memoire pour chaque zone_config ; les
+    ajustements de toutes les combinaisons sont calcules par lot.
+    """
+    conditions = request.conditions or [request.condition]
+    qualities = request.qualities or [request.quality]
+    floor_grid = request.floor_params_grid or [None]  # None = floor_params des overrides
+    zone_grid = request.zone_configs or [request.zone_config]
+
+    n_combinations = len(zone_grid) * len(conditions) * len(qualities) * len(floor_grid)
+    if n_combinations > API_SWEEP_MAX_COMBINATIONS:
+        raise ValueError(
+            f"{n_combinations} combinaisons demandees (max {API_SWEEP_MAX_COMBINATIONS})"
+        )
+    for c in conditions:
+        PropertyCondition(c)
+    for q in qualities:
+        QualityLevel(q)
+
+    # 1. Geocodage
+    geo = geocode_best(request.address, postcode=request.postcode, session=http_session())
+    if geo is None:
+        return SweepResponse(status="geocoding_failed")
+
+    # 2. Comparables : une recherche au rayon le plus large, puis re-decoupage
+    zone_configs = [_zone_config_from_schema(zc) or ZoneConfig() for zc in zone_grid]
+    widest = max(zone_configs, key=lambda zc: zc.radius_3_km)
+    widest = replace(widest, max_comparables=max(zc.max_comparables for zc in zone_configs))
+    search_kwargs = dict(
+        latitude=geo.latitude,
+        longitude=geo.longitude,
+        code_commune=geo.citycode,
+        type_bien=PropertyType(request.property_type).dvf_type,
+        surface=request.surface,
+        nb_pieces=request.nb_pieces,
+    )
+    search = find_comparables(**search_kwargs, zone_config=widest)
+    if len(search.comparables) == 0:
+        return SweepResponse(status="no_data")
+
+    zones, prix_m2_base, low, high = [], [], [], []
+    for zc in zone_configs:
+        zone_search = rezone_comparables(search, zc)
+        if zone_search is None:
+            # Zones trop etroites pour le niveau 1 : le fallback n'a pas ete calcule
+            zone_search = find_comparables(**search_kwargs, zone_config=zc)
+
+        if len(zone_search.comparables) == 0:
+            zones.append(SweepZoneItem(
+                zone_config=_zone_config_schema(zc),
+                nb_comparables=0,
+                niveau_geo=zone_search.level_desc,
+            ))
+            prix_m2_base.append(np.nan)
+            low.append(np.nan)
+            high.append(np.nan)
+            continue
+
+        base_median, _, adjustment_factor, confidence = _base_estimate(zone_search, request.surface)
+        zones.append(SweepZoneItem(
+            zone_config=_zone_config_schema(zone_search.zone_config),
+            nb_comparables=len(zone_search.comparables),
+            niveau_geo=zone_search.level_desc,
+            prix_m2_base=round(base_median * adjustment_factor, 2),
+            adjustment_factor=round(adjustment_factor, 4),
+            confidence_level=confidence.level,
+        ))
+        prix_m2_base.append(base_median * adjustment_factor)
+        low.append(confidence.low_estimate)
+        high.append(confidence.high_estimate)
+
+    # 3. Ajustements : un lot (zone x etat x qualite) par jeu de parametres etage
+    n_zones, n_cond, n_qual, n_floor = len(zones), len(conditions), len(qualities), len(floor_grid)
+    per_floor = n_zones * n_cond * n_qual
+    zone_idx, cond_idx, qual_idx = (
+        a.ravel() for a in np.indices((n_zones, n_cond, n_qual))
+    )
+    properties = pd.DataFrame([asdict(_build_property_input(request))] * per_floor)
+    properties["condition"] = np.asarray(conditions, dtype=object)[cond_idx]
+    properties["quality"] = np.asarray(qualities, dtype=object)[qual_idx]
+
+    prix_m2_base = np.asarray(prix_m2_base)[zone_idx]
+    base_price = np.nan_to_num(prix_m2_base * request.surface)
+    base_overrides = _build_coefficient_overrides(request) or CoefficientOverrides()
+
+    matrix = np.empty((per_floor, n_floor, len(SWEEP_COLUMNS)))
+    for f, fp in enumerate(floor_grid):
+        overrides = base_overrides if fp is None else replace(
+            base_overrides, floor_params=_floor_params_from_schema(fp)
+        )
+        batch = compute_adjustments_batch(properties, base_price, overrides)
+        mult = batch.total_multiplier
+        matrix[:, f] = np.column_stack([
+            zone_idx, cond_idx, qual_idx, np.full(per_floor, f),
+            mult,
+            round_array(prix_m2_base * mult, 2),
+            np.where(np.isnan(prix_m2_base), np.nan, batch.adjusted_price),
+            round_array(np.asarray(low)[zone_idx] * mult, 0),
+            round_array(np.asarray(high)[zone_idx] * mult, 0),
+        ])
+
+    rows = [
+        [int(v) for v in row[:4]] + [None if np.isnan(v) else float(v) for v in row[4:]]
+        for row in matrix.reshape(-1, len(SWEEP_COLUMNS))
+    ]
+
+    return SweepResponse(
+        status="ok",
+        conditions=conditions,
+        qualities=qualities,
+        floor_params=floor_grid,
+        zones=zones,
+        columns=SWEEP_COLUMNS,
+        rows=rows,
     )
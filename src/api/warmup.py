@@ -0,0 +1,108 @@
+"""Warm-up de l'API au demarrage (lifespan FastAPI).
+
+Les imports lourds (pandas, NumPy, modeles d'ajustement) ne sont faits qu'ici
+ou au premier appel d'un endpoint d'estimation. Le warm-up les charge, ouvre
+les connexions du pool (avec leurs prepared statements), la session HTTP du
+geocodeur (handshake TLS) et la copie en memoire des marts, dans un thread :
+la sonde de vie repond tout de suite, la sonde de disponibilite attend la fin.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import text
+
+from src.config import API_MART_MIRROR, DB_PREPARED_STATEMENTS, GEOCODING_API_URL
+from src.db import get_engine
+
+
+def _import_modules():
+    from src.api import service  # noqa: F401  pandas, NumPy, modeles, geocodeur
+
+
+def _open_pool() -> int:
+    """Ouvre les connexions permanentes du pool et y prepare les requetes d'estimation."""
+    from src.estimation.queries import prepare_all
+
+    engine = get_engine()
+    size = engine.pool.size() if hasattr(engine.pool, "size") else 1  # NullPool (pgbouncer) : 1
+    conns = [engine.connect() for _ in range(max(size, 1))]
+    try:
+        for conn in conns:
+            conn.execute(text("SELECT 1"))
+            if DB_PREPARED_STATEMENTS:
+                prepare_all(conn)
+            conn.commit()
+    finally:
+        for conn in conns:
+            conn.close()
+    return len(conns)
+
+
+def _warm_geocoder():
+    """Premier aller-retour (DNS + TLS) sur la session partagee du geocodeur."""
+    from src.estimation.geocoder import http_session
+
+    http_session().get(GEOCODING_API_URL, params={"q": "paris", "limit": 1}, timeout=5)
+
+
+def _load_marts():
+    from src.api.mart_mirror import mart_mirror
+
+    mart_mirror.start()
+
+
+class Warmup:
+    """Etat du warm-up ("off" tant qu'il n'a pas ete lance, ex. en test)."""
+
+    def __init__(self):
+        self.status = "off"  # off | running | done
+        self.steps: dict[str, float] = {}
+        self.errors: dict[str, str] = {}
+        self.total_s: float | None = None
+        self._thread: threading.Thread | None = None
+
+    @property
+    def ready(self) -> bool:
+        return self.status != "running"
+
+    def _step(self, name: str, func):
+        start = time.perf_counter()
+        try:
+            func()
+        except Exception as e:
+            self.errors[name] = f"{type(e).__name__}: {e}"
+            print(f"[WARMUP] {name} echoue: {self.errors[name]}")
+        self.steps[name] = round(time.perf_counter() - start, 3)
+
+    def run(self):
+        """Execute le warm-up (imports et reseau en parallele, puis marts)."""
+        start = time.perf_counter()
+        self.status = "running"
+        with ThreadPoolExecutor(max_workers=3, thread_name_prefix="warmup") as pool:
+            for name, func in (("imports", _import_modules), ("pool", _open_pool), ("geocoder", _warm_geocoder)):
+                pool.submit(self._step, name, func)
+        if API_MART_MIRROR:
+            self._step("mart_mirror", _load_marts)
+        self.total_s = round(time.perf_counter() - start, 3)
+        self.status = "done"
+        print(f"[WARMUP] Termine en {self.total_s}s {self.steps}")
+
+    def start(self):
+        """Lance le warm-up dans un thread (la sonde de vie repond pendant ce temps)."""
+        if self._thread is None:
+            self.status = "running"
+            self._thread = threading.Thread(target=self.run, name="warmup", daemon=True)
+            self._thread.start()
+
+    def wait(self, timeout: float | None = None) -> bool:
+        if self._thread is not None:
+            self._thread.join(timeout)
+        return self.ready
+
+    def state(self) -> dict:
+        return {"status": self.status, "total_s": self.total_s, "steps": self.steps, "errors": self.errors}
+
+
+warmup = Warmup()
@@ -6,9 +6,12 @@ from streamlit_folium import st_folium
 
 from src.estimation.estimator import EstimationResult
 from src.app.utils.css import BG_CARD, TEXT_PRIMARY, BORDER, GOLD
-
-# Couleurs par zone (zone 3 plus claire pour visibilite sur fond sombre)
-ZONE_COLORS = {1: "#D4A843", 2: "#58A6FF", 3: "#B0BAC6"}
+from src.app.utils.plot_data import (
+    ZONE_COLORS,
+    comparables_geojson,
+    downsample,
+    marker_colors,
+)
 
 
 def render_map(result: EstimationResult):
@@ -55,59 +58,21 @@ def render_map(result: EstimationResult):
         icon=folium.Icon(color="orange", icon="home", prefix="fa"),
     ).add_to(m)
 
-    # Marqueurs des comparables
+    # Comparables : une seule couche GeoJSON (popups et couleurs vectorises)
     comparables = result.comparables
+    shown = comparables
     if "latitude" in comparables.columns and "longitude" in comparables.columns:
-        for _, row in comparables.iterrows():
-            if row["latitude"] and row["longitude"]:
-                # Couleur par zone si disponible, sinon par rapport de prix
-                if has_zones and "zone" in row.index:
-                    color = ZONE_COLORS.get(int(row["zone"]), "#8B949E")
-                else:
-                    ratio = row["prix_m2"] / result.prix_m2_estime if result.prix_m2_estime > 0 else 1
-                    if ratio > 1.1:
-                        color = "#F85149"
-                    elif ratio < 0.9:
-                        color = "#3FB950"
-                    else:
-                        color = "#58A6FF"
-
-                # Popup enrichi
-                dist_str = ""
-                if "distance_m" in row.index and row["distance_m"] is not None:
-                    d = row["distance_m"]
-                    dist_str = f"Distance: {d:.0f} m<br>" if d < 1000 else f"Distance: {d/1000:.1f} km<br>"
-
-                zone_str = ""
-                if has_zones and "zone" in row.index:
-                    zone_str = f"Zone: {int(row['zone'])}<br>"
-
-                # Adresse si disponible
-                addr_str = ""
-                if "adresse" in row.index and row.get("adresse"):
-                    addr_str = f"{row['adresse']}<br>"
-
-                popup_text = (
-                    f"<b>{row.get('nom_commune', '')}</b><br>"
-                    f"{addr_str}"
-                    f"{zone_str}"
-                    f"{dist_str}"
-                    f"Date: {row['date_mutation']}<br>"
-                    f"Prix: {row['valeur_fonciere']:,.0f} EUR<br>"
-                    f"Surface: {row['surface']:.0f} m\u00b2<br>"
-                    f"Prix/m\u00b2: {row['prix_m2']:,.0f} EUR"
-                )
-
-                folium.CircleMarker(
-                    [row["latitude"], row["longitude"]],
-                    radius=7,
-                    popup=popup_text,
-                    color="#FFFFFF",
-                    weight=1,
-                    fill=True,
-                    fill_color=color,
-                    fill_opacity=0.85,
-                ).add_to(m)
+        shown = downsample(comparables)
+        colors = marker_colors(shown, result.prix_m2_estime, by_zone=has_zones)
+        folium.GeoJson(
+            comparables_geojson(shown, colors),
+            name="Comparables",
+            marker=folium.CircleMarker(
+                radius=7, color="#FFFFFF", weight=1, fill=True, fill_opacity=0.85,
+            ),
+            style_function=lambda feature: {"fillColor": feature["properties"]["color"]},
+            popup=folium.GeoJsonPopup(fields=["popup"], labels=False),
+        ).add_to(m)
 
     # Legende
     if has_zones and result.zone_config:
@@ -139,3 +104,5 @@ def render_map(result: EstimationResult):
     m.get_root().html.add_child(folium.Element(legend_html))
 
     st_folium(m, width=700, height=450, returned_objects=[])
+    if len(shown) < len(comparables):
+        st.caption(f"{len(shown)} comparables affiches sur {len(comparables)} (echantillon reparti par distance)")
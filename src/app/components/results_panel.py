@@ -13,6 +13,7 @@ from src.app.models.adjustments import (
 )
 from src.app.components.map_view import render_map
 from src.app.components.stats_panel import render_stats_chart, render_stats_metrics
+from src.app.utils.plot_data import downsample, hover_texts
 from src.app.utils.formatting import (
     format_price,
     format_price_m2,
@@ -288,35 +289,26 @@ def _render_scatter(result: EstimationResult, estimated_prix_m2: float, surface:
 
     zone_sizes = {1: 10, 2: 8, 3: 6}
 
+    # Mediane et effectifs sur tous les comparables, points affiches echantillonnes
+    n_total = len(df)
+    zone_counts = df["zone"].value_counts() if has_zones else None
+    df = downsample(df)
+
     if has_zones:
+        texts = hover_texts(df)
         for z in [3, 2, 1]:  # Dessiner Z3 en dessous, Z1 au-dessus
             zone_df = df[df["zone"] == z]
             if len(zone_df) == 0:
                 continue
             zc = result.zone_config
             if z == 1:
-                zone_label = f"Zone 1 (0-{zc.radius_1_km} km) &middot; {len(zone_df)}"
+                zone_label = f"Zone 1 (0-{zc.radius_1_km} km) &middot; {zone_counts[z]}"
             elif z == 2:
-                zone_label = f"Zone 2 ({zc.radius_1_km}-{zc.radius_2_km} km) &middot; {len(zone_df)}"
+                zone_label = f"Zone 2 ({zc.radius_1_km}-{zc.radius_2_km} km) &middot; {zone_counts[z]}"
             else:
-                zone_label = f"Zone 3 ({zc.radius_2_km}-{zc.radius_3_km} km) &middot; {len(zone_df)}"
-
-            hover_texts = []
-            for _, row in zone_df.iterrows():
-                dist = format_distance(row.get("distance_m"))
-                addr = row.get("adresse", "")
-                addr_line = f"{addr}<br>" if addr else ""
-                hover_texts.append(
-                    f"<b>{row.get('nom_commune', '')}</b><br>"
-                    f"{addr_line}"
-                    f"Zone {z} &middot; {dist}<br>"
-                    f"Surface: {row['surface']:.0f} m\u00b2<br>"
-                    f"Prix/m\u00b2: {row['prix_m2']:,.0f} EUR<br>"
-                    f"Prix: {row['valeur_fonciere']:,.0f} EUR<br>"
-                    f"Date: {row['date_mutation']}"
-                )
-
-            fig.add_trace(go.Scatter(
+                zone_label = f"Zone 3 ({zc.radius_2_km}-{zc.radius_3_km} km) &middot; {zone_counts[z]}"
+
+            fig.add_trace(go.Scattergl(
                 x=zone_df["surface"],
                 y=zone_df["prix_m2"],
                 mode="markers",
@@ -326,12 +318,12 @@ def _render_scatter(result: EstimationResult, estimated_prix_m2: float, surface:
                     line=dict(width=1, color="rgba(255,255,255,0.3)"),
                     opacity=0.9 if z == 1 else 0.75,
                 ),
-                text=hover_texts,
+                text=texts.loc[zone_df.index],
                 hovertemplate="%{text}<extra></extra>",
                 name=zone_label,
             ))
     else:
-        fig.add_trace(go.Scatter(
+        fig.add_trace(go.Scattergl(
             x=df["surface"],
             y=df["prix_m2"],
             mode="markers",
@@ -419,6 +411,8 @@ def _render_scatter(result: EstimationResult, estimated_prix_m2: float, surface:
         unsafe_allow_html=True,
     )
     st.plotly_chart(fig, use_container_width=True)
+    if len(df) < n_total:
+        st.caption(f"{len(df)} comparables affiches sur {n_total} (echantillon reparti par distance)")
 
 
 def _render_comparables_table(result: EstimationResult):
@@ -3,56 +3,24 @@
 import streamlit as st
 import pandas as pd
 import plotly.graph_objects as go
-from sqlalchemy import text
 
-from src.db import get_engine
 from src.estimation.estimator import EstimationResult
+from src.estimation.geocoder import departement_of
 from src.app.utils.formatting import format_price_m2, format_percentage
+from src.app.utils.cache import cached_historical_data, current_generation
 from src.app.utils.css import get_plotly_dark_theme, GOLD, GOLD_MUTED
 
 
-def _get_historical_data(code_commune: str, code_departement: str, type_bien: str) -> pd.DataFrame:
-    """Recupere l'historique des medianes par semestre."""
-    engine = get_engine()
-
-    # Niveau commune
-    query = text("""
-        SELECT annee, semestre, nb_transactions, median_prix_m2,
-               q1_prix_m2, q3_prix_m2
-        FROM mart.stats_commune
-        WHERE code_commune = :code_commune AND type_bien = :type_bien
-        ORDER BY annee, semestre
-    """)
-    df = pd.read_sql(query, engine, params={"code_commune": code_commune, "type_bien": type_bien})
-
-    if len(df) < 2:
-        # Fallback departement
-        query = text("""
-            SELECT annee, semestre, nb_transactions, median_prix_m2,
-                   q1_prix_m2, q3_prix_m2
-            FROM mart.stats_departement
-            WHERE code_departement = :code_departement AND type_bien = :type_bien
-            ORDER BY annee, semestre
-        """)
-        df = pd.read_sql(query, engine, params={"code_departement": code_departement, "type_bien": type_bien})
-        if len(df) > 0:
-            df["source"] = "departement"
-        return df
-
-    df["source"] = "commune"
-    return df
-
-
 def render_stats_chart(result: EstimationResult):
     """Affiche le graphique Plotly d'evolution des prix."""
     if result.nb_comparables == 0:
         return
 
     code_commune = result.geocoding.citycode
-    code_departement = code_commune[:2] if len(code_commune) >= 2 else code_commune
+    code_departement = departement_of(code_commune)
     type_bien = result.comparables["type_bien"].iloc[0] if len(result.comparables) > 0 else "appartement"
 
-    hist = _get_historical_data(code_commune, code_departement, type_bien)
+    hist = cached_historical_data(current_generation(), code_commune, code_departement, type_bien)
 
     if len(hist) == 0:
         st.caption("Pas de donnees historiques disponibles.")
@@ -1,6 +1,9 @@
 """Moteur de coefficients d'ajustement post-estimation DVF."""
 
-from dataclasses import dataclass, field
+from dataclasses import MISSING, dataclass, field, fields
+
+import numpy as np
+import pandas as pd
 
 from src.app.models.property_input import (
     PropertyInput,
@@ -100,6 +103,10 @@ CHARACTERISTIC_ADJUSTMENTS: dict[str, float] = {
     "ravalement_recent": 0.01,
 }
 
+# Plafonds du multiplicateur total
+MULTIPLIER_MIN = 0.70
+MULTIPLIER_MAX = 1.40
+
 
 def get_default_coefficients() -> dict:
     """Retourne tous les coefficients par defaut (cles str, serialisable)."""
@@ -244,7 +251,7 @@ def compute_adjustments(
 
     # Multiplicateur total (produit), plafonne a [0.70, 1.40]
     total = type_adj * floor_adj * char_adj * cond_adj * qual_adj * cons_adj
-    total = max(0.70, min(1.40, round(total, 4)))
+    total = max(MULTIPLIER_MIN, min(MULTIPLIER_MAX, round(total, 4)))
 
     adjusted_price = round(base_price * total, 0)
 
@@ -260,3 +267,203 @@ def compute_adjustments(
         adjusted_price=adjusted_price,
         explanations=explanations,
     )
+
+
+# -- Evaluation par lot (tableaux NumPy) --
+
+
+@dataclass(frozen=True)
+class CompiledCoefficients:
+    """Coefficients resolus une fois (defauts + overrides), cles str."""
+
+    type: dict[str, float]
+    quality: dict[str, float]
+    condition: dict[str, float]
+    construction: dict[str, float]
+    characteristics: dict[str, float]
+    floor: FloorParams
+    overrides: CoefficientOverrides | None = None
+
+
+def compile_coefficients(overrides: CoefficientOverrides | None = None) -> CompiledCoefficients:
+    """Resout les dictionnaires de coefficients pour un jeu d'overrides."""
+    ov = overrides or CoefficientOverrides()
+
+    def _str_keys(defaults: dict, overrides_dict: dict[str, float] | None) -> dict[str, float]:
+        return {
+            (k.value if hasattr(k, "value") else str(k)): v
+            for k, v in _resolve_coeff(defaults, overrides_dict).items()
+        }
+
+    return CompiledCoefficients(
+        type=_str_keys(TYPE_COEFFICIENTS, ov.type_coefficients),
+        quality=_str_keys(QUALITY_COEFFICIENTS, ov.quality_coefficients),
+        condition=_str_keys(CONDITION_COEFFICIENTS, ov.condition_coefficients),
+        construction=_str_keys(CONSTRUCTION_COEFFICIENTS, ov.construction_coefficients),
+        characteristics=_str_keys(CHARACTERISTIC_ADJUSTMENTS, ov.characteristic_adjustments),
+        floor=ov.floor_params or FloorParams(),
+        overrides=overrides,
+    )
+
+
+_PROPERTY_DEFAULTS = {f.name: f.default for f in fields(PropertyInput) if f.default is not MISSING}
+
+
+def _row_to_property(row: dict) -> PropertyInput:
+    """Reconstruit un PropertyInput depuis une ligne du lot (NaN -> None)."""
+    values = {
+        k: (None if not isinstance(v, str) and pd.isna(v) else v)
+        for k, v in row.items()
+        if k in ("property_type", "surface") or k in _PROPERTY_DEFAULTS
+    }
+    values.setdefault("surface", 0.0)  # sans effet sur les ajustements
+    for name in ("nb_pieces", "nb_salles_de_bain", "etage", "nb_etages_immeuble"):
+        if values.get(name) is not None:
+            values[name] = int(values[name])
+    values["property_type"] = PropertyType(values["property_type"])
+    values["construction_period"] = ConstructionPeriod(
+        values.get("construction_period") or ConstructionPeriod.UNKNOWN
+    )
+    values["condition"] = PropertyCondition(values.get("condition") or PropertyCondition.STANDARD)
+    values["quality"] = QualityLevel(values.get("quality") or QualityLevel.COMPARABLE)
+    return PropertyInput(**values)
+
+
+@dataclass
+class BatchAdjustments:
+    """Ajustements d'un lot de biens : une composante = un tableau."""
+
+    base_price: np.ndarray
+    type_adjustment: np.ndarray
+    floor_adjustment: np.ndarray
+    characteristics_adjustment: np.ndarray
+    condition_adjustment: np.ndarray
+    quality_adjustment: np.ndarray
+    construction_adjustment: np.ndarray
+    total_multiplier: np.ndarray
+    adjusted_price: np.ndarray
+    properties: pd.DataFrame
+    coefficients: CompiledCoefficients
+
+    def __len__(self) -> int:
+        return len(self.total_multiplier)
+
+    def to_frame(self) -> pd.DataFrame:
+        """Composantes et totaux en DataFrame (meme index que le lot)."""
+        return pd.DataFrame({
+            "base_price": self.base_price,
+            "type_adjustment": self.type_adjustment,
+            "floor_adjustment": self.floor_adjustment,
+            "characteristics_adjustment": self.characteristics_adjustment,
+            "condition_adjustment": self.condition_adjustment,
+            "quality_adjustment": self.quality_adjustment,
+            "construction_adjustment": self.construction_adjustment,
+            "total_multiplier": self.total_multiplier,
+            "adjusted_price": self.adjusted_price,
+        }, index=self.properties.index)
+
+    def breakdown(self, i: int) -> AdjustmentBreakdown:
+        """AdjustmentBreakdown complet (avec explications) du i-eme bien, calcule a la demande."""
+        prop = _row_to_property(self.properties.iloc[i].to_dict())
+        return compute_adjustments(prop, float(self.base_price[i]), self.coefficients.overrides)
+
+    def explanations(self, i: int) -> list[str]:
+        """Explications du i-eme bien (generees a la demande)."""
+        return self.breakdown(i).explanations
+
+
+def _column(df: pd.DataFrame, name: str) -> pd.Series:
+    if name in df.columns:
+        return df[name]
+    return pd.Series(_PROPERTY_DEFAULTS.get(name), index=df.index)
+
+
+def _lookup(values: pd.Series, table: dict[str, float]) -> np.ndarray:
+    """Coefficient par valeur (enum ou str), 1.0 si inconnue."""
+    keys = values.map(lambda v: v.value if hasattr(v, "value") else v)
+    return keys.map(table).fillna(1.0).to_numpy(dtype=float)
+
+
+def round_array(values: np.ndarray, ndigits: int) -> np.ndarray:
+    """Meme arrondi que round() Python, element par element.
+
+    np.round arrondit x * 10**n, qui peut basculer d'un cote ou de l'autre
+    d'une demi-unite (0.96305 -> 0.963 au lieu de 0.9631) : les valeurs
+    proches d'une demi-unite sont reprises avec round().
+    """
+    out = np.round(values, ndigits)
+    scaled = values * 10.0 ** ndigits
+    near_half = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    out[near_half] = [round(v, ndigits) for v in values[near_half].tolist()]
+    return out
+
+
+def compute_adjustments_batch(
+    properties: pd.DataFrame,
+    base_price,
+    overrides: CoefficientOverrides | CompiledCoefficients | None = None,
+) -> BatchAdjustments:
+    """
+    Calcule les ajustements d'un lot de biens en operations vectorisees.
+
+    Args:
+        properties: Une ligne par bien, colonnes = champs de PropertyInput
+            (property_type obligatoire, les autres prennent leur defaut).
+        base_price: Prix de base (scalaire ou un par bien).
+        overrides: Surcharges, ou coefficients deja compiles (a reutiliser
+            entre plusieurs lots).
+
+    Returns:
+        BatchAdjustments, memes valeurs que compute_adjustments bien par bien ;
+        les explications ne sont construites que via explanations(i).
+    """
+    coeffs = overrides if isinstance(overrides, CompiledCoefficients) else compile_coefficients(overrides)
+    n = len(properties)
+    base = np.broadcast_to(np.asarray(base_price, dtype=float), (n,)).copy()
+
+    # 1. Type, 4-6. Etat / qualite / construction
+    type_adj = _lookup(properties["property_type"], coeffs.type)
+    cond_adj = _lookup(_column(properties, "condition"), coeffs.condition)
+    qual_adj = _lookup(_column(properties, "quality"), coeffs.quality)
+    cons_adj = _lookup(_column(properties, "construction_period"), coeffs.construction)
+
+    # 2. Etage (NaN = non renseigne -> 1.0)
+    fp = coeffs.floor
+    etage = pd.to_numeric(_column(properties, "etage"), errors="coerce").to_numpy(dtype=float)
+    nb_etages = pd.to_numeric(_column(properties, "nb_etages_immeuble"), errors="coerce").to_numpy(dtype=float)
+    ascenseur = _column(properties, "ascenseur").fillna(False).to_numpy(dtype=bool)
+
+    above = np.nan_to_num(etage - 3, nan=0.0)
+    bonus = np.minimum(above * fp.elevator_bonus_per_floor, fp.max_elevator_bonus)
+    penalty = np.minimum(above * fp.no_elevator_penalty_per_floor, fp.max_no_elevator_penalty)
+    floor_adj = np.select(
+        [etage == 0, (etage > 3) & ascenseur, etage > 3],
+        [1.0 - fp.ground_floor_discount, 1.0 + bonus, 1.0 - penalty],
+        default=1.0,
+    )
+    last_floor = (np.nan_to_num(nb_etages) != 0) & (etage == nb_etages) & (etage > 0)
+    floor_adj = round_array(floor_adj + np.where(last_floor, fp.last_floor_bonus, 0.0), 4)
+
+    # 3. Caracteristiques (somme additive, dans le meme ordre que compute_adjustments)
+    char_sum = np.zeros(n)
+    for attr_name, coeff in coeffs.characteristics.items():
+        if attr_name in properties.columns:
+            char_sum += coeff * properties[attr_name].fillna(False).to_numpy(dtype=bool)
+    char_adj = 1.0 + char_sum
+
+    total = type_adj * floor_adj * char_adj * cond_adj * qual_adj * cons_adj
+    total = np.clip(round_array(total, 4), MULTIPLIER_MIN, MULTIPLIER_MAX)
+
+    return BatchAdjustments(
+        base_price=base,
+        type_adjustment=type_adj,
+        floor_adjustment=floor_adj,
+        characteristics_adjustment=char_adj,
+        condition_adjustment=cond_adj,
+        quality_adjustment=qual_adj,
+        construction_adjustment=cons_adj,
+        total_multiplier=total,
+        adjusted_price=round_array(base * total, 0),
+        properties=properties,
+        coefficients=coeffs,
+    )
@@ -7,9 +7,9 @@ sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
 
 import streamlit as st
 
-from src.estimation.estimator import estimate
-from src.estimation.geocoder import geocode
+from src.estimation.estimator import rezone_estimation
 from src.estimation.zone_config import ZoneConfig
+from src.app.utils.cache import cached_estimate, cached_geocode, get_cached_engine
 from src.app.utils.css import inject_global_css, GOLD, TEXT_SECONDARY
 from src.app.components.admin_panel import render_admin_panel
 from src.app.components.results_panel import render_results
@@ -35,6 +35,9 @@ st.set_page_config(
 # -- Styles CSS --
 inject_global_css()
 
+# -- Pool de connexions partage entre sessions --
+get_cached_engine()
+
 # -- Sidebar --
 with st.sidebar:
     st.markdown(
@@ -93,7 +96,7 @@ if st.button("Rechercher l'adresse", key="btn_geocode", use_container_width=True
     if address_input.strip():
         with st.spinner("Geocodage..."):
             try:
-                results = geocode(
+                results = cached_geocode(
                     address_input.strip(),
                     postcode=postcode_input.strip() or None,
                 )
@@ -317,12 +320,11 @@ if estimate_clicked and geo_result:
     zone_cfg = admin_overrides.zone_config if admin_overrides else None
 
     with st.spinner("Estimation en cours..."):
-        result = estimate(
-            address=geo_result.label,
+        result = cached_estimate(
+            geo_result,
             type_bien=prop.dvf_type_bien,
             surface=prop.surface,
             nb_pieces=prop.dvf_nb_pieces,
-            postcode=geo_result.postcode,
             zone_config=zone_cfg,
         )
 
@@ -331,6 +333,7 @@ if estimate_clicked and geo_result:
     else:
         st.session_state["estimation_result"] = result
         st.session_state["estimation_prop"] = prop
+        st.session_state["estimation_zone_cfg"] = zone_cfg or ZoneConfig()
 
 # ==========================================
 # RESULTATS
@@ -343,25 +346,30 @@ if "estimation_result" in st.session_state:
 
     # Detecter changement de zone_config ou donnees obsoletes -> re-estimer
     current_zone_cfg = admin_overrides.zone_config if admin_overrides else ZoneConfig()
-    stored_zone_cfg = result.zone_config or ZoneConfig()
+    # Zones demandees (result.zone_config est None quand un fallback est utilise)
+    stored_zone_cfg = st.session_state.get("estimation_zone_cfg") or result.zone_config or ZoneConfig()
     needs_refresh = (
         current_zone_cfg != stored_zone_cfg
         or "adresse" not in result.comparables.columns
     )
 
     if needs_refresh and prop:
-        with st.spinner("Recalcul avec les nouvelles zones..."):
-            new_result = estimate(
-                address=result.geocoding.label,
-                type_bien=prop.dvf_type_bien,
-                surface=prop.surface,
-                nb_pieces=prop.dvf_nb_pieces,
-                postcode=result.geocoding.postcode,
-                zone_config=current_zone_cfg,
-                geocoding=result.geocoding,
-            )
+        # Re-decoupage en memoire des candidats deja recuperes (sans requete)
+        new_result = None
+        if "adresse" in result.comparables.columns:
+            new_result = rezone_estimation(result, current_zone_cfg)
+        if new_result is None:
+            with st.spinner("Recalcul avec les nouvelles zones..."):
+                new_result = cached_estimate(
+                    result.geocoding,
+                    type_bien=prop.dvf_type_bien,
+                    surface=prop.surface,
+                    nb_pieces=prop.dvf_nb_pieces,
+                    zone_config=current_zone_cfg,
+                )
         if new_result:
             st.session_state["estimation_result"] = new_result
+            st.session_state["estimation_zone_cfg"] = current_zone_cfg
             st.rerun()
 
     if prop:
@@ -0,0 +1,150 @@
+"""Cache serveur Streamlit : ressources partagees et resultats de requetes.
+
+Streamlit re-execute tout le script a chaque interaction. Les ressources
+(engine, session HTTP) sont partagees entre sessions via st.cache_resource ;
+les resultats de requetes (comparables, marts, geocodage) via st.cache_data,
+avec la generation des donnees en cle : un refresh des marts invalide tout.
+"""
+
+from dataclasses import replace
+
+import pandas as pd
+import requests
+import streamlit as st
+
+from src.config import APP_CACHE_TTL_S, APP_CACHE_MAX_ENTRIES
+from src.db import get_engine, set_pool_profile
+from src.estimation.comparables import ComparableSearch, find_comparables, rezone_comparables
+from src.estimation.estimator import (
+    EstimationResult,
+    build_estimation,
+    get_data_generation,
+    get_zone_stats,
+)
+from src.estimation.geocoder import GeocodingResult, geocode
+from src.estimation.queries import SEMESTER_COMMUNE, SEMESTER_DEPARTEMENT, read_df
+from src.estimation.zone_config import ZoneConfig
+
+# Frequence de relecture de mart.data_generation
+GENERATION_TTL_S = 60
+
+
+@st.cache_resource
+def get_cached_engine():
+    """Engine SQLAlchemy (pool unique pour toutes les sessions)."""
+    set_pool_profile("streamlit")
+    return get_engine()
+
+
+@st.cache_resource
+def get_geocoding_session() -> requests.Session:
+    """Session HTTP keep-alive vers l'API de geocodage."""
+    return requests.Session()
+
+
+@st.cache_data(ttl=GENERATION_TTL_S, show_spinner=False)
+def current_generation() -> int:
+    """Generation des donnees, relue au plus une fois par minute."""
+    return get_data_generation()
+
+
+@st.cache_data(ttl=APP_CACHE_TTL_S, max_entries=APP_CACHE_MAX_ENTRIES, show_spinner=False)
+def cached_geocode(address: str, postcode: str | None = None) -> list[GeocodingResult]:
+    """Geocodage (independant de la generation des donnees DVF)."""
+    return geocode(address, postcode=postcode, session=get_geocoding_session())
+
+
+@st.cache_data(ttl=APP_CACHE_TTL_S, max_entries=APP_CACHE_MAX_ENTRIES, show_spinner=False)
+def cached_comparables(
+    generation: int,
+    latitude: float,
+    longitude: float,
+    code_commune: str,
+    type_bien: str,
+    surface: float | None,
+    nb_pieces: int | None,
+    radii_km: tuple[float, float, float],
+    max_comparables: int,
+) -> ComparableSearch:
+    """Comparables, cles sur les seuls parametres de la requete (pas les poids)."""
+    zone_config = ZoneConfig(
+        radius_1_km=radii_km[0],
+        radius_2_km=radii_km[1],
+        radius_3_km=radii_km[2],
+        max_comparables=max_comparables,
+    )
+    return find_comparables(
+        latitude=latitude,
+        longitude=longitude,
+        code_commune=code_commune,
+        type_bien=type_bien,
+        surface=surface,
+        nb_pieces=nb_pieces,
+        zone_config=zone_config,
+    )
+
+
+@st.cache_data(ttl=APP_CACHE_TTL_S, max_entries=APP_CACHE_MAX_ENTRIES, show_spinner=False)
+def cached_zone_stats(generation: int, code_commune: str, type_bien: str) -> dict | None:
+    """Ligne mart.zone_stats."""
+    return get_zone_stats(code_commune, type_bien)
+
+
+@st.cache_data(ttl=APP_CACHE_TTL_S, max_entries=APP_CACHE_MAX_ENTRIES, show_spinner=False)
+def cached_historical_data(
+    generation: int, code_commune: str, code_departement: str, type_bien: str
+) -> pd.DataFrame:
+    """Historique semestriel commune (fallback departement si < 2 points)."""
+    df = read_df(SEMESTER_COMMUNE, {"code_commune": code_commune, "type_bien": type_bien})
+
+    if len(df) < 2:
+        df = read_df(SEMESTER_DEPARTEMENT, {"code_departement": code_departement, "type_bien": type_bien})
+        if len(df) > 0:
+            df["source"] = "departement"
+        return df
+
+    df["source"] = "commune"
+    return df
+
+
+def cached_estimate(
+    geo: GeocodingResult,
+    type_bien: str,
+    surface: float,
+    nb_pieces: int | None = None,
+    zone_config: ZoneConfig | None = None,
+) -> EstimationResult:
+    """Estimation a partir des comparables et stats en cache.
+
+    Les candidats sont recuperes une fois jusqu'au R3 par defaut puis
+    re-decoupes en memoire : reduire les rayons ou changer les poids ne
+    relance aucune requete, seul un R3 plus grand en declenche une.
+    """
+    zone_config = zone_config or ZoneConfig()
+    generation = current_generation()
+
+    def _search(radii_km: tuple[float, float, float]) -> ComparableSearch:
+        return cached_comparables(
+            generation,
+            geo.latitude,
+            geo.longitude,
+            geo.citycode,
+            type_bien,
+            surface,
+            nb_pieces,
+            radii_km,
+            zone_config.max_comparables,
+        )
+
+    default = ZoneConfig()
+    search = rezone_comparables(
+        _search((default.radius_1_km, default.radius_2_km, default.radius_3_km)), zone_config
+    )
+    if search is None:
+        # Zones hors des candidats recuperes (ou fallback a calculer)
+        search = _search((zone_config.radius_1_km, zone_config.radius_2_km, zone_config.radius_3_km))
+        if search.zone_config is not None:
+            search = replace(search, zone_config=zone_config)
+
+    zone_stats = cached_zone_stats(generation, geo.citycode, type_bien) if len(search.comparables) else None
+    return build_estimation(geo, search, surface, zone_stats)
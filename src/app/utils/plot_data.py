@@ -0,0 +1,117 @@
+"""Preparation vectorisee des comparables pour la carte et le nuage de points.
+
+Les textes de survol / popups sont construits colonne par colonne et les
+points envoyes en une seule couche (GeoJSON / Scattergl) au lieu d'un objet
+par comparable.
+"""
+
+import numpy as np
+import pandas as pd
+
+from src.config import APP_MAX_PLOT_POINTS
+
+# Couleurs par zone (zone 3 plus claire pour visibilite sur fond sombre)
+ZONE_COLORS = {1: "#D4A843", 2: "#58A6FF", 3: "#B0BAC6"}
+DEFAULT_COLOR = "#8B949E"
+
+# Couleurs par rapport au prix estime (sans zones)
+PRICE_COLORS = {"above": "#F85149", "near": "#58A6FF", "below": "#3FB950"}
+
+
+def downsample(df: pd.DataFrame, max_points: int | None = None) -> pd.DataFrame:
+    """Garde au plus max_points lignes, reparties uniformement.
+
+    Les comparables etant tries par distance, un pas regulier conserve la
+    repartition par distance (et donc par zone). Deterministe : pas de
+    re-tirage a chaque rerun Streamlit.
+    """
+    if max_points is None:
+        max_points = APP_MAX_PLOT_POINTS
+    if max_points <= 0 or len(df) <= max_points:
+        return df
+    idx = np.linspace(0, len(df) - 1, max_points).round().astype(int)
+    return df.iloc[np.unique(idx)]
+
+
+def _fmt(series: pd.Series, pattern: str) -> pd.Series:
+    return series.map(pattern.format)
+
+
+def format_distances(distance_m: pd.Series) -> pd.Series:
+    """Version vectorisee de format_distance : '850 m', '1.2 km', 'N/A'."""
+    d = pd.to_numeric(distance_m, errors="coerce")
+    metres = _fmt(d.fillna(0), "{:.0f} m")
+    km = _fmt(d.fillna(0) / 1000, "{:.1f} km")
+    out = metres.where(d < 1000, km)
+    return out.where(d.notna(), "N/A")
+
+
+def hover_texts(df: pd.DataFrame) -> pd.Series:
+    """Texte HTML de survol / popup de chaque comparable."""
+    empty = pd.Series("", index=df.index)
+
+    def col(name: str) -> pd.Series:
+        if name not in df.columns:
+            return empty
+        return df[name].fillna("").astype(str)
+
+    text = "<b>" + col("nom_commune") + "</b><br>"
+    adresse = col("adresse")
+    text += adresse.where(adresse == "", adresse + "<br>")
+
+    if "zone" in df.columns:
+        zone = "Zone " + df["zone"].astype("Int64").astype(str)
+        if "distance_m" in df.columns:
+            zone += " &middot; " + format_distances(df["distance_m"])
+        text += zone + "<br>"
+    elif "distance_m" in df.columns:
+        text += "Distance: " + format_distances(df["distance_m"]) + "<br>"
+
+    text += (
+        "Surface: " + _fmt(df["surface"], "{:.0f}") + " m\u00b2<br>"
+        + "Prix/m\u00b2: " + _fmt(df["prix_m2"], "{:,.0f}") + " EUR<br>"
+        + "Prix: " + _fmt(df["valeur_fonciere"], "{:,.0f}") + " EUR<br>"
+        + "Date: " + col("date_mutation")
+    )
+    return text
+
+
+def marker_colors(df: pd.DataFrame, prix_m2_estime: float, by_zone: bool) -> np.ndarray:
+    """Couleur de chaque point : par zone, sinon par ecart au prix estime."""
+    if by_zone and "zone" in df.columns:
+        zone = df["zone"].to_numpy()
+        return np.select(
+            [zone == z for z in ZONE_COLORS],
+            list(ZONE_COLORS.values()),
+            default=DEFAULT_COLOR,
+        )
+    ratio = df["prix_m2"].to_numpy() / prix_m2_estime if prix_m2_estime > 0 else np.ones(len(df))
+    return np.select(
+        [ratio > 1.1, ratio < 0.9],
+        [PRICE_COLORS["above"], PRICE_COLORS["below"]],
+        default=PRICE_COLORS["near"],
+    )
+
+
+def comparables_geojson(df: pd.DataFrame, colors: np.ndarray) -> dict:
+    """FeatureCollection des comparables geolocalises (proprietes : color, popup)."""
+    located = df["latitude"].notna() & df["longitude"].notna()
+    located &= (df["latitude"] != 0) & (df["longitude"] != 0)
+    df = df[located]
+    colors = np.asarray(colors)[located.to_numpy()]
+    popups = hover_texts(df)
+
+    features = [
+        {
+            "type": "Feature",
+            "geometry": {"type": "Point", "coordinates": [lon, lat]},
+            "properties": {"color": color, "popup": popup},
+        }
+        for lon, lat, color, popup in zip(
+            df["longitude"].to_numpy(dtype=float).tolist(),
+            df["latitude"].to_numpy(dtype=float).tolist(),
+            colors.tolist(),
+            popups.tolist(),
+        )
+    ]
+    return {"type": "FeatureCollection", "features": features}
@@ -1,34 +1,201 @@
 """Connexion SQLAlchemy a PostgreSQL/PostGIS (Supabase)."""
 
+import os
+import threading
+import time
 from contextlib import contextmanager
+from dataclasses import dataclass
 from pathlib import Path
 
-from sqlalchemy import create_engine, text
+from sqlalchemy import create_engine, event, exc, text
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool, QueuePool
 
-from src.config import DATABASE_URL
+from src.config import (
+    DATABASE_URL,
+    DB_PGBOUNCER,
+    DB_POOL_PROFILE,
+    DB_POOL_PRE_PING,
+    DB_POOL_VALIDATE_INTERVAL_S,
+)
+
+
+@dataclass(frozen=True)
+class PoolProfile:
+    """Dimensionnement du pool pour un type de process."""
+    pool_size: int
+    max_overflow: int
+    pool_timeout: float      # Attente max d'une connexion libre (s)
+    pool_recycle: int        # Duree de vie max d'une connexion (s)
+
+
+# Chaque worker uvicorn, le process Streamlit et le pipeline ont leur propre
+# pool : la somme doit rester sous la limite de connexions Supabase
+POOL_PROFILES = {
+    "api": PoolProfile(pool_size=5, max_overflow=5, pool_timeout=10, pool_recycle=1800),
+    "streamlit": PoolProfile(pool_size=3, max_overflow=2, pool_timeout=10, pool_recycle=1800),
+    "pipeline": PoolProfile(pool_size=2, max_overflow=2, pool_timeout=60, pool_recycle=3600),
+}
+
+
+class PoolMetrics:
+    """Compteurs du pool : attente au checkout, debordements, echecs."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.checkouts = 0
+            self.wait_s_total = 0.0
+            self.wait_s_max = 0.0
+            self.overflow_checkouts = 0
+            self.timeouts = 0
+            self.validation_failures = 0
+
+    def record_checkout(self, wait_s: float, overflow: bool):
+        with self._lock:
+            self.checkouts += 1
+            self.wait_s_total += wait_s
+            self.wait_s_max = max(self.wait_s_max, wait_s)
+            self.overflow_checkouts += int(overflow)
+
+    def record_timeout(self):
+        with self._lock:
+            self.timeouts += 1
+
+    def record_validation_failure(self):
+        with self._lock:
+            self.validation_failures += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "wait_ms_avg": round(1000 * self.wait_s_total / self.checkouts, 3) if self.checkouts else 0.0,
+                "wait_ms_max": round(1000 * self.wait_s_max, 3),
+                "overflow_checkouts": self.overflow_checkouts,
+                "timeouts": self.timeouts,
+                "validation_failures": self.validation_failures,
+            }
+
+
+pool_metrics = PoolMetrics()
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool qui mesure l'attente d'une connexion libre."""
+
+    def _do_get(self):
+        # overflow() ne bouge qu'a la creation / fermeture d'une connexion :
+        # debordement seulement si ce checkout en a cree une au-dela de pool_size
+        overflow_before = self.overflow()
+        start = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except exc.TimeoutError:
+            pool_metrics.record_timeout()
+            raise
+        pool_metrics.record_checkout(time.perf_counter() - start, self.overflow() > max(overflow_before, 0))
+        return conn
+
+
+def _install_validation(engine, interval_s: float):
+    """Valide (SELECT 1) au checkout les connexions inactives depuis interval_s.
+
+    Une connexion invalide leve DisconnectionError : le pool la remplace et
+    retente le checkout.
+    """
+    @event.listens_for(engine, "checkin")
+    def _on_checkin(dbapi_conn, record):
+        record.info["last_used"] = time.monotonic()
+
+    @event.listens_for(engine, "checkout")
+    def _on_checkout(dbapi_conn, record, proxy):
+        last_used = record.info.get("last_used")
+        if last_used is None or time.monotonic() - last_used < interval_s:
+            return
+        try:
+            cursor = dbapi_conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.close()
+        except Exception as e:
+            pool_metrics.record_validation_failure()
+            raise exc.DisconnectionError(f"connexion invalide: {e}") from e
 
 
 _engine = None
+_engine_lock = threading.Lock()
+_profile = DB_POOL_PROFILE
+
+# Sessionmaker unique, lie a l'engine au premier get_session()
+_Session = sessionmaker()
+
+
+def resolve_pool_profile(name: str) -> PoolProfile:
+    """Profil nomme, surcharge par DB_POOL_SIZE / DB_MAX_OVERFLOW / DB_POOL_TIMEOUT / DB_POOL_RECYCLE."""
+    if name not in POOL_PROFILES:
+        raise ValueError(
+            f"DB_POOL_PROFILE invalide: {name!r} (attendu: {', '.join(POOL_PROFILES)})"
+        )
+    base = POOL_PROFILES[name]
+    return PoolProfile(
+        pool_size=int(os.getenv("DB_POOL_SIZE", base.pool_size)),
+        max_overflow=int(os.getenv("DB_MAX_OVERFLOW", base.max_overflow)),
+        pool_timeout=float(os.getenv("DB_POOL_TIMEOUT", base.pool_timeout)),
+        pool_recycle=int(os.getenv("DB_POOL_RECYCLE", base.pool_recycle)),
+    )
+
+
+def set_pool_profile(name: str):
+    """Choisit le profil de pool du process (avant le premier get_engine)."""
+    global _engine, _profile
+    resolve_pool_profile(name)
+    with _engine_lock:
+        if name == _profile:
+            return
+        _profile = name
+        if _engine is not None:
+            _engine.dispose()
+            _engine = None
 
 
 def get_engine():
-    """Retourne un engine SQLAlchemy (singleton)."""
+    """Retourne un engine SQLAlchemy (singleton), dimensionne selon le profil du process."""
     global _engine
     if _engine is None:
-        connect_args = {}
-        if "supabase.co" in DATABASE_URL:
-            connect_args["sslmode"] = "require"
-        _engine = create_engine(
-            DATABASE_URL,
-            pool_size=5,
-            max_overflow=10,
-            pool_pre_ping=True,
-            connect_args=connect_args,
-        )
+        with _engine_lock:
+            if _engine is None:
+                _engine = _create_engine(_profile)
     return _engine
 
 
+def _create_engine(profile_name: str):
+    connect_args = {}
+    if "supabase.co" in DATABASE_URL:
+        connect_args["sslmode"] = "require"
+
+    if DB_PGBOUNCER:
+        # pgbouncer gere le pool : une connexion par checkout, rendue aussitot
+        return create_engine(DATABASE_URL, poolclass=NullPool, connect_args=connect_args)
+
+    profile = resolve_pool_profile(profile_name)
+    engine = create_engine(
+        DATABASE_URL,
+        poolclass=TimedQueuePool,
+        pool_size=profile.pool_size,
+        max_overflow=profile.max_overflow,
+        pool_timeout=profile.pool_timeout,
+        pool_recycle=profile.pool_recycle,
+        pool_pre_ping=DB_POOL_PRE_PING,
+        connect_args=connect_args,
+    )
+    if not DB_POOL_PRE_PING and DB_POOL_VALIDATE_INTERVAL_S > 0:
+        _install_validation(engine, DB_POOL_VALIDATE_INTERVAL_S)
+    return engine
+
+
 def get_raw_connection():
     """Retourne une connexion psycopg2 brute (pour COPY CSV)."""
     engine = get_engine()
@@ -38,8 +205,7 @@ def get_raw_connection():
 @contextmanager
 def get_session():
     """Context manager pour une session SQLAlchemy."""
-    Session = sessionmaker(bind=get_engine())
-    session = Session()
+    session = _Session(bind=get_engine())
     try:
         yield session
         session.commit()
@@ -0,0 +1,277 @@
+"""Cache des candidats comparables par cellule spatiale.
+
+Les recherches qui tombent dans la meme cellule (COMPARABLE_CACHE_CELL_KM)
+pour le meme type de bien, la meme tranche de surface, la meme fenetre de
+dates et le meme rayon partagent un sur-ensemble de candidats lu une fois :
+chaque recherche le filtre en memoire au rayon et a la bande de surface
+exacts. La generation des donnees fait partie de la cle : un refresh des
+marts invalide tout le cache. Les cellules denses, dont le sur-ensemble
+depasse COMPARABLE_CACHE_MAX_ROWS, sont memorisees et vont directement a la
+requete exacte.
+"""
+
+import math
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+from src.config import (
+    COMPARABLE_CACHE_CELL_KM,
+    COMPARABLE_CACHE_GENERATION_TTL_S,
+    COMPARABLE_CACHE_MAX_MB,
+    COMPARABLE_CACHE_MAX_ROWS,
+)
+from src.estimation.queries import COMPARABLES_ZONES, DATA_GENERATION, SURFACE_ANY, read_df
+
+# Ellipsoide WGS84 (ST_Distance sur geography calcule sur le spheroide)
+_WGS84_A = 6_378_137.0
+_WGS84_E2 = 0.00669437999014
+_M_PER_DEG_LAT = 111_320.0
+
+# Tranches de surface geometriques (x1.25) : la bande 0.5x-2x d'une surface
+# est incluse dans la bande elargie de sa tranche
+SURFACE_BUCKET_RATIO = 1.25
+
+# Cles de cellules denses memorisees au plus (cache negatif, LRU)
+DENSE_CELLS_MAX = 4096
+
+
+@dataclass(frozen=True)
+class CellKey:
+    """Cle d'un sur-ensemble de candidats."""
+    generation: int
+    cell: tuple[int, int]
+    type_bien: str
+    surface_bucket: int | None   # None = sans filtre surface
+    window_end: str              # CURRENT_DATE du serveur : fenetre 24 mois glissante
+    radius_km: int
+
+
+def grid_cell(latitude: float, longitude: float, cell_km: float) -> tuple[tuple[int, int], float, float]:
+    """Cellule (iy, ix) du point et coordonnees de son centre."""
+    dlat = cell_km * 1000 / _M_PER_DEG_LAT
+    iy = math.floor(latitude / dlat)
+    center_lat = (iy + 0.5) * dlat
+    dlon = cell_km * 1000 / (_M_PER_DEG_LAT * math.cos(math.radians(center_lat)))
+    ix = math.floor(longitude / dlon)
+    return (iy, ix), center_lat, (ix + 0.5) * dlon
+
+
+def surface_bucket(surface: float | None) -> int | None:
+    if not surface:
+        return None
+    return math.floor(math.log(surface) / math.log(SURFACE_BUCKET_RATIO))
+
+
+def bucket_band(bucket: int | None) -> tuple[float, float]:
+    """Bande de surface couvrant 0.5x-2x de toute surface de la tranche."""
+    if bucket is None:
+        return SURFACE_ANY
+    return 0.5 * SURFACE_BUCKET_RATIO ** bucket, 2.0 * SURFACE_BUCKET_RATIO ** (bucket + 1)
+
+
+def local_distance_m(latitude: float, longitude: float, lats, lons) -> np.ndarray:
+    """Distances (m) sur l'ellipsoide WGS84, approximation plane locale.
+
+    Ecart a ST_Distance(geography) inferieur au metre jusqu'a une vingtaine de km.
+    """
+    lats = np.asarray(lats, dtype=float)
+    lons = np.asarray(lons, dtype=float)
+    mid = np.radians((lats + latitude) / 2)
+    w = np.sqrt(1 - _WGS84_E2 * np.sin(mid) ** 2)
+    meridian = _WGS84_A * (1 - _WGS84_E2) / w ** 3
+    normal = _WGS84_A / w
+    dy = meridian * np.radians(lats - latitude)
+    dx = normal * np.cos(mid) * np.radians(lons - longitude)
+    return np.hypot(dx, dy)
+
+
+class CandidateCache:
+    """Sur-ensembles de candidats (LRU borne en octets, local au process)."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[CellKey, tuple[pd.DataFrame, int]] = OrderedDict()
+        self._dense: OrderedDict[CellKey, None] = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation: int | None = None
+        self._generation_at = 0.0
+        self.reset()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def reset(self):
+        with self._lock:
+            self._entries.clear()
+            self._dense.clear()
+            self.bytes = 0
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+            self.invalidations = 0
+            self.bypassed = 0
+            self._generation = None
+            self._generation_at = 0.0
+            self._window_end = None
+            self._window_end_until = 0.0
+
+    def generation(self, conn) -> int:
+        """Generation des donnees, relue au plus une fois par COMPARABLE_CACHE_GENERATION_TTL_S."""
+        now = time.monotonic()
+        if self._generation is None or now - self._generation_at > COMPARABLE_CACHE_GENERATION_TTL_S:
+            generation = 0
+            if conn.execute(text("SELECT to_regclass('mart.data_generation')")).scalar() is not None:
+                generation = int(conn.execute(DATA_GENERATION.statement).scalar() or 0)
+            self._generation, self._generation_at = generation, now
+        return self._generation
+
+    def window_end(self, conn) -> str:
+        """CURRENT_DATE du serveur, l'horloge de la fenetre 24 mois des requetes.
+
+        Relue au plus une fois par COMPARABLE_CACHE_GENERATION_TTL_S et jamais
+        conservee au-dela de minuit (heure du serveur).
+        """
+        now = time.monotonic()
+        if self._window_end is None or now >= self._window_end_until:
+            today, to_midnight_s = conn.execute(text(
+                "SELECT CURRENT_DATE, EXTRACT(EPOCH FROM (CURRENT_DATE + 1) - LOCALTIMESTAMP)"
+            )).one()
+            self._window_end = today.isoformat()
+            self._window_end_until = now + min(COMPARABLE_CACHE_GENERATION_TTL_S, float(to_midnight_s))
+        return self._window_end
+
+    def get(self, key: CellKey) -> pd.DataFrame | None:
+        with self._lock:
+            self._invalidate_older(key.generation)
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: CellKey, df: pd.DataFrame):
+        size = int(df.memory_usage(deep=True).sum())
+        with self._lock:
+            self._invalidate_older(key.generation)
+            if size > self.max_bytes:
+                self.bypassed += 1
+                return
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.bytes -= previous[1]
+            self._entries[key] = (df, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.bytes -= evicted
+                self.evictions += 1
+
+    def is_dense(self, key: CellKey) -> bool:
+        with self._lock:
+            self._invalidate_older(key.generation)
+            if key not in self._dense:
+                return False
+            self._dense.move_to_end(key)
+            self.bypassed += 1
+            return True
+
+    def mark_dense(self, key: CellKey):
+        """Memorise une cellule dont le sur-ensemble est tronque par le LIMIT."""
+        with self._lock:
+            self.bypassed += 1
+            self._dense[key] = None
+            self._dense.move_to_end(key)
+            while len(self._dense) > DENSE_CELLS_MAX:
+                self._dense.popitem(last=False)
+
+    def _invalidate_older(self, generation: int):
+        stale = [k for k in self._entries if k.generation != generation]
+        for k in stale:
+            self.bytes -= self._entries.pop(k)[1]
+        if stale:
+            self.invalidations += 1
+        for k in [k for k in self._dense if k.generation != generation]:
+            del self._dense[k]
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 3) if lookups else None,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "bypassed": self.bypassed,
+                "dense_cells": len(self._dense),
+            }
+
+
+candidate_cache = CandidateCache(int(COMPARABLE_CACHE_MAX_MB * 1024 * 1024))
+
+
+def filter_candidates(superset: pd.DataFrame, params: dict) -> pd.DataFrame:
+    """Candidats de COMPARABLES_ZONES pour params, extraits d'un sur-ensemble."""
+    distance = local_distance_m(params["lat"], params["lon"], superset["latitude"], superset["longitude"])
+    mask = (
+        (distance <= params["radius_m"])
+        & superset["surface"].between(params["surface_min"], params["surface_max"]).to_numpy()
+    )
+    df = superset[mask].copy()
+    df["distance_m"] = distance[mask]
+    return df.sort_values("distance_m", kind="stable").head(params["max_comp"]).reset_index(drop=True)
+
+
+def level1_candidates(params: dict, conn) -> pd.DataFrame:
+    """Candidats niveau 1 (memes lignes que COMPARABLES_ZONES), via le cache de cellules."""
+    if not candidate_cache.enabled:
+        return read_df(COMPARABLES_ZONES, params, conn)
+
+    cell, center_lat, center_lon = grid_cell(params["lat"], params["lon"], COMPARABLE_CACHE_CELL_KM)
+    bucket = surface_bucket(params.get("surface"))
+    radius_km = math.ceil(params["radius_m"] / 1000)
+    key = CellKey(
+        generation=candidate_cache.generation(conn),
+        cell=cell,
+        type_bien=params["type_bien"],
+        surface_bucket=bucket,
+        window_end=candidate_cache.window_end(conn),
+        radius_km=radius_km,
+    )
+
+    if candidate_cache.is_dense(key):
+        return read_df(COMPARABLES_ZONES, params, conn)
+
+    superset = candidate_cache.get(key)
+    if superset is None:
+        surface_min, surface_max = bucket_band(bucket)
+        superset = read_df(COMPARABLES_ZONES, {
+            **params,
+            "lat": center_lat,
+            "lon": center_lon,
+            # Le point est a moins d'une demi-diagonale du centre de la cellule
+            "radius_m": (radius_km + COMPARABLE_CACHE_CELL_KM) * 1000,
+            "surface_min": surface_min,
+            "surface_max": surface_max,
+            "max_comp": COMPARABLE_CACHE_MAX_ROWS,
+        }, conn)
+        if len(superset) >= COMPARABLE_CACHE_MAX_ROWS:
+            # Sur-ensemble tronque par le LIMIT : filtrer en memoire serait faux.
+            # La cellule est memorisee pour ne plus payer la requete du sur-ensemble.
+            candidate_cache.mark_dense(key)
+            return read_df(COMPARABLES_ZONES, params, conn)
+        candidate_cache.put(key, superset)
+
+    return filter_candidates(superset, params)
@@ -1,14 +1,26 @@
 """Recherche de transactions comparables."""
 
-from dataclasses import dataclass
+import math
+from dataclasses import dataclass, replace
 
+import numpy as np
 import pandas as pd
-from sqlalchemy import text
 
-from src.config import MIN_COMPARABLES
+from src.config import (
+    COMPARABLES_KNN_MAX_KM,
+    COMPARABLES_KNN_MIN,
+    COMPARABLES_SEARCH_MODE,
+    MIN_COMPARABLES,
+)
 from src.db import get_engine
+from src.estimation.comparable_cache import level1_candidates
+from src.estimation.confidence import SEARCH_LEVEL_KNN
+from src.estimation.geocoder import departement_of
+from src.estimation.queries import COMPARABLES_KNN, FALLBACK_LEVELS, read_df, surface_band
 from src.estimation.zone_config import ZoneConfig
 
+SEARCH_MODES = ("radius", "knn")
+
 
 @dataclass
 class ComparableSearch:
@@ -20,10 +32,58 @@ class ComparableSearch:
     type_bien: str
     surface: float | None
     nb_pieces: int | None
-    level: int           # Niveau de fallback utilise (1-4)
+    level: int           # Niveau de fallback utilise (1-4, SEARCH_LEVEL_KNN en mode knn)
     level_desc: str      # Description du niveau
     comparables: pd.DataFrame
     zone_config: ZoneConfig | None = None
+    min_comparables: int = MIN_COMPARABLES
+
+    # Candidats niveau 1 jusqu'a search_radius_km (tries par distance), conserves
+    # pour re-decouper les zones en memoire (cf. rezone_comparables)
+    candidates: pd.DataFrame | None = None
+    search_radius_km: float | None = None
+    candidates_limit: int | None = None
+    mode: str = "radius"
+
+
+def assign_zones(candidates: pd.DataFrame, zone_config: ZoneConfig) -> pd.DataFrame:
+    """Decoupe les candidats en zones exclusives R1/R2/R3 a partir de distance_m.
+
+    Les candidats etant tries par distance, les max_comparables premiers
+    dans R3 sont exactement ceux que retournerait une recherche limitee a R3.
+    """
+    r1, r2, r3 = zone_config.radii_meters
+    df = candidates[candidates["distance_m"] <= r3].head(zone_config.max_comparables).copy()
+    distance = df["distance_m"].to_numpy()
+    df["zone"] = np.select([distance <= r1, distance <= r2], [1, 2], default=3)
+    return df
+
+
+def nearest_with_zones(candidates: pd.DataFrame, zone_config: ZoneConfig, k: int) -> pd.DataFrame:
+    """Les k candidats les plus proches, zone 3 etendue jusqu'au plus lointain (mode knn)."""
+    r1, r2, _ = zone_config.radii_meters
+    df = candidates.head(k).copy()
+    distance = df["distance_m"].to_numpy()
+    df["zone"] = np.select([distance <= r1, distance <= r2], [1, 2], default=3)
+    return df
+
+
+def _knn_desc(df: pd.DataFrame) -> str:
+    return f"{len(df)} ventes les plus proches (jusqu'a {df['distance_m'].max() / 1000:.1f} km), 24 derniers mois"
+
+
+def _zones_desc(df: pd.DataFrame, zone_config: ZoneConfig) -> str:
+    desc_parts = []
+    for z in [1, 2, 3]:
+        n = len(df[df["zone"] == z])
+        if n > 0:
+            if z == 1:
+                desc_parts.append(f"zone 1 (0-{zone_config.radius_1_km} km): {n}")
+            elif z == 2:
+                desc_parts.append(f"zone 2 ({zone_config.radius_1_km}-{zone_config.radius_2_km} km): {n}")
+            else:
+                desc_parts.append(f"zone 3 ({zone_config.radius_2_km}-{zone_config.radius_3_km} km): {n}")
+    return ", ".join(desc_parts) if desc_parts else f"multi-zones ({zone_config.radius_3_km} km)"
 
 
 def find_comparables(
@@ -35,6 +95,7 @@ def find_comparables(
     nb_pieces: int | None = None,
     min_comparables: int | None = None,
     zone_config: ZoneConfig | None = None,
+    mode: str | None = None,
 ) -> ComparableSearch:
     """
     Recherche des transactions comparables avec fallback hierarchique.
@@ -47,30 +108,33 @@ def find_comparables(
         2. Meme commune, 24 mois
         3. Meme commune, 48 mois
         4. Meme departement, 24 mois
+
+    Le niveau 1 recupere les candidats jusqu'a R3 (ST_DWithin en geography,
+    sans l'index GIST : le cout croit avec la surface du disque) : des rayons
+    plus petits ou d'autres poids sont re-decoupes sans nouvelle requete, un
+    R3 plus grand relance la recherche a ce rayon. Ces candidats sont
+    extraits du cache de cellules (comparable_cache).
+
+    En mode "knn" (COMPARABLES_SEARCH_MODE), une seule requete ordonnee par
+    l'index GIST remplace le rayon fixe : les max_comparables ventes les plus
+    proches (jusqu'a COMPARABLES_KNN_MAX_KM). Si les zones en contiennent
+    moins que min_comparables, les COMPARABLES_KNN_MIN plus proches sont
+    retenues (niveau SEARCH_LEVEL_KNN, zone 3 etendue) ; les fallbacks
+    commune/departement ne servent qu'en l'absence de ventes geolocalisees.
     """
     if min_comparables is None:
         min_comparables = MIN_COMPARABLES
     if zone_config is None:
         zone_config = ZoneConfig()
+    mode = mode or COMPARABLES_SEARCH_MODE
+    if mode not in SEARCH_MODES:
+        raise ValueError(f"Mode de recherche invalide: {mode!r} (attendu: {', '.join(SEARCH_MODES)})")
 
     engine = get_engine()
-    code_departement = code_commune[:2] if len(code_commune) >= 2 else code_commune
-
-    # Colonnes de base
-    cols = """
-        t.id_mutation, t.date_mutation, t.valeur_fonciere, t.type_bien,
-        t.surface, t.nb_pieces, t.prix_m2,
-        t.code_commune, t.nom_commune, t.code_departement,
-        t.adresse, t.code_postal,
-        t.latitude, t.longitude
-    """
+    code_departement = departement_of(code_commune)
 
-    # Filtres optionnels de surface
-    surface_filter = ""
-    if surface:
-        surface_filter = f"AND t.surface BETWEEN {surface * 0.5} AND {surface * 2.0}"
-
-    r1, r2, r3 = zone_config.radii_meters
+    surface_min, surface_max = surface_band(surface)
+    search_radius_km = zone_config.radius_3_km
 
     params = {
         "lat": latitude,
@@ -78,139 +142,14 @@ def find_comparables(
         "code_commune": code_commune,
         "code_departement": code_departement,
         "type_bien": type_bien,
-        "r1": r1,
-        "r2": r2,
-        "r3": r3,
+        "radius_m": search_radius_km * 1000,
+        "surface": surface,
+        "surface_min": surface_min,
+        "surface_max": surface_max,
         "max_comp": zone_config.max_comparables,
     }
 
-    # ---- Level 1 : Multi-zones (3 zones concentriques) ----
-    query_zones = f"""
-        SELECT {cols},
-               ST_Distance(
-                   t.geom::geography,
-                   ST_SetSRID(ST_MakePoint(:lon, :lat), 4326)::geography
-               ) AS distance_m,
-               CASE
-                   WHEN ST_DWithin(t.geom::geography,
-                        ST_SetSRID(ST_MakePoint(:lon, :lat), 4326)::geography, :r1) THEN 1
-                   WHEN ST_DWithin(t.geom::geography,
-                        ST_SetSRID(ST_MakePoint(:lon, :lat), 4326)::geography, :r2) THEN 2
-                   ELSE 3
-               END AS zone
-        FROM core.transactions t
-        WHERE t.type_bien = :type_bien
-          AND NOT t.is_outlier
-          AND t.geom IS NOT NULL
-          AND ST_DWithin(
-              t.geom::geography,
-              ST_SetSRID(ST_MakePoint(:lon, :lat), 4326)::geography,
-              :r3
-          )
-          AND t.date_mutation >= CURRENT_DATE - INTERVAL '24 months'
-          {surface_filter}
-        ORDER BY distance_m
-        LIMIT :max_comp
-    """
-
-    df = pd.read_sql(text(query_zones), engine, params=params)
-
-    if len(df) >= min_comparables:
-        desc_parts = []
-        for z in [1, 2, 3]:
-            n = len(df[df["zone"] == z])
-            if n > 0:
-                if z == 1:
-                    desc_parts.append(f"zone 1 (0-{zone_config.radius_1_km} km): {n}")
-                elif z == 2:
-                    desc_parts.append(f"zone 2 ({zone_config.radius_1_km}-{zone_config.radius_2_km} km): {n}")
-                else:
-                    desc_parts.append(f"zone 3 ({zone_config.radius_2_km}-{zone_config.radius_3_km} km): {n}")
-
-        return ComparableSearch(
-            latitude=latitude,
-            longitude=longitude,
-            code_commune=code_commune,
-            code_departement=code_departement,
-            type_bien=type_bien,
-            surface=surface,
-            nb_pieces=nb_pieces,
-            level=1,
-            level_desc=", ".join(desc_parts) if desc_parts else f"multi-zones ({zone_config.radius_3_km} km)",
-            comparables=df,
-            zone_config=zone_config,
-        )
-
-    # ---- Fallback levels 2-4 (sans zones) ----
-    fallback_levels = [
-        {
-            "level": 2,
-            "desc": "commune, 24 derniers mois",
-            "where": """
-                t.code_commune = :code_commune
-                AND t.date_mutation >= CURRENT_DATE - INTERVAL '24 months'
-            """,
-        },
-        {
-            "level": 3,
-            "desc": "commune, 48 derniers mois",
-            "where": """
-                t.code_commune = :code_commune
-                AND t.date_mutation >= CURRENT_DATE - INTERVAL '48 months'
-            """,
-        },
-        {
-            "level": 4,
-            "desc": "departement, 24 derniers mois",
-            "where": """
-                t.code_departement = :code_departement
-                AND t.date_mutation >= CURRENT_DATE - INTERVAL '24 months'
-            """,
-        },
-    ]
-
-    # Ajouter distance_m pour les fallbacks aussi
-    fallback_cols = f"""
-        {cols},
-        CASE WHEN t.geom IS NOT NULL THEN
-            ST_Distance(
-                t.geom::geography,
-                ST_SetSRID(ST_MakePoint(:lon, :lat), 4326)::geography
-            )
-        ELSE NULL END AS distance_m
-    """
-
-    for lvl in fallback_levels:
-        query = f"""
-            SELECT {fallback_cols}
-            FROM core.transactions t
-            WHERE t.type_bien = :type_bien
-              AND NOT t.is_outlier
-              AND {lvl['where']}
-              {surface_filter}
-            ORDER BY t.date_mutation DESC
-            LIMIT :max_comp
-        """
-
-        df = pd.read_sql(text(query), engine, params=params)
-
-        if len(df) >= min_comparables:
-            return ComparableSearch(
-                latitude=latitude,
-                longitude=longitude,
-                code_commune=code_commune,
-                code_departement=code_departement,
-                type_bien=type_bien,
-                surface=surface,
-                nb_pieces=nb_pieces,
-                level=lvl["level"],
-                level_desc=lvl["desc"],
-                comparables=df,
-                zone_config=None,
-            )
-
-    # Pas assez de comparables meme au dernier niveau
-    return ComparableSearch(
+    base = ComparableSearch(
         latitude=latitude,
         longitude=longitude,
         code_commune=code_commune,
@@ -220,6 +159,107 @@ def find_comparables(
         nb_pieces=nb_pieces,
         level=4,
         level_desc="departement, 24 derniers mois (donnees insuffisantes)",
-        comparables=df,
-        zone_config=None,
+        comparables=pd.DataFrame(),
+        min_comparables=min_comparables,
+        search_radius_km=search_radius_km,
+        candidates_limit=zone_config.max_comparables,
+        mode=mode,
     )
+
+    # Une seule connexion pour tous les niveaux (statements prepares une fois)
+    with engine.connect() as conn:
+        # ---- Level 1 : Multi-zones (3 zones concentriques) ----
+        if mode == "knn":
+            knn_radius_km = max(COMPARABLES_KNN_MAX_KM, search_radius_km)
+            candidates = read_df(COMPARABLES_KNN, {**params, "radius_m": knn_radius_km * 1000}, conn)
+            base.search_radius_km = _knn_complete_radius_km(candidates, zone_config, latitude, knn_radius_km)
+            base.candidates = candidates.drop(columns="knn_rows")
+        else:
+            base.candidates = level1_candidates(params, conn)
+
+        df = assign_zones(base.candidates, zone_config)
+        if len(df) >= min_comparables:
+            return replace(
+                base,
+                level=1,
+                level_desc=_zones_desc(df, zone_config),
+                comparables=df,
+                zone_config=zone_config,
+            )
+
+        # ---- Mode knn : les plus proches voisins, quelle que soit la distance ----
+        if mode == "knn":
+            df = nearest_with_zones(base.candidates, zone_config, max(min_comparables, COMPARABLES_KNN_MIN))
+            if len(df) >= min_comparables:
+                return replace(base, level=SEARCH_LEVEL_KNN, level_desc=_knn_desc(df), comparables=df,
+                               zone_config=zone_config)
+
+        # ---- Fallback levels 2-4 (sans zones) ----
+        for lvl in FALLBACK_LEVELS:
+            df = read_df(lvl["query"], params, conn)
+
+            if len(df) >= min_comparables:
+                return replace(base, level=lvl["level"], level_desc=lvl["desc"], comparables=df)
+
+    # Pas assez de comparables meme au dernier niveau
+    return replace(base, comparables=df)
+
+
+def _knn_complete_radius_km(
+    candidates: pd.DataFrame, zone_config: ZoneConfig, latitude: float, radius_km: float,
+) -> float:
+    """Rayon jusqu'auquel les candidats knn sont exhaustifs (pour rezone_comparables).
+
+    Si la sous-requete KNN n'a pas atteint sa LIMIT (knn_rows), toutes les
+    ventes a moins de radius_km sont presentes. Sinon, l'ordre KNN suit la
+    distance en degres : une vente a l'est peut etre plus proche en metres
+    que la derniere retenue, seules celles a moins de d_max * cos(latitude)
+    sont garanties. Sans aucune ligne, rien ne dit si la LIMIT a ete
+    atteinte : rayon nul, toute re-decoupe refait la recherche.
+    """
+    if candidates.empty:
+        return 0.0
+    if int(candidates["knn_rows"].iloc[0]) < zone_config.max_comparables:
+        return radius_km
+    farthest_km = float(candidates["distance_m"].iloc[-1]) / 1000
+    return min(radius_km, farthest_km * math.cos(math.radians(latitude)))
+
+
+def rezone_comparables(search: ComparableSearch, zone_config: ZoneConfig) -> ComparableSearch | None:
+    """Re-decoupe une recherche existante selon de nouvelles zones, sans requete.
+
+    Retourne None si une nouvelle recherche est necessaire : R3 au-dela du
+    rayon recupere, max_comparables au-dela de la limite utilisee, ou
+    passage du niveau 1 a un fallback qui n'a pas ete calcule.
+    """
+    if (
+        search.candidates is None
+        or search.search_radius_km is None
+        or zone_config.radius_3_km > search.search_radius_km
+        or zone_config.max_comparables > (search.candidates_limit or 0)
+    ):
+        return None
+
+    df = assign_zones(search.candidates, zone_config)
+    if len(df) >= search.min_comparables:
+        return replace(
+            search,
+            level=1,
+            level_desc=_zones_desc(df, zone_config),
+            comparables=df,
+            zone_config=zone_config,
+        )
+
+    if search.mode == "knn" and len(search.candidates) >= search.min_comparables:
+        df = nearest_with_zones(search.candidates, zone_config, max(search.min_comparables, COMPARABLES_KNN_MIN))
+        return replace(search, level=SEARCH_LEVEL_KNN, level_desc=_knn_desc(df), comparables=df,
+                       zone_config=zone_config)
+
+    # Fallbacks : independants des zones et tries par date, LIMIT = head()
+    if search.level in {lvl["level"] for lvl in FALLBACK_LEVELS}:
+        return replace(
+            search,
+            comparables=search.comparables.head(zone_config.max_comparables),
+            zone_config=None,
+        )
+    return None
@@ -5,6 +5,10 @@ from dataclasses import dataclass
 import numpy as np
 import pandas as pd
 
+# Niveau des plus proches voisins hors zones (mode knn) : ni zones (1) ni
+# fallback commune / departement (2-4)
+SEARCH_LEVEL_KNN = 5
+
 
 @dataclass
 class ConfidenceResult:
@@ -28,7 +32,7 @@ def compute_confidence(
 
     Args:
         comparables: DataFrame des transactions comparables.
-        search_level: Niveau geographique utilise (1-4).
+        search_level: Niveau geographique utilise (1-4, ou SEARCH_LEVEL_KNN).
         surface: Surface du bien estime.
         adjustment: Facteur d'ajustement surface.
 
@@ -37,11 +41,11 @@ def compute_confidence(
     """
     n = len(comparables)
 
-    # Niveau de confiance
+    # Niveau de confiance ; voisins knn au-dela de R3 : au mieux moyenne
     if n >= 30 and search_level <= 2:
         level = "high"
         level_label = "Confiance haute"
-    elif n >= 10 and search_level <= 3:
+    elif n >= 10 and (search_level <= 3 or search_level == SEARCH_LEVEL_KNN):
         level = "medium"
         level_label = "Confiance moyenne"
     else:
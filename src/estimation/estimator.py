@@ -5,12 +5,20 @@ from dataclasses import dataclass
 
 import numpy as np
 import pandas as pd
-from sqlalchemy import text
 
+from src.config import COORDINATES_MAX_DISTANCE_KM
 from src.db import get_engine
-from src.estimation.geocoder import GeocodingResult, geocode_best
-from src.estimation.comparables import find_comparables
+from src.estimation.geocoder import GeocodingResult, departement_of, geocode_best
+from src.estimation.comparables import ComparableSearch, find_comparables, rezone_comparables
 from src.estimation.confidence import compute_confidence, ConfidenceResult
+from src.estimation.queries import (
+    DATA_GENERATION,
+    NEAREST_COMMUNE,
+    SEMESTER_COMMUNE,
+    SEMESTER_DEPARTEMENT,
+    ZONE_STATS,
+    read_df,
+)
 from src.estimation.zone_config import ZoneConfig
 
 
@@ -40,6 +48,9 @@ class EstimationResult:
     zone_config: ZoneConfig | None = None
     zone_breakdown: dict | None = None
 
+    # Recherche d'origine (permet de re-decouper les zones sans requete)
+    search: ComparableSearch | None = None
+
 
 def compute_surface_adjustment(user_surface: float, comparables: pd.DataFrame) -> float:
     """
@@ -125,15 +136,8 @@ def get_zone_stats(code_commune: str, type_bien: str) -> dict | None:
     """Recupere les statistiques de zone depuis mart."""
     engine = get_engine()
     try:
-        query = text("""
-            SELECT total_transactions, last_12m_transactions,
-                   median_prix_m2_12m, stddev_prix_m2_12m,
-                   trend_12m, data_quality_flag
-            FROM mart.zone_stats
-            WHERE code_commune = :code_commune AND type_bien = :type_bien
-        """)
         with engine.connect() as conn:
-            result = conn.execute(query, {"code_commune": code_commune, "type_bien": type_bien})
+            result = conn.execute(ZONE_STATS.statement, {"code_commune": code_commune, "type_bien": type_bien})
             row = result.fetchone()
             if row:
                 return {
@@ -151,29 +155,79 @@ def get_zone_stats(code_commune: str, type_bien: str) -> dict | None:
 
 def get_historical_stats(code_commune: str, code_departement: str, type_bien: str) -> pd.DataFrame:
     """Recupere l'historique des medianes par semestre."""
-    engine = get_engine()
-    query = text("""
-        SELECT annee, semestre, nb_transactions, median_prix_m2,
-               q1_prix_m2, q3_prix_m2
-        FROM mart.stats_commune
-        WHERE code_commune = :code_commune AND type_bien = :type_bien
-        ORDER BY annee, semestre
-    """)
-    df = pd.read_sql(query, engine, params={"code_commune": code_commune, "type_bien": type_bien})
+    df = read_df(SEMESTER_COMMUNE, {"code_commune": code_commune, "type_bien": type_bien})
 
     if len(df) == 0:
-        query = text("""
-            SELECT annee, semestre, nb_transactions, median_prix_m2,
-                   q1_prix_m2, q3_prix_m2
-            FROM mart.stats_departement
-            WHERE code_departement = :code_departement AND type_bien = :type_bien
-            ORDER BY annee, semestre
-        """)
-        df = pd.read_sql(query, engine, params={"code_departement": code_departement, "type_bien": type_bien})
+        df = read_df(SEMESTER_DEPARTEMENT, {"code_departement": code_departement, "type_bien": type_bien})
 
     return df
 
 
+def locate_commune(latitude: float, longitude: float, max_distance_km: float | None = None) -> dict | None:
+    """Commune de la transaction geolocalisee la plus proche (sans API externe).
+
+    Retourne None si aucune transaction a moins de max_distance_km
+    (defaut: COORDINATES_MAX_DISTANCE_KM), ex. point hors des departements charges.
+    """
+    if max_distance_km is None:
+        max_distance_km = COORDINATES_MAX_DISTANCE_KM
+    df = read_df(NEAREST_COMMUNE, {"lat": latitude, "lon": longitude})
+    if len(df) == 0 or df["distance_m"].iloc[0] > max_distance_km * 1000:
+        return None
+    row = df.iloc[0]
+    return {
+        **{col: str(row[col]) if pd.notna(row[col]) else None
+           for col in ("code_commune", "nom_commune", "code_postal", "code_departement")},
+        "distance_m": float(row["distance_m"]),
+    }
+
+
+def geocoding_from_coordinates(
+    latitude: float,
+    longitude: float,
+    citycode: str | None = None,
+    postcode: str | None = None,
+    label: str | None = None,
+) -> GeocodingResult | None:
+    """Resultat de geocodage a partir de coordonnees WGS84 connues.
+
+    Sans citycode, la commune est celle de la transaction la plus proche
+    (locate_commune). Retourne None si elle ne peut etre determinee.
+    """
+    city = ""
+    if citycode is None:
+        commune = locate_commune(latitude, longitude)
+        if commune is None:
+            return None
+        citycode, city = commune["code_commune"], commune["nom_commune"] or ""
+        postcode = postcode or commune["code_postal"]
+    return GeocodingResult(
+        label=label or f"{latitude:.6f}, {longitude:.6f}",
+        score=1.0,
+        latitude=latitude,
+        longitude=longitude,
+        housenumber=None,
+        street=None,
+        postcode=postcode or "",
+        city=city,
+        citycode=citycode,
+        context=departement_of(citycode),
+    )
+
+
+def get_data_generation() -> int:
+    """Generation des donnees servies (incrementee a chaque refresh des marts).
+
+    Sert de cle d'invalidation aux caches applicatifs. 0 si la table
+    mart.data_generation n'existe pas encore.
+    """
+    try:
+        with get_engine().connect() as conn:
+            return int(conn.execute(DATA_GENERATION.statement).scalar() or 0)
+    except Exception:
+        return 0
+
+
 def estimate(
     address: str,
     type_bien: str,
@@ -216,6 +270,20 @@ def estimate(
         nb_pieces=nb_pieces,
         zone_config=zone_config,
     )
+
+    # Etape 3 : Stats zone
+    zone_stats = get_zone_stats(geo.citycode, type_bien) if len(search.comparables) else None
+
+    return build_estimation(geo, search, surface, zone_stats)
+
+
+def build_estimation(
+    geo: GeocodingResult,
+    search: ComparableSearch,
+    surface: float,
+    zone_stats: dict | None = None,
+) -> EstimationResult:
+    """Calcule l'estimation a partir de comparables deja recherches (sans acces base)."""
     comparables = search.comparables
 
     if len(comparables) == 0:
@@ -238,26 +306,24 @@ def estimate(
             zone_stats=None,
             zone_config=search.zone_config,
             zone_breakdown=None,
+            search=search,
         )
 
-    # Etape 3 : Mediane prix/m2 (ponderee par zone si multi-zones)
+    # Mediane prix/m2 (ponderee par zone si multi-zones)
     zone_breakdown = None
     if search.zone_config and "zone" in comparables.columns:
         base_median, zone_breakdown = compute_weighted_median(comparables, search.zone_config)
     else:
         base_median = float(np.median(comparables["prix_m2"]))
 
-    # Etape 4 : Ajustement surface
+    # Ajustement surface
     adjustment = compute_surface_adjustment(surface, comparables)
     adjusted_prix_m2 = base_median * adjustment
 
-    # Etape 5 : Stats zone
-    zone_stats = get_zone_stats(geo.citycode, type_bien)
-
-    # Etape 6 : Prix total
+    # Prix total
     prix_total = adjusted_prix_m2 * surface
 
-    # Etape 7 : Confiance
+    # Confiance
     confidence = compute_confidence(
         comparables=comparables,
         search_level=search.level,
@@ -277,4 +343,19 @@ def estimate(
         zone_stats=zone_stats,
         zone_config=search.zone_config,
         zone_breakdown=zone_breakdown,
+        search=search,
     )
+
+
+def rezone_estimation(result: EstimationResult, zone_config: ZoneConfig) -> EstimationResult | None:
+    """Recalcule une estimation avec d'autres zones, entierement en memoire.
+
+    Retourne None si les comparables recuperes ne suffisent pas (nouvelle
+    recherche necessaire, cf. rezone_comparables).
+    """
+    if result.search is None:
+        return None
+    search = rezone_comparables(result.search, zone_config)
+    if search is None:
+        return None
+    return build_estimation(result.geocoding, search, search.surface, result.zone_stats)
@@ -1,5 +1,6 @@
 """Geocodage d'adresses via l'API Geoplateforme (ex-BAN)."""
 
+import threading
 from dataclasses import dataclass
 
 import requests
@@ -23,8 +24,31 @@ class GeocodingResult:
     context: str   # ex: "75, Paris, Ile-de-France"
 
 
+def departement_of(code_commune: str) -> str:
+    """Code departement d'un code INSEE de commune (3 caracteres pour les DOM : 97411 -> 974)."""
+    return code_commune[:3] if code_commune.startswith("97") else code_commune[:2]
+
+
+_session: requests.Session | None = None
+_session_lock = threading.Lock()
+
+
+def http_session() -> requests.Session:
+    """Session HTTP keep-alive partagee du process (une connexion TLS reutilisee)."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+        return _session
+
+
 @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=1, max=10))
-def geocode(address: str, limit: int = 5, postcode: str | None = None) -> list[GeocodingResult]:
+def geocode(
+    address: str,
+    limit: int = 5,
+    postcode: str | None = None,
+    session: requests.Session | None = None,
+) -> list[GeocodingResult]:
     """
     Geocode une adresse via l'API Geoplateforme.
 
@@ -32,6 +56,7 @@ def geocode(address: str, limit: int = 5, postcode: str | None = None) -> list[G
         address: Adresse en texte libre.
         limit: Nombre max de resultats.
         postcode: Code postal pour affiner (optionnel).
+        session: Session HTTP a reutiliser (keep-alive), optionnel.
 
     Returns:
         Liste de resultats ordonnee par score decroissant.
@@ -43,7 +68,8 @@ def geocode(address: str, limit: int = 5, postcode: str | None = None) -> list[G
     if postcode:
         params["postcode"] = postcode
 
-    resp = requests.get(GEOCODING_API_URL, params=params, timeout=10)
+    http = session if session is not None else requests
+    resp = http.get(GEOCODING_API_URL, params=params, timeout=10)
     resp.raise_for_status()
     data = resp.json()
 
@@ -68,7 +94,12 @@ def geocode(address: str, limit: int = 5, postcode: str | None = None) -> list[G
     return results
 
 
-def geocode_best(address: str, postcode: str | None = None, min_score: float = 0.4) -> GeocodingResult | None:
+def geocode_best(
+    address: str,
+    postcode: str | None = None,
+    min_score: float = 0.4,
+    session: requests.Session | None = None,
+) -> GeocodingResult | None:
     """
     Retourne le meilleur resultat de geocodage, ou None si score insuffisant.
 
@@ -76,11 +107,12 @@ def geocode_best(address: str, postcode: str | None = None, min_score: float = 0
         address: Adresse en texte libre.
         postcode: Code postal (optionnel).
         min_score: Score minimum acceptable (0 a 1).
+        session: Session HTTP a reutiliser (keep-alive), optionnel.
 
     Returns:
         Le meilleur resultat ou None.
     """
-    results = geocode(address, limit=1, postcode=postcode)
+    results = geocode(address, limit=1, postcode=postcode, session=session)
     if not results:
         return None
     best = results[0]
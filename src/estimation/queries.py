@@ -0,0 +1,376 @@
+"""Requetes SQL du chemin d'estimation (comparables, zone stats, evolution).
+
+Toutes les valeurs passent par des parametres lies : le texte SQL est
+constant, quelle que soit l'adresse ou la surface estimee.
+
+Les requetes marquees ``prepare=True`` (comparables, dont la planification
+PostGIS domine pour les petits resultats) sont executees via des
+prepared statements serveur (PREPARE / EXECUTE), prepares une fois par
+connexion du pool. Desactive via DB_PREPARED_STATEMENTS=false derriere un
+pooler en mode transaction (pgbouncer, Supavisor port 6543).
+"""
+
+import json
+import re
+from dataclasses import dataclass
+
+import pandas as pd
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+
+from src.config import DB_PREPARED_STATEMENTS
+from src.db import get_engine
+
+# Bornes de surface utilisees quand aucune surface n'est fournie
+SURFACE_ANY = (0, 99_999_999)
+
+# Cle de Connection.info (propre a la connexion DBAPI) listant les statements prepares
+_PREPARED_KEY = "stta_prepared"
+
+# Parametre nomme SQLAlchemy (":lat"), en excluant les casts ("::geography")
+_PARAM_RE = re.compile(r"(?<![:\w]):(\w+)")
+
+
+@dataclass(frozen=True)
+class EstimationQuery:
+    """Requete nommee a parametres lies, eventuellement preparee cote serveur."""
+
+    name: str
+    sql: str
+    params: tuple[tuple[str, str], ...]  # (nom, type SQL) dans l'ordre du PREPARE
+    prepare: bool = False
+
+    @property
+    def statement(self):
+        """Requete texte SQLAlchemy (parametres nommes)."""
+        return text(self.sql)
+
+    @property
+    def param_names(self) -> list[str]:
+        return [name for name, _ in self.params]
+
+    def prepare_sql(self) -> str:
+        """Instruction PREPARE (parametres positionnels $1..$n types)."""
+        positions = {name: i + 1 for i, name in enumerate(self.param_names)}
+        body = _PARAM_RE.sub(lambda m: f"${positions[m.group(1)]}", self.sql)
+        types = ", ".join(sql_type for _, sql_type in self.params)
+        return f"PREPARE {self.name} ({types}) AS {body}"
+
+    def execute_sql(self) -> str:
+        """Instruction EXECUTE (parametres nommes pour SQLAlchemy)."""
+        args = ", ".join(f":{name}" for name in self.param_names)
+        return f"EXECUTE {self.name}({args})"
+
+
+# ---------------------------------------------------------------------------
+# Comparables
+# ---------------------------------------------------------------------------
+
+COMPARABLE_COLUMNS = """
+    t.id_mutation, t.date_mutation, t.valeur_fonciere, t.type_bien,
+    t.surface, t.nb_pieces, t.prix_m2,
+    t.code_commune, t.nom_commune, t.code_departement,
+    t.adresse, t.code_postal,
+    t.latitude, t.longitude
+"""
+
+_POINT = "ST_SetSRID(ST_MakePoint(:lon, :lat), 4326)::geography"
+
+# Niveau 1 : candidats jusqu'au rayon de recherche (R3 de la zone_config).
+# Les zones R1/R2/R3 sont decoupees en memoire a partir de distance_m.
+COMPARABLES_ZONES = EstimationQuery(
+    name="stta_comparables_zones",
+    sql=f"""
+        SELECT {COMPARABLE_COLUMNS},
+               ST_Distance(t.geom::geography, {_POINT}) AS distance_m
+        FROM core.transactions t
+        WHERE t.type_bien = :type_bien
+          AND NOT t.is_outlier
+          AND t.geom IS NOT NULL
+          AND ST_DWithin(t.geom::geography, {_POINT}, :radius_m)
+          AND t.date_mutation >= CURRENT_DATE - INTERVAL '24 months'
+          AND t.surface BETWEEN :surface_min AND :surface_max
+        ORDER BY distance_m
+        LIMIT :max_comp
+    """,
+    params=(
+        ("lon", "float8"), ("lat", "float8"), ("type_bien", "text"),
+        ("radius_m", "float8"),
+        ("surface_min", "numeric"), ("surface_max", "numeric"),
+        ("max_comp", "int"),
+    ),
+    prepare=True,
+)
+
+
+# Mode knn : les max_comp ventes les plus proches (parcours ordonne du GIST,
+# distance en degres), distance geodesique calculee sur ces seules lignes
+COMPARABLES_KNN = EstimationQuery(
+    name="stta_comparables_knn",
+    sql=f"""
+        SELECT {COMPARABLE_COLUMNS},
+               ST_Distance(t.geom::geography, {_POINT}) AS distance_m,
+               t.knn_rows
+        FROM (
+            -- knn_rows : lignes KNN avant le filtre en metres (LIMIT atteinte ?)
+            SELECT k.*, count(*) OVER () AS knn_rows
+            FROM (
+                SELECT {COMPARABLE_COLUMNS}, t.geom
+                FROM core.transactions t
+                WHERE t.type_bien = :type_bien
+                  AND NOT t.is_outlier
+                  AND t.geom IS NOT NULL
+                  AND t.date_mutation >= CURRENT_DATE - INTERVAL '24 months'
+                  AND t.surface BETWEEN :surface_min AND :surface_max
+                ORDER BY t.geom <-> ST_SetSRID(ST_MakePoint(:lon, :lat), 4326)
+                LIMIT :max_comp
+            ) k
+        ) t
+        WHERE ST_DWithin(t.geom::geography, {_POINT}, :radius_m)
+        ORDER BY distance_m
+    """,
+    params=(
+        ("type_bien", "text"),
+        ("surface_min", "numeric"), ("surface_max", "numeric"),
+        ("lon", "float8"), ("lat", "float8"),
+        ("max_comp", "int"), ("radius_m", "float8"),
+    ),
+    prepare=True,
+)
+
+
+def _fallback_query(name: str, where: str, area_param: str) -> EstimationQuery:
+    # LIMIT dans la sous-requete : la distance n'est calculee que pour les
+    # lignes retournees, quel que soit le plan (tri d'un bitmap scan compris)
+    return EstimationQuery(
+        name=name,
+        sql=f"""
+            SELECT {COMPARABLE_COLUMNS},
+                   ST_Distance(t.geom::geography, {_POINT}) AS distance_m
+            FROM (
+                SELECT {COMPARABLE_COLUMNS}, t.geom
+                FROM core.transactions t
+                WHERE t.type_bien = :type_bien
+                  AND NOT t.is_outlier
+                  AND {where}
+                  AND t.surface BETWEEN :surface_min AND :surface_max
+                ORDER BY t.date_mutation DESC
+                LIMIT :max_comp
+            ) t
+            ORDER BY t.date_mutation DESC
+        """,
+        params=(
+            ("lon", "float8"), ("lat", "float8"), ("type_bien", "text"),
+            (area_param, "text"),
+            ("surface_min", "numeric"), ("surface_max", "numeric"),
+            ("max_comp", "int"),
+        ),
+        prepare=True,
+    )
+
+
+# Fallbacks sans zones (servis par idx_tx_cmp_commune / idx_tx_cmp_departement)
+FALLBACK_LEVELS = [
+    {
+        "level": 2,
+        "desc": "commune, 24 derniers mois",
+        "query": _fallback_query(
+            "stta_comparables_commune_24m",
+            """t.code_commune = :code_commune
+              AND t.date_mutation >= CURRENT_DATE - INTERVAL '24 months'""",
+            "code_commune",
+        ),
+    },
+    {
+        "level": 3,
+        "desc": "commune, 48 derniers mois",
+        "query": _fallback_query(
+            "stta_comparables_commune_48m",
+            """t.code_commune = :code_commune
+              AND t.date_mutation >= CURRENT_DATE - INTERVAL '48 months'""",
+            "code_commune",
+        ),
+    },
+    {
+        "level": 4,
+        "desc": "departement, 24 derniers mois",
+        "query": _fallback_query(
+            "stta_comparables_departement_24m",
+            """t.code_departement = :code_departement
+              AND t.date_mutation >= CURRENT_DATE - INTERVAL '24 months'""",
+            "code_departement",
+        ),
+    },
+]
+
+
+def surface_band(surface: float | None) -> tuple[float, float]:
+    """Bornes du filtre surface (0.5x - 2x), ou sans filtre si surface absente."""
+    if not surface:
+        return SURFACE_ANY
+    return surface * 0.5, surface * 2.0
+
+
+# ---------------------------------------------------------------------------
+# Marts (lookups par cle primaire : bind params, pas de PREPARE)
+# ---------------------------------------------------------------------------
+
+ZONE_STATS = EstimationQuery(
+    name="stta_zone_stats",
+    sql="""
+        SELECT total_transactions, last_12m_transactions,
+               median_prix_m2_12m, stddev_prix_m2_12m,
+               trend_12m, data_quality_flag
+        FROM mart.zone_stats
+        WHERE code_commune = :code_commune AND type_bien = :type_bien
+    """,
+    params=(("code_commune", "text"), ("type_bien", "text")),
+)
+
+SEMESTER_COMMUNE = EstimationQuery(
+    name="stta_semester_commune",
+    sql="""
+        SELECT annee, semestre, nb_transactions, median_prix_m2,
+               q1_prix_m2, q3_prix_m2
+        FROM mart.stats_commune
+        WHERE code_commune = :code_commune AND type_bien = :type_bien
+        ORDER BY annee, semestre
+    """,
+    params=(("code_commune", "text"), ("type_bien", "text")),
+)
+
+SEMESTER_DEPARTEMENT = EstimationQuery(
+    name="stta_semester_departement",
+    sql="""
+        SELECT annee, semestre, nb_transactions, median_prix_m2,
+               q1_prix_m2, q3_prix_m2
+        FROM mart.stats_departement
+        WHERE code_departement = :code_departement AND type_bien = :type_bien
+        ORDER BY annee, semestre
+    """,
+    params=(("code_departement", "text"), ("type_bien", "text")),
+)
+
+MONTHLY_COMMUNE = EstimationQuery(
+    name="stta_monthly_commune",
+    sql="""
+        SELECT annee || '-' || LPAD(mois::TEXT, 2, '0') AS annee_mois,
+               nb_transactions, median_prix_m2, rolling_median_6m
+        FROM mart.indices_temporels
+        WHERE code_commune = :code_commune AND type_bien = :type_bien
+        ORDER BY annee, mois
+    """,
+    params=(("code_commune", "text"), ("type_bien", "text")),
+)
+
+# Geocodage inverse local : commune de la transaction geolocalisee la plus
+# proche (KNN sur l'index GIST de geom, toutes transactions confondues)
+NEAREST_COMMUNE = EstimationQuery(
+    name="stta_nearest_commune",
+    sql=f"""
+        SELECT t.code_commune, t.nom_commune, t.code_postal, t.code_departement,
+               ST_Distance(t.geom::geography, {_POINT}) AS distance_m
+        FROM (
+            SELECT t.code_commune, t.nom_commune, t.code_postal, t.code_departement, t.geom
+            FROM core.transactions t
+            WHERE t.geom IS NOT NULL
+            ORDER BY t.geom <-> ST_SetSRID(ST_MakePoint(:lon, :lat), 4326)
+            LIMIT 1
+        ) t
+    """,
+    params=(("lon", "float8"), ("lat", "float8")),
+    prepare=True,
+)
+
+DATA_GENERATION = EstimationQuery(
+    name="stta_data_generation",
+    sql="SELECT generation FROM mart.data_generation WHERE id = 1",
+    params=(),
+)
+
+ESTIMATION_QUERIES = [
+    COMPARABLES_ZONES,
+    COMPARABLES_KNN,
+    *(lvl["query"] for lvl in FALLBACK_LEVELS),
+    ZONE_STATS,
+    SEMESTER_COMMUNE,
+    SEMESTER_DEPARTEMENT,
+    MONTHLY_COMMUNE,
+    NEAREST_COMMUNE,
+]
+
+
+# ---------------------------------------------------------------------------
+# Execution
+# ---------------------------------------------------------------------------
+
+def _prepared_names(conn) -> set[str]:
+    return conn.info.setdefault(_PREPARED_KEY, set())
+
+
+def prepare(conn, query: EstimationQuery):
+    """Prepare la requete sur la connexion si ce n'est pas deja fait."""
+    prepared = _prepared_names(conn)
+    if query.name not in prepared:
+        conn.exec_driver_sql(query.prepare_sql())
+        prepared.add(query.name)
+
+
+def prepare_all(conn) -> int:
+    """Prepare toutes les requetes eligibles sur la connexion. Retourne leur nombre."""
+    queries = [q for q in ESTIMATION_QUERIES if q.prepare]
+    for query in queries:
+        prepare(conn, query)
+    return len(queries)
+
+
+def _execute_prepared(conn, query: EstimationQuery, params: dict):
+    args = {name: params[name] for name in query.param_names}
+    try:
+        prepare(conn, query)
+        return conn.execute(text(query.execute_sql()), args)
+    except DBAPIError as e:
+        # Session serveur reinitialisee (DISCARD ALL, failover) : re-preparer une fois
+        if getattr(e.orig, "pgcode", None) != "26000":
+            raise
+        conn.rollback()
+        _prepared_names(conn).clear()
+        prepare(conn, query)
+        return conn.execute(text(query.execute_sql()), args)
+
+
+def read_df(query: EstimationQuery, params: dict, conn=None) -> pd.DataFrame:
+    """Execute une requete d'estimation et retourne un DataFrame.
+
+    Args:
+        query: Requete a executer.
+        params: Parametres nommes (les parametres en trop sont ignores).
+        conn: Connexion ouverte (optionnel, sinon l'engine partage).
+    """
+    if query.prepare and DB_PREPARED_STATEMENTS:
+        if conn is None:
+            with get_engine().connect() as own_conn:
+                return read_df(query, params, own_conn)
+        result = _execute_prepared(conn, query, params)
+        return pd.DataFrame.from_records(
+            result.fetchall(), columns=list(result.keys()), coerce_float=True
+        )
+
+    args = {name: params[name] for name in query.param_names}
+    return pd.read_sql(query.statement, conn if conn is not None else get_engine(), params=args)
+
+
+def explain_timings(conn, query: EstimationQuery, params: dict, prepared: bool) -> dict:
+    """Temps de planification et d'execution (ms) via EXPLAIN ANALYZE."""
+    args = {name: params[name] for name in query.param_names}
+    if prepared:
+        prepare(conn, query)
+        sql = f"EXPLAIN (ANALYZE, FORMAT JSON) {query.execute_sql()}"
+    else:
+        sql = f"EXPLAIN (ANALYZE, FORMAT JSON) {query.sql}"
+    raw = conn.execute(text(sql), args).scalar()
+    plan = (raw if isinstance(raw, list) else json.loads(raw))[0]
+    return {
+        "planning_ms": float(plan.get("Planning Time", 0.0)),
+        "execution_ms": float(plan.get("Execution Time", 0.0)),
+    }
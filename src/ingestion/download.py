@@ -2,17 +2,42 @@
 
 import hashlib
 import json
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
 from datetime import datetime, timezone
+from email.utils import format_datetime
 from pathlib import Path
 
 import requests
 from tqdm import tqdm
 
-from src.config import LANDING_DIR, ETALAB_BASE_URL, DVF_YEARS, DVF_DEPARTEMENTS
+from src.config import (
+    LANDING_DIR,
+    ETALAB_BASE_URL,
+    DVF_YEARS,
+    DVF_DEPARTEMENTS,
+    DOWNLOAD_CONCURRENCY,
+)
 
 MANIFEST_PATH = LANDING_DIR / "manifest.json"
 
 
+@dataclass
+class DownloadResult:
+    """Resultat du telechargement d'un fichier."""
+    status: str                      # "downloaded", "not_modified" ou "error"
+    sha256: str | None = None
+    size_bytes: int = 0
+    etag: str | None = None
+    last_modified: str | None = None
+    resumed_from: int = 0            # Octets repris depuis le .part
+    error: str | None = None
+    http_status: int | None = None   # Code HTTP d'une erreur (404 : fichier absent chez Etalab)
+
+
 def load_manifest() -> dict:
     """Charge le manifest des fichiers telecharges."""
     if MANIFEST_PATH.exists():
@@ -38,25 +63,151 @@ def compute_sha256(filepath: Path) -> str:
     return sha256.hexdigest()
 
 
-def download_file(url: str, dest: Path, chunk_size: int = 8192) -> bool:
-    """Telecharge un fichier avec barre de progression."""
+def part_path(dest: Path) -> Path:
+    """Fichier partiel d'un telechargement en cours (ex: 75.csv.gz.part)."""
+    return dest.with_name(dest.name + ".part")
+
+
+def _part_meta_path(dest: Path) -> Path:
+    """Validateurs (ETag / Last-Modified) de la reponse ayant ecrit le .part."""
+    return dest.with_name(dest.name + ".part.json")
+
+
+def _load_part_meta(dest: Path) -> dict:
+    path = _part_meta_path(dest)
+    if path.exists():
+        return json.loads(path.read_text(encoding="utf-8"))
+    return {}
+
+
+def discard_partial(dest: Path):
+    """Supprime le .part et ses validateurs."""
+    part_path(dest).unlink(missing_ok=True)
+    _part_meta_path(dest).unlink(missing_ok=True)
+
+
+def _content_range_start(value: str | None) -> int | None:
+    """Premier octet d'un Content-Range ("bytes 30000-99999/100000" -> 30000)."""
     try:
-        resp = requests.get(url, stream=True, timeout=300)
-        resp.raise_for_status()
-        total = int(resp.headers.get("content-length", 0))
-
-        dest.parent.mkdir(parents=True, exist_ok=True)
-        with open(dest, "wb") as f:
-            with tqdm(total=total, unit="B", unit_scale=True, desc=dest.name) as pbar:
-                for chunk in resp.iter_content(chunk_size=chunk_size):
-                    f.write(chunk)
-                    pbar.update(len(chunk))
-        return True
+        return int(value.split()[1].split("-")[0])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+
+def download_file(
+    url: str,
+    dest: Path,
+    etag: str | None = None,
+    last_modified: str | None = None,
+    chunk_size: int = 65536,
+    position: int | None = None,
+    _retry: bool = True,
+) -> DownloadResult:
+    """Telecharge un fichier avec reprise et revalidation conditionnelle.
+
+    - Si dest existe et qu'un validateur est fourni : GET conditionnel
+      (If-None-Match / If-Modified-Since), un 304 ne transfere rien.
+    - Si un .part existe : reprise via Range + If-Range (le serveur renvoie
+      le fichier complet si la ressource a change entre-temps). Un 206 dont
+      le Content-Range ne commence pas a la fin du .part relance de zero.
+    - Le SHA256 est calcule pendant l'ecriture ; dest n'est remplace
+      qu'une fois le fichier complet (rename atomique du .part).
+    """
+    part = part_path(dest)
+    headers = {}
+    if dest.exists():
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+
+    offset = part.stat().st_size if part.exists() else 0
+    if offset:
+        meta = _load_part_meta(dest)
+        if_range = meta.get("etag") or meta.get("last_modified")
+        if if_range:
+            headers["Range"] = f"bytes={offset}-"
+            headers["If-Range"] = if_range
+        else:
+            offset = 0  # .part sans validateur : impossible de verifier, on repart de zero
+
+    try:
+        with requests.get(url, headers=headers, stream=True, timeout=300) as resp:
+            if resp.status_code == 304:
+                return DownloadResult(
+                    status="not_modified",
+                    etag=etag or resp.headers.get("ETag"),
+                    last_modified=last_modified,
+                )
+            if resp.status_code == 416 and _retry:
+                # .part plus long que la ressource : obsolete
+                discard_partial(dest)
+                return download_file(url, dest, etag, last_modified, chunk_size, position, _retry=False)
+            resp.raise_for_status()
+
+            if resp.status_code == 206:
+                start = _content_range_start(resp.headers.get("Content-Range"))
+                if start != offset:
+                    # Plage renvoyee differente de celle demandee : le .part n'est pas reutilisable
+                    if not _retry:
+                        raise IOError(f"Content-Range inattendu: {resp.headers.get('Content-Range')}")
+                    discard_partial(dest)
+                    return download_file(url, dest, etag, last_modified, chunk_size, position, _retry=False)
+
+            sha256 = hashlib.sha256()
+            if resp.status_code == 206:
+                with open(part, "rb") as f:
+                    for chunk in iter(lambda: f.read(chunk_size), b""):
+                        sha256.update(chunk)
+                mode = "ab"
+            else:
+                offset = 0
+                mode = "wb"
+
+            new_etag = resp.headers.get("ETag")
+            new_last_modified = resp.headers.get("Last-Modified")
+            dest.parent.mkdir(parents=True, exist_ok=True)
+            _part_meta_path(dest).write_text(
+                json.dumps({"etag": new_etag, "last_modified": new_last_modified}),
+                encoding="utf-8",
+            )
+
+            length = int(resp.headers.get("content-length", 0))
+            expected = offset + length if length else None
+            size = offset
+            with open(part, mode) as f:
+                with tqdm(
+                    total=expected, initial=offset, unit="B", unit_scale=True,
+                    desc=dest.name, position=position, leave=position is None,
+                ) as pbar:
+                    # Octets bruts (sans decodage Content-Encoding) pour rester aligne sur Range
+                    for chunk in resp.raw.stream(chunk_size, decode_content=False):
+                        f.write(chunk)
+                        sha256.update(chunk)
+                        size += len(chunk)
+                        pbar.update(len(chunk))
+
+        if expected is not None and size != expected:
+            raise IOError(f"telechargement incomplet ({size}/{expected} octets)")
+
+        os.replace(part, dest)
+        _part_meta_path(dest).unlink(missing_ok=True)
+        return DownloadResult(
+            status="downloaded",
+            sha256=sha256.hexdigest(),
+            size_bytes=size,
+            etag=new_etag,
+            last_modified=new_last_modified,
+            resumed_from=offset,
+        )
     except Exception as e:
+        # Le .part est conserve pour reprise au prochain lancement
         print(f"Erreur telechargement {url}: {e}")
-        if dest.exists():
-            dest.unlink()
-        return False
+        response = getattr(e, "response", None)
+        return DownloadResult(
+            status="error", error=str(e),
+            http_status=response.status_code if response is not None else None,
+        )
 
 
 def get_csv_url(year: int, departement: str) -> str:
@@ -64,10 +215,92 @@ def get_csv_url(year: int, departement: str) -> str:
     return f"{ETALAB_BASE_URL}/{year}/departements/{departement}.csv.gz"
 
 
+def _http_date(timestamp: float) -> str:
+    return format_datetime(datetime.fromtimestamp(timestamp, timezone.utc), usegmt=True)
+
+
+def _validators(entry: dict, dest: Path) -> tuple[str | None, str | None]:
+    """ETag / Last-Modified a envoyer pour revalider un fichier du landing."""
+    if not dest.exists():
+        return None, None
+    stat = dest.stat()
+    if not entry:
+        # Fichier present hors manifest (copie manuelle, manifest perdu) :
+        # revalide par sa date de modification s'il n'est pas vide
+        return None, _http_date(stat.st_mtime) if stat.st_size else None
+    if stat.st_size != entry.get("size_bytes"):
+        return None, None
+    last_modified = entry.get("last_modified")
+    if not last_modified and entry.get("downloaded_at"):
+        # Manifests anterieurs : date de telechargement comme If-Modified-Since
+        downloaded_at = datetime.fromisoformat(entry["downloaded_at"])
+        last_modified = format_datetime(downloaded_at.astimezone(timezone.utc), usegmt=True)
+    return entry.get("etag"), last_modified
+
+
+def download_dvf_file(
+    year: int,
+    dep: str,
+    manifest: dict,
+    manifest_lock: threading.Lock,
+    force: bool = False,
+    position: int | None = None,
+) -> tuple[str, DownloadResult]:
+    """Telecharge (ou revalide) un fichier departement x annee et met a jour le manifest."""
+    filename = f"{year}/{dep}.csv.gz"
+    dest = LANDING_DIR / filename
+    if force:
+        discard_partial(dest)
+        etag, last_modified = None, None
+    else:
+        etag, last_modified = _validators(manifest.get(filename, {}), dest)
+
+    url = get_csv_url(year, dep)
+    result = download_file(url, dest, etag, last_modified, position=position)
+
+    adopted = None
+    if result.status == "not_modified" and filename not in manifest:
+        # Fichier deja present hors manifest et a jour : adopte tel quel
+        stat = dest.stat()
+        adopted = {
+            "downloaded_at": datetime.fromtimestamp(stat.st_mtime, timezone.utc).isoformat(),
+            "source_url": url,
+            "sha256": compute_sha256(dest),
+            "size_bytes": stat.st_size,
+            "etag": result.etag,
+            "last_modified": result.last_modified,
+            "year": year,
+            "departement": dep,
+        }
+
+    now = datetime.now(timezone.utc).isoformat()
+    with manifest_lock:
+        if result.status == "downloaded":
+            manifest[filename] = {
+                "downloaded_at": now,
+                "checked_at": now,
+                "source_url": url,
+                "sha256": result.sha256,
+                "size_bytes": result.size_bytes,
+                "etag": result.etag,
+                "last_modified": result.last_modified,
+                "year": year,
+                "departement": dep,
+            }
+            save_manifest(manifest)
+        elif result.status == "not_modified":
+            if adopted is not None:
+                manifest[filename] = adopted
+            manifest[filename]["checked_at"] = now
+            save_manifest(manifest)
+    return filename, result
+
+
 def download_dvf_etalab(
     years: list[int] | None = None,
     departements: list[str] | None = None,
     force: bool = False,
+    concurrency: int | None = None,
 ):
     """
     Telecharge les CSV DVF geolocalisees depuis Etalab.
@@ -78,53 +311,48 @@ def download_dvf_etalab(
         years: Annees a telecharger (defaut: DVF_YEARS).
         departements: Departements a telecharger (defaut: DVF_DEPARTEMENTS).
         force: Re-telecharger meme si le fichier existe deja.
+        concurrency: Telechargements simultanes (defaut: DOWNLOAD_CONCURRENCY).
     """
     if years is None:
         years = DVF_YEARS
     if departements is None:
         departements = DVF_DEPARTEMENTS
+    if concurrency is None:
+        concurrency = DOWNLOAD_CONCURRENCY
+    concurrency = max(1, concurrency)
 
     manifest = load_manifest()
+    manifest_lock = threading.Lock()
     LANDING_DIR.mkdir(parents=True, exist_ok=True)
 
+    # Une ligne de progression par telechargement simultane
+    slots = queue.Queue()
+    for i in range(concurrency):
+        slots.put(i)
+
+    def _download(year: int, dep: str) -> tuple[str, DownloadResult]:
+        slot = slots.get()
+        try:
+            return download_dvf_file(year, dep, manifest, manifest_lock, force=force, position=slot)
+        finally:
+            slots.put(slot)
+
     total_files = len(years) * len(departements)
     downloaded = 0
     skipped = 0
     errors = 0
 
-    for year in years:
-        year_dir = LANDING_DIR / str(year)
-        year_dir.mkdir(parents=True, exist_ok=True)
-
-        for dep in departements:
-            filename = f"{year}/{dep}.csv.gz"
-            dest = LANDING_DIR / filename
-            url = get_csv_url(year, dep)
-
-            if not force and filename in manifest:
-                existing_checksum = manifest[filename].get("sha256", "")
-                if dest.exists() and existing_checksum:
-                    current_checksum = compute_sha256(dest)
-                    if current_checksum == existing_checksum:
-                        print(f"[SKIP] {filename} deja a jour")
-                        skipped += 1
-                        continue
-
-            print(f"[DOWNLOAD] {filename}")
-            success = download_file(url, dest)
-
-            if success:
-                checksum = compute_sha256(dest)
-                manifest[filename] = {
-                    "downloaded_at": datetime.now(timezone.utc).isoformat(),
-                    "source_url": url,
-                    "sha256": checksum,
-                    "size_bytes": dest.stat().st_size,
-                    "year": year,
-                    "departement": dep,
-                }
-                save_manifest(manifest)
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = [pool.submit(_download, year, dep) for year in years for dep in departements]
+        for future in as_completed(futures):
+            filename, result = future.result()
+            if result.status == "downloaded":
+                resumed = f" (repris a {result.resumed_from:,} octets)" if result.resumed_from else ""
+                tqdm.write(f"[DOWNLOAD] {filename}{resumed}")
                 downloaded += 1
+            elif result.status == "not_modified":
+                tqdm.write(f"[SKIP] {filename} deja a jour")
+                skipped += 1
             else:
                 errors += 1
 
@@ -3,12 +3,24 @@
 import csv
 import gzip
 import io
+import time
+from dataclasses import dataclass
 from pathlib import Path
 
 from sqlalchemy import text
 
-from src.config import LANDING_DIR, DVF_YEARS, DVF_DEPARTEMENTS, SQL_DIR
+from src.config import LANDING_DIR, DVF_YEARS, DVF_DEPARTEMENTS, LOAD_PREFILTER, SQL_DIR
 from src.db import get_engine, get_raw_connection
+from src.ingestion.download import compute_sha256, load_manifest
+from src.ingestion.metadata import (
+    adopt_ingested_file,
+    forget_ingested_file,
+    ingested_files,
+    init_ingestion_log,
+    record_ingested_file,
+)
+from src.ingestion.prefilter import PrefilterStats, iter_prefiltered
+from src.transform.staging_to_core import ensure_core_partitions, migrate_core_tables, reset_core_partition
 
 # Colonnes du CSV Etalab a charger dans staging.dvf
 # On ne prend que les colonnes utiles (le CSV en a ~40+)
@@ -67,7 +79,38 @@ def _clean_value(val: str) -> str | None:
     return val
 
 
-def load_single_csv(csv_path: Path, year: int) -> int:
+def _insert_staging(records) -> int:
+    """INSERT par batch des enregistrements dans staging.dvf. Retourne leur nombre."""
+    engine = get_engine()
+    cols_sql = ", ".join(STAGING_COLUMNS)
+    placeholders = ", ".join(f":{c}" for c in STAGING_COLUMNS)
+    insert_sql = text(
+        f"INSERT INTO staging.dvf ({cols_sql}) VALUES ({placeholders})"
+    )
+
+    batch = []
+    batch_size = 5000
+    total_rows = 0
+
+    for record in records:
+        batch.append(record)
+
+        if len(batch) >= batch_size:
+            with engine.begin() as conn:
+                conn.execute(insert_sql, batch)
+            total_rows += len(batch)
+            batch = []
+
+    # Dernier batch
+    if batch:
+        with engine.begin() as conn:
+            conn.execute(insert_sql, batch)
+        total_rows += len(batch)
+
+    return total_rows
+
+
+def load_single_csv(csv_path: Path, year: int, prefilter: bool = False) -> int:
     """
     Charge un fichier CSV (possiblement .gz) dans staging.dvf.
 
@@ -77,10 +120,15 @@ def load_single_csv(csv_path: Path, year: int) -> int:
     Args:
         csv_path: Chemin vers le fichier .csv ou .csv.gz.
         year: Annee du fichier (pour la colonne annee_fichier).
+        prefilter: N'envoyer que les lignes retenues par la transformation
+            vers core (ventes mono-bien residentielles), cf. prefilter.py.
 
     Returns:
         Nombre de lignes chargees.
     """
+    if prefilter:
+        return _load_prefiltered_csv(csv_path, year)
+
     # Ouvrir le fichier (gzip ou plain)
     if csv_path.suffix == ".gz":
         f = gzip.open(csv_path, "rt", encoding="utf-8")
@@ -96,48 +144,137 @@ def load_single_csv(csv_path: Path, year: int) -> int:
         if missing:
             print(f"  [WARN] Colonnes manquantes dans {csv_path.name}: {missing}")
 
-        # Construire les INSERT par batch
-        engine = get_engine()
-        cols_sql = ", ".join(STAGING_COLUMNS)
-        placeholders = ", ".join(f":{c}" for c in STAGING_COLUMNS)
-        insert_sql = text(
-            f"INSERT INTO staging.dvf ({cols_sql}) VALUES ({placeholders})"
-        )
+        def _records():
+            for row in reader:
+                record = {}
+                for csv_col, db_col in ETALAB_COLUMNS_MAP.items():
+                    record[db_col] = _clean_value(row.get(csv_col, ""))
+                record["annee_fichier"] = year
+                yield record
 
-        batch = []
-        batch_size = 5000
-        total_rows = 0
+        return _insert_staging(_records())
 
-        for row in reader:
-            record = {}
-            for csv_col, db_col in ETALAB_COLUMNS_MAP.items():
-                record[db_col] = _clean_value(row.get(csv_col, ""))
-            record["annee_fichier"] = year
+    finally:
+        f.close()
 
-            batch.append(record)
 
-            if len(batch) >= batch_size:
-                with engine.begin() as conn:
-                    conn.execute(insert_sql, batch)
-                total_rows += len(batch)
-                batch = []
+def _load_prefiltered_csv(csv_path: Path, year: int) -> int:
+    """Pre-filtre le CSV cote client et charge les lignes retenues au fil de la lecture."""
+    stats = PrefilterStats()
+
+    def _records():
+        for kept in iter_prefiltered(csv_path, list(ETALAB_COLUMNS_MAP), stats=stats):
+            for values in kept.itertuples(index=False, name=None):
+                record = {
+                    db_col: _clean_value(value)
+                    for (csv_col, db_col), value in zip(ETALAB_COLUMNS_MAP.items(), values)
+                }
+                record["annee_fichier"] = year
+                yield record
+
+    rows = _insert_staging(_records())
+    print(
+        f"  [PREFILTER] {stats.rows_read:,} lignes lues, {stats.residential_lots:,} lots residentiels, "
+        f"{stats.rows_kept:,} retenues ({100 * stats.kept_ratio:.1f}%)"
+    )
+    return rows
+
+
+@dataclass
+class FileLoad:
+    """Chargement d'un fichier departement x annee dans core."""
+    rows_staged: int
+    rows_inserted: int
+    load_s: float
+    transform_s: float
+
+
+def read_transform_sql() -> str:
+    """SQL de transformation staging -> core."""
+    return (SQL_DIR / "core" / "transform_staging_to_core.sql").read_text(encoding="utf-8")
+
+
+def load_departement_year(
+    year: int,
+    dep: str,
+    csv_path: Path,
+    sha256: str,
+    entry: dict | None,
+    transform_sql: str,
+    force: bool = False,
+    prefilter: bool = False,
+) -> FileLoad | None:
+    """Charge un fichier dans core via staging et l'inscrit au registre.
 
-        # Dernier batch
-        if batch:
-            with engine.begin() as conn:
-                conn.execute(insert_sql, batch)
-            total_rows += len(batch)
+    Args:
+        entry: Ligne de staging.ingestion_files du departement x annee (None si absent).
 
-        return total_rows
+    Returns:
+        Volumes et durees, ou None si le fichier est deja charge (meme SHA256).
+    """
+    if entry is not None and entry["source_sha256"] == sha256 and not force:
+        print(f"[SKIP] {year}/{dep} deja charge ({entry['rows_inserted']:,} rows)")
+        return None
 
-    finally:
-        f.close()
+    engine = get_engine()
+
+    # Present dans core avant la creation du registre : considere comme charge,
+    # le SHA256 du fichier courant est adopte (un changement ulterieur recharge)
+    if entry is not None and entry["source_sha256"] is None and not force:
+        with engine.begin() as conn:
+            adopt_ingested_file(conn, year, dep, sha256)
+        print(f"[SKIP] {year}/{dep} deja dans core ({entry['rows_inserted']:,} rows), SHA256 enregistre")
+        return None
+
+    # Fichier nouveau, modifie ou force : la partition est rechargee.
+    # Le registre est purge d'abord pour qu'une interruption relance le fichier.
+    if entry is not None:
+        with engine.begin() as conn:
+            forget_ingested_file(conn, year, dep)
+    reset_core_partition(dep, year)
+
+    print(f"\n--- {year}/{dep} ---")
+
+    # 1. Truncate staging
+    truncate_staging()
+
+    # 2. Load CSV dans staging
+    print(f"  [LOAD] {csv_path.name}...")
+    start = time.perf_counter()
+    rows = load_single_csv(csv_path, year, prefilter=prefilter)
+    load_s = time.perf_counter() - start
+    print(f"  [LOAD] {rows:,} lignes chargees dans staging ({load_s:.1f}s)")
+
+    # 3. Transform staging -> core, enregistre dans la meme transaction
+    print(f"  [TRANSFORM] staging -> core...")
+    start = time.perf_counter()
+    inserted = 0
+    with engine.begin() as conn:
+        conn.execute(text("SET statement_timeout = '300s'"))
+        for stmt in transform_sql.split(";"):
+            stmt = stmt.strip()
+            if stmt:
+                inserted += max(conn.execute(text(stmt)).rowcount, 0)
+        transform_s = time.perf_counter() - start
+        record_ingested_file(
+            conn, year, dep, sha256,
+            rows_staged=rows, rows_inserted=inserted,
+            load_s=load_s, transform_s=transform_s, prefilter=prefilter,
+        )
+    print(f"  [TRANSFORM] {inserted:,} transactions inserees dans core ({transform_s:.1f}s)")
+
+    # 4. Truncate staging (liberer espace)
+    truncate_staging()
+
+    return FileLoad(rows_staged=rows, rows_inserted=inserted, load_s=load_s, transform_s=transform_s)
 
 
 def load_and_transform(
     years: list[int] | None = None,
     departements: list[str] | None = None,
-):
+    force: bool = False,
+    prefilter: bool | None = None,
+) -> int:
     """
     Charge les CSV dans staging puis transforme vers core, un fichier a la fois.
 
@@ -151,7 +288,14 @@ def load_and_transform(
     Args:
         years: Annees a charger (defaut: DVF_YEARS).
         departements: Departements a charger (defaut: DVF_DEPARTEMENTS).
+        force: Recharger les departement x annee deja presents dans core
+            (TRUNCATE de la partition si core.transactions est partitionnee).
+            Sans force, un fichier est saute si staging.ingestion_files l'a
+            deja enregistre avec le meme SHA256 ; sinon sa partition est rechargee.
+        prefilter: Filtrer les lots cote client avant staging (defaut: LOAD_PREFILTER).
     """
+    if prefilter is None:
+        prefilter = LOAD_PREFILTER
     if years is None:
         years = DVF_YEARS
     if departements is None:
@@ -160,11 +304,18 @@ def load_and_transform(
     # S'assurer que staging existe
     create_staging_table()
 
-    # Lire le SQL de transformation
-    transform_sql_path = SQL_DIR / "core" / "transform_staging_to_core.sql"
-    transform_sql = transform_sql_path.read_text(encoding="utf-8")
+    # Partitions cibles (sans effet si core.transactions n'est pas partitionnee)
+    ensure_core_partitions(departements, years)
+    # Colonnes ajoutees depuis la creation de core.transactions (ex: geo_key)
+    migrate_core_tables()
+
+    transform_sql = read_transform_sql()
+
+    # Registre des fichiers deja charges (une requete, au lieu d'un COUNT(*) par fichier)
+    init_ingestion_log()
+    ledger = ingested_files()
+    manifest = load_manifest()
 
-    engine = get_engine()
     total_loaded = 0
     total_transformed = 0
 
@@ -176,61 +327,23 @@ def load_and_transform(
                 print(f"[SKIP] {csv_path} non trouve")
                 continue
 
-            # Verifier si deja charge dans core
-            with engine.connect() as conn:
-                already = conn.execute(
-                    text("SELECT COUNT(*) FROM core.transactions WHERE code_departement = :dep AND annee = :year"),
-                    {"dep": dep, "year": year}
-                ).scalar()
-            if already > 0:
-                print(f"[SKIP] {year}/{dep} deja charge ({already:,} rows)")
-                continue
-
-            print(f"\n--- {year}/{dep} ---")
-
-            # 1. Truncate staging
-            truncate_staging()
-
-            # 2. Load CSV dans staging
-            print(f"  [LOAD] {csv_path.name}...")
-            rows = load_single_csv(csv_path, year)
-            total_loaded += rows
-            print(f"  [LOAD] {rows:,} lignes chargees dans staging")
-
-            # 3. Transform staging -> core
-            print(f"  [TRANSFORM] staging -> core...")
-            count_before = 0
-            with engine.connect() as conn:
-                count_before = conn.execute(
-                    text("SELECT COUNT(*) FROM core.transactions")
-                ).scalar()
-
-            with engine.begin() as conn:
-                conn.execute(text("SET statement_timeout = '300s'"))
-                for stmt in transform_sql.split(";"):
-                    stmt = stmt.strip()
-                    if stmt:
-                        conn.execute(text(stmt))
-
-            with engine.connect() as conn:
-                count_after = conn.execute(
-                    text("SELECT COUNT(*) FROM core.transactions")
-                ).scalar()
-
-            inserted = count_after - count_before
-            total_transformed += inserted
-            print(f"  [TRANSFORM] {inserted:,} transactions inserees dans core")
-
-            # 4. Truncate staging (liberer espace)
-            truncate_staging()
+            sha256 = manifest.get(f"{year}/{dep}.csv.gz", {}).get("sha256") or compute_sha256(csv_path)
+            result = load_departement_year(
+                year, dep, csv_path, sha256, ledger.get((year, dep)), transform_sql,
+                force=force, prefilter=prefilter,
+            )
+            if result is not None:
+                total_loaded += result.rows_staged
+                total_transformed += result.rows_inserted
 
     print(f"\n=== Chargement termine ===")
     print(f"  Lignes staging totales : {total_loaded:,}")
     print(f"  Transactions core      : {total_transformed:,}")
+    return total_transformed
 
 
-def detect_outliers():
-    """Detecte les outliers dans core.transactions via IQR par dept x type x annee."""
+def detect_outliers() -> int:
+    """Detecte les outliers dans core.transactions via IQR par dept x type x annee. Retourne leur nombre."""
     engine = get_engine()
     print("[OUTLIERS] Detection des outliers par IQR...")
 
@@ -268,3 +381,4 @@ def detect_outliers():
 
     pct = 100 * outliers / max(total, 1)
     print(f"[OUTLIERS] {outliers:,} outliers sur {total:,} transactions ({pct:.1f}%)")
+    return outliers
@@ -17,26 +17,76 @@ CREATE TABLE IF NOT EXISTS staging.ingestion_log (
     step            TEXT,
     departements    TEXT[],
     row_count       INTEGER,
-    notes           TEXT
+    notes           TEXT,
+    input_hash      TEXT
 );
 """
 
+# Registre des fichiers charges dans core (un par departement x annee) :
+# consulte par load_and_transform a la place des COUNT(*) sur core.transactions
+INGESTION_FILES_DDL = """
+CREATE TABLE IF NOT EXISTS staging.ingestion_files (
+    annee            INTEGER NOT NULL,
+    code_departement TEXT NOT NULL,
+    source_sha256    TEXT,
+    rows_staged      INTEGER,
+    rows_inserted    INTEGER,
+    load_s           REAL,
+    transform_s      REAL,
+    prefilter        BOOLEAN,
+    loaded_at        TIMESTAMPTZ NOT NULL,
+    PRIMARY KEY (annee, code_departement)
+);
+"""
+
+# Base existante a la creation du registre : les departement x annee deja dans
+# core y sont inscrits sans SHA256 (adopte au prochain chargement, cf.
+# load_departement_year) plutot que recharges
+INGESTION_FILES_BACKFILL = """
+INSERT INTO staging.ingestion_files (annee, code_departement, rows_inserted, loaded_at)
+SELECT annee, code_departement, COUNT(*), now()
+FROM core.transactions
+GROUP BY annee, code_departement
+ON CONFLICT (annee, code_departement) DO NOTHING
+"""
+
+# Tables creees avant l'ajout des checkpoints (cf. src/pipeline.py)
+INGESTION_LOG_MIGRATIONS = [
+    "ALTER TABLE staging.ingestion_log ADD COLUMN IF NOT EXISTS input_hash TEXT",
+    "CREATE INDEX IF NOT EXISTS idx_ingestion_log_step ON staging.ingestion_log (step, status, id)",
+]
+
 
 def init_ingestion_log():
-    """Cree la table de log si elle n'existe pas."""
+    """Cree les tables de log et de registre des fichiers si elles n'existent pas.
+
+    A la creation du registre, il est initialise depuis core.transactions.
+    """
     engine = get_engine()
     with engine.begin() as conn:
         conn.execute(text(INGESTION_LOG_DDL))
+        ledger_exists = conn.execute(text("SELECT to_regclass('staging.ingestion_files')")).scalar() is not None
+        conn.execute(text(INGESTION_FILES_DDL))
+        if not ledger_exists and conn.execute(text("SELECT to_regclass('core.transactions')")).scalar() is not None:
+            n = conn.execute(text(INGESTION_FILES_BACKFILL)).rowcount
+            print(f"[LEDGER] Registre initialise depuis core.transactions : {n} departement x annee")
+        for stmt in INGESTION_LOG_MIGRATIONS:
+            conn.execute(text(stmt))
 
 
-def log_start(run_id: str, step: str, departements: list[str] | None = None) -> int:
+def log_start(
+    run_id: str,
+    step: str,
+    departements: list[str] | None = None,
+    input_hash: str | None = None,
+) -> int:
     """Enregistre le debut d'une execution. Retourne l'id du log."""
     engine = get_engine()
     with engine.begin() as conn:
         result = conn.execute(
             text("""
-                INSERT INTO staging.ingestion_log (run_id, started_at, step, departements, status)
-                VALUES (:run_id, :started_at, :step, :departements, 'running')
+                INSERT INTO staging.ingestion_log (run_id, started_at, step, departements, status, input_hash)
+                VALUES (:run_id, :started_at, :step, :departements, 'running', :input_hash)
                 RETURNING id
             """),
             {
@@ -44,20 +94,28 @@ def log_start(run_id: str, step: str, departements: list[str] | None = None) ->
                 "started_at": datetime.now(timezone.utc),
                 "step": step,
                 "departements": departements,
+                "input_hash": input_hash,
             },
         )
         return result.scalar()
 
 
-def log_finish(log_id: int, status: str = "success", row_count: int | None = None, notes: str | None = None):
-    """Met a jour le log apres execution."""
+def log_finish(
+    log_id: int,
+    status: str = "success",
+    row_count: int | None = None,
+    notes: str | None = None,
+    input_hash: str | None = None,
+):
+    """Met a jour le log apres execution (input_hash : remplace celui du debut si fourni)."""
     engine = get_engine()
     with engine.begin() as conn:
         conn.execute(
             text("""
                 UPDATE staging.ingestion_log
                 SET finished_at = :finished_at, status = :status,
-                    row_count = :row_count, notes = :notes
+                    row_count = :row_count, notes = :notes,
+                    input_hash = COALESCE(:input_hash, input_hash)
                 WHERE id = :id
             """),
             {
@@ -65,6 +123,129 @@ def log_finish(log_id: int, status: str = "success", row_count: int | None = Non
                 "status": status,
                 "row_count": row_count,
                 "notes": notes,
+                "input_hash": input_hash,
                 "id": log_id,
             },
         )
+
+
+def last_success_hash(step: str) -> str | None:
+    """input_hash du dernier succes d'une etape."""
+    engine = get_engine()
+    with engine.connect() as conn:
+        return conn.execute(
+            text("""
+                SELECT input_hash FROM staging.ingestion_log
+                WHERE step = :step AND status = 'success'
+                ORDER BY id DESC LIMIT 1
+            """),
+            {"step": step},
+        ).scalar()
+
+
+def succeeded_steps(run_id: str) -> set[str]:
+    """Etapes reussies (ou sautees) d'un run."""
+    engine = get_engine()
+    with engine.connect() as conn:
+        rows = conn.execute(
+            text("""
+                SELECT DISTINCT step FROM staging.ingestion_log
+                WHERE run_id = :run_id AND status IN ('success', 'skipped')
+            """),
+            {"run_id": run_id},
+        ).fetchall()
+    return {r[0] for r in rows}
+
+
+def last_failed_run(step: str) -> str | None:
+    """run_id du dernier run en echec d'une etape (ex: 'full_pipeline')."""
+    engine = get_engine()
+    with engine.connect() as conn:
+        return conn.execute(
+            text("""
+                SELECT run_id FROM staging.ingestion_log
+                WHERE step = :step AND status = 'failed'
+                  AND id > COALESCE(
+                      (SELECT MAX(id) FROM staging.ingestion_log WHERE step = :step AND status = 'success'), 0)
+                ORDER BY id DESC LIMIT 1
+            """),
+            {"step": step},
+        ).scalar()
+
+
+def ingested_files() -> dict[tuple[int, str], dict]:
+    """Registre des fichiers charges : {(annee, departement): ligne}."""
+    engine = get_engine()
+    with engine.connect() as conn:
+        rows = conn.execute(text("SELECT * FROM staging.ingestion_files")).mappings().fetchall()
+    return {(r["annee"], r["code_departement"]): dict(r) for r in rows}
+
+
+def record_ingested_file(
+    conn,
+    year: int,
+    departement: str,
+    source_sha256: str | None,
+    rows_staged: int,
+    rows_inserted: int,
+    load_s: float,
+    transform_s: float,
+    prefilter: bool = False,
+):
+    """Enregistre un fichier charge, dans la transaction de son INSERT vers core."""
+    conn.execute(
+        text("""
+            INSERT INTO staging.ingestion_files (
+                annee, code_departement, source_sha256, rows_staged, rows_inserted,
+                load_s, transform_s, prefilter, loaded_at
+            )
+            VALUES (:annee, :dep, :sha, :rows_staged, :rows_inserted,
+                    :load_s, :transform_s, :prefilter, :loaded_at)
+            ON CONFLICT (annee, code_departement) DO UPDATE SET
+                source_sha256 = EXCLUDED.source_sha256,
+                rows_staged = EXCLUDED.rows_staged,
+                rows_inserted = EXCLUDED.rows_inserted,
+                load_s = EXCLUDED.load_s,
+                transform_s = EXCLUDED.transform_s,
+                prefilter = EXCLUDED.prefilter,
+                loaded_at = EXCLUDED.loaded_at
+        """),
+        {
+            "annee": year,
+            "dep": departement,
+            "sha": source_sha256,
+            "rows_staged": rows_staged,
+            "rows_inserted": rows_inserted,
+            "load_s": round(load_s, 3),
+            "transform_s": round(transform_s, 3),
+            "prefilter": prefilter,
+            "loaded_at": datetime.now(timezone.utc),
+        },
+    )
+
+
+def clear_ingested_files():
+    """Vide le registre (core.transactions vient d'etre recreee)."""
+    engine = get_engine()
+    with engine.begin() as conn:
+        if conn.execute(text("SELECT to_regclass('staging.ingestion_files')")).scalar() is not None:
+            conn.execute(text("TRUNCATE staging.ingestion_files"))
+
+
+def adopt_ingested_file(conn, year: int, departement: str, source_sha256: str):
+    """Associe un SHA256 a un fichier inscrit sans (registre initialise depuis core)."""
+    conn.execute(
+        text("""
+            UPDATE staging.ingestion_files SET source_sha256 = :sha
+            WHERE annee = :annee AND code_departement = :dep AND source_sha256 IS NULL
+        """),
+        {"annee": year, "dep": departement, "sha": source_sha256},
+    )
+
+
+def forget_ingested_file(conn, year: int, departement: str):
+    """Retire un fichier du registre (avant rechargement de sa partition)."""
+    conn.execute(
+        text("DELETE FROM staging.ingestion_files WHERE annee = :annee AND code_departement = :dep"),
+        {"annee": year, "dep": departement},
+    )
@@ -0,0 +1,291 @@
+"""Ingestion nationale par unites departement x annee.
+
+Les telechargements (DOWNLOAD_CONCURRENCY en parallele) prennent au plus
+NATIONAL_PREFETCH_UNITS unites d'avance sur le chargement, qui reste
+sequentiel (staging.dvf est partagee). Une unite en echec (reseau, base)
+est remise en file apres NATIONAL_RETRY_BACKOFF_S, jusqu'a
+NATIONAL_MAX_ATTEMPTS tentatives, sans bloquer les autres. Le registre
+staging.ingestion_files rend une relance sans effet sur les unites deja
+chargees.
+"""
+
+import json
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+
+from src.config import (
+    DOWNLOAD_CONCURRENCY,
+    DVF_DEPARTEMENTS,
+    DVF_YEARS,
+    LANDING_DIR,
+    NATIONAL_MAX_ATTEMPTS,
+    NATIONAL_PREFETCH_UNITS,
+    NATIONAL_RETRY_BACKOFF_S,
+)
+from src.ingestion.download import compute_sha256, download_dvf_file, load_manifest
+from src.ingestion.load_csv import (
+    create_staging_table,
+    detect_outliers,
+    load_departement_year,
+    read_transform_sql,
+)
+from src.ingestion.metadata import ingested_files, init_ingestion_log
+from src.transform.core_to_mart import refresh_marts
+from src.transform.staging_to_core import (
+    ensure_core_partitions,
+    get_core_partitioning,
+    migrate_core_tables,
+    vacuum_analyze_core,
+)
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+@dataclass
+class WorkUnit:
+    """Un fichier departement x annee a telecharger puis charger."""
+    year: int
+    dep: str
+    status: str = "pending"          # pending | loaded | skipped | missing | failed
+    attempts: int = 0
+    size_bytes: int = 0
+    download_s: float = 0.0
+    rows_staged: int = 0
+    rows_inserted: int = 0
+    load_s: float = 0.0
+    transform_s: float = 0.0
+    error: str | None = None
+    not_before: float = 0.0          # time.monotonic() avant lequel ne pas retenter
+
+    @property
+    def name(self) -> str:
+        return f"{self.year}/{self.dep}"
+
+    @property
+    def csv_path(self) -> Path:
+        return LANDING_DIR / str(self.year) / f"{self.dep}.csv.gz"
+
+
+@dataclass
+class NationalReport:
+    """Bilan d'une ingestion nationale (durees en secondes)."""
+    units: list[WorkUnit]
+    wall_s: float = 0.0
+    ingest_s: float = 0.0
+    post_steps: dict[str, float] = field(default_factory=dict)
+    peak_rss_mb: float | None = None
+
+    def counts(self) -> dict[str, int]:
+        return dict(Counter(u.status for u in self.units))
+
+    def totals(self) -> dict:
+        loaded = [u for u in self.units if u.status == "loaded"]
+        size_mb = sum(u.size_bytes for u in self.units) / 1e6
+        download_s = sum(u.download_s for u in self.units)
+        load_s = sum(u.load_s + u.transform_s for u in loaded)
+        rows_staged = sum(u.rows_staged for u in loaded)
+        rows_inserted = sum(u.rows_inserted for u in loaded)
+        return {
+            "downloaded_mb": round(size_mb, 1),
+            "download_mb_s": round(size_mb / download_s, 2) if download_s else None,
+            "rows_staged": rows_staged,
+            "rows_inserted": rows_inserted,
+            "load_rows_s": round(rows_staged / load_s) if load_s else None,
+            "ingest_rows_s": round(rows_staged / self.ingest_s) if self.ingest_s else None,
+        }
+
+    def as_dict(self) -> dict:
+        units = []
+        for unit in self.units:
+            entry = asdict(unit)
+            entry.pop("not_before")
+            units.append(entry)
+        return {
+            "wall_s": round(self.wall_s, 1),
+            "ingest_s": round(self.ingest_s, 1),
+            "post_steps": self.post_steps,
+            "peak_rss_mb": self.peak_rss_mb,
+            "counts": self.counts(),
+            "totals": self.totals(),
+            "units": units,
+        }
+
+    def print_summary(self):
+        totals = self.totals()
+        print("\n=== Ingestion nationale terminee ===")
+        print(f"  Unites         : {self.counts()}")
+        print(f"  Telecharge     : {totals['downloaded_mb']:,} Mo ({totals['download_mb_s']} Mo/s par flux)")
+        print(f"  Staging        : {totals['rows_staged']:,} lignes ({totals['load_rows_s']} lignes/s en chargement)")
+        print(f"  Core           : {totals['rows_inserted']:,} transactions")
+        print(f"  Ingestion      : {self.ingest_s:,.1f}s ({totals['ingest_rows_s']} lignes/s de bout en bout)")
+        for step, duration in self.post_steps.items():
+            print(f"  {step:<15}: {duration:,.1f}s")
+        print(f"  Total          : {self.wall_s:,.1f}s")
+        if self.peak_rss_mb is not None:
+            print(f"  Memoire (pic)  : {self.peak_rss_mb:,.0f} Mo")
+        for unit in self.units:
+            if unit.status == "failed":
+                print(f"  [FAILED] {unit.name} apres {unit.attempts} tentatives : {unit.error}")
+
+
+def plan_units(years: list[int], departements: list[str]) -> list[WorkUnit]:
+    """Unites de travail, annee par annee."""
+    return [WorkUnit(year, dep) for year in years for dep in departements]
+
+
+def _peak_rss_mb() -> float | None:
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # Ko sous Linux
+
+
+def _fetch(unit: WorkUnit, manifest: dict, manifest_lock: threading.Lock, download: bool):
+    """Telecharge (ou revalide) le fichier d'une unite, dans un thread du pool."""
+    time.sleep(max(0.0, unit.not_before - time.monotonic()))
+    unit.attempts += 1
+    if not download:
+        if not unit.csv_path.exists():
+            unit.status = "missing"
+        return
+
+    start = time.perf_counter()
+    _, result = download_dvf_file(unit.year, unit.dep, manifest, manifest_lock)
+    unit.download_s += time.perf_counter() - start
+    if result.status == "error":
+        if result.http_status == 404:
+            unit.status = "missing"  # Pas de fichier Etalab pour ce departement x annee
+            return
+        raise IOError(result.error)
+    unit.size_bytes += result.size_bytes - result.resumed_from
+
+
+def run_national(
+    years: list[int] | None = None,
+    departements: list[str] | None = None,
+    force: bool = False,
+    prefilter: bool = True,
+    download: bool = True,
+    post_load: bool = True,
+    concurrency: int | None = None,
+    prefetch: int | None = None,
+    max_attempts: int | None = None,
+    backoff_s: float | None = None,
+) -> NationalReport:
+    """Telecharge et charge tous les departement x annee, puis outliers et marts.
+
+    Args:
+        years: Annees (defaut: DVF_YEARS).
+        departements: Departements (defaut: DVF_DEPARTEMENTS).
+        force: Recharger les unites deja inscrites au registre.
+        prefilter: Filtrer les lots cote client avant staging.
+        download: Telecharger / revalider les fichiers (sinon : landing seul).
+        post_load: Outliers, VACUUM ANALYZE et marts apres chargement.
+        concurrency: Telechargements simultanes (defaut: DOWNLOAD_CONCURRENCY).
+        prefetch: Unites telechargees d'avance au plus (defaut: NATIONAL_PREFETCH_UNITS).
+        max_attempts: Tentatives par unite (defaut: NATIONAL_MAX_ATTEMPTS).
+        backoff_s: Attente avant une nouvelle tentative (defaut: NATIONAL_RETRY_BACKOFF_S).
+    """
+    years = years or DVF_YEARS
+    departements = departements or DVF_DEPARTEMENTS
+    concurrency = max(1, concurrency or DOWNLOAD_CONCURRENCY)
+    prefetch = max(1, prefetch or NATIONAL_PREFETCH_UNITS)
+    max_attempts = max(1, max_attempts or NATIONAL_MAX_ATTEMPTS)
+    backoff_s = NATIONAL_RETRY_BACKOFF_S if backoff_s is None else backoff_s
+
+    start = time.perf_counter()
+    create_staging_table()
+    ensure_core_partitions(departements, years)
+    migrate_core_tables()
+    if get_core_partitioning() == "none":
+        print("[NATIONAL] core.transactions non partitionnee : un rechargement supprime "
+              "ligne a ligne (init-db --partitioning departement_annee recommande)")
+    init_ingestion_log()
+    transform_sql = read_transform_sql()
+    ledger = ingested_files()
+    manifest = load_manifest()
+    manifest_lock = threading.Lock()
+    LANDING_DIR.mkdir(parents=True, exist_ok=True)
+
+    units = plan_units(years, departements)
+    pending = deque(units)
+    in_flight = {}
+    done = 0
+    print(f"[NATIONAL] {len(units)} unites ({len(departements)} departements x {len(years)} annees), "
+          f"{concurrency} telechargements, {prefetch} unites d'avance")
+
+    def _retry_or_fail(unit: WorkUnit, error: Exception):
+        unit.error = f"{type(error).__name__}: {error}"
+        if unit.attempts < max_attempts:
+            print(f"[RETRY] {unit.name} tentative {unit.attempts}/{max_attempts} : {unit.error}")
+            unit.not_before = time.monotonic() + backoff_s * unit.attempts
+            pending.append(unit)
+        else:
+            unit.status = "failed"
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="national") as pool:
+        while pending or in_flight:
+            while pending and len(in_flight) < prefetch:
+                unit = pending.popleft()
+                in_flight[pool.submit(_fetch, unit, manifest, manifest_lock, download)] = unit
+
+            # Chargement sequentiel des unites telechargees ; les suivantes
+            # continuent de se telecharger pendant ce temps
+            finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in finished:
+                unit = in_flight.pop(future)
+                try:
+                    future.result()
+                    if unit.status != "missing":
+                        sha256 = manifest.get(f"{unit.name}.csv.gz", {}).get("sha256") \
+                            or compute_sha256(unit.csv_path)
+                        result = load_departement_year(
+                            unit.year, unit.dep, unit.csv_path, sha256, ledger.get((unit.year, unit.dep)),
+                            transform_sql, force=force, prefilter=prefilter,
+                        )
+                        if result is None:
+                            unit.status = "skipped"
+                        else:
+                            unit.status = "loaded"
+                            unit.rows_staged = result.rows_staged
+                            unit.rows_inserted = result.rows_inserted
+                            unit.load_s = result.load_s
+                            unit.transform_s = result.transform_s
+                        unit.error = None
+                except Exception as e:
+                    _retry_or_fail(unit, e)
+                    if unit.status != "failed":
+                        continue  # remise en file
+
+                # Unite terminee (chargee, sautee, absente ou en echec definitif)
+                done += 1
+                elapsed = time.perf_counter() - start
+                remaining = elapsed / done * (len(units) - done)
+                rows_s = unit.rows_staged / (unit.load_s + unit.transform_s) if unit.rows_staged else 0
+                error = f" : {unit.error}" if unit.status == "failed" else ""
+                print(f"[UNIT] {unit.name} {unit.status} ({done}/{len(units)}, "
+                      f"{rows_s:,.0f} lignes/s, reste ~{remaining / 60:.0f} min){error}")
+
+    report = NationalReport(units=units, ingest_s=time.perf_counter() - start)
+
+    if post_load and report.counts().get("loaded"):
+        for name, step in (("outliers", detect_outliers), ("vacuum", vacuum_analyze_core), ("mart", refresh_marts)):
+            step_start = time.perf_counter()
+            step()
+            report.post_steps[name] = round(time.perf_counter() - step_start, 1)
+
+    report.wall_s = time.perf_counter() - start
+    report.peak_rss_mb = _peak_rss_mb()
+    return report
+
+
+def save_report(report: NationalReport, path: Path):
+    """Ecrit le bilan en JSON (comparaison entre machines / versions)."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(report.as_dict(), indent=2), encoding="utf-8")
@@ -0,0 +1,133 @@
+"""Pre-filtrage des lots DVF avant staging.
+
+Applique cote client les regles de transform_staging_to_core.sql : ventes
+('Vente'), maisons / appartements (code_type_local 1, 2), valeur >= 100,
+surface bati >= 9, puis mutations mono-bien (un seul lot residentiel retenu
+par id_mutation). Le CSV est lu par blocs vectorises ; seuls les identifiants
+des lots residentiels sont gardes en memoire pour le comptage par mutation.
+"""
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator
+
+import pandas as pd
+
+from src.config import LOAD_PREFILTER_CHUNK_ROWS
+
+
+@dataclass
+class PrefilterStats:
+    """Volumes d'un fichier pre-filtre."""
+    rows_read: int = 0
+    residential_lots: int = 0
+    rows_kept: int = 0
+
+    @property
+    def kept_ratio(self) -> float:
+        return self.rows_kept / self.rows_read if self.rows_read else 0.0
+
+
+def residential_lots(chunk: pd.DataFrame) -> pd.DataFrame:
+    """Lots de ventes de maisons / appartements a surface valide (CTE lots_residentiels)."""
+    # Arrondis des colonnes NUMERIC(15,2) / NUMERIC(10,2) de staging.dvf
+    valeur = pd.to_numeric(chunk["valeur_fonciere"], errors="coerce").round(2)
+    surface = pd.to_numeric(chunk["surface_reelle_bati"], errors="coerce").round(2)
+    code_type = pd.to_numeric(chunk["code_type_local"], errors="coerce")
+    mask = (
+        (chunk["nature_mutation"] == "Vente")
+        & code_type.isin([1, 2])
+        & (valeur >= 100)
+        & (surface >= 9)
+    )
+    return chunk[mask]
+
+
+def mono_bien(lots: pd.DataFrame) -> pd.DataFrame:
+    """Lots des mutations qui n'ont qu'un seul lot residentiel (CTE mono_bien)."""
+    counts = lots["id_mutation"].map(lots["id_mutation"].value_counts())
+    return lots[counts == 1]
+
+
+# Colonnes necessaires au filtrage (premiere passe)
+FILTER_COLUMNS = ["id_mutation", "nature_mutation", "valeur_fonciere", "code_type_local", "surface_reelle_bati"]
+
+
+def _read_chunks(csv_path: Path, columns: list[str], chunk_rows: int) -> Iterator[pd.DataFrame]:
+    """Blocs du CSV restreints a columns (absentes du CSV : chaines vides)."""
+    wanted = set(columns)
+    reader = pd.read_csv(
+        csv_path,
+        usecols=lambda c: c in wanted,
+        dtype=str,
+        keep_default_na=False,
+        chunksize=chunk_rows,
+    )
+    with reader:
+        for chunk in reader:
+            for col in wanted.difference(chunk.columns):
+                chunk[col] = ""
+            yield chunk
+
+
+def iter_prefiltered(
+    csv_path: Path,
+    columns: list[str],
+    chunk_rows: int | None = None,
+    stats: PrefilterStats | None = None,
+) -> Iterator[pd.DataFrame]:
+    """Lignes d'un CSV Etalab retenues pour core, bloc par bloc.
+
+    Deux passes : la premiere ne lit que les colonnes de filtrage et compte
+    les lots residentiels par mutation, la seconde relit le fichier et ne
+    garde que les lots des mutations mono-bien. La memoire est bornee par un
+    bloc et les identifiants des lots residentiels, quelle que soit la taille
+    du departement.
+
+    Args:
+        csv_path: Fichier a lire (.csv ou .csv.gz).
+        columns: Colonnes a garder (absentes du CSV : chaines vides).
+        chunk_rows: Lignes par bloc (defaut: LOAD_PREFILTER_CHUNK_ROWS).
+        stats: Volumes, mis a jour au fil de la lecture.
+    """
+    chunk_rows = chunk_rows or LOAD_PREFILTER_CHUNK_ROWS
+    stats = stats if stats is not None else PrefilterStats()
+
+    ids = []
+    for chunk in _read_chunks(csv_path, FILTER_COLUMNS, chunk_rows):
+        stats.rows_read += len(chunk)
+        ids.append(residential_lots(chunk)[["id_mutation"]])
+    if not ids:
+        return
+    lots = pd.concat(ids, ignore_index=True)
+    stats.residential_lots = len(lots)
+    single = set(mono_bien(lots)["id_mutation"])
+    del ids, lots
+
+    for chunk in _read_chunks(csv_path, columns, chunk_rows):
+        lots = residential_lots(chunk)
+        kept = lots[lots["id_mutation"].isin(single)][columns]
+        stats.rows_kept += len(kept)
+        if len(kept):
+            yield kept
+
+
+def prefilter_csv(
+    csv_path: Path,
+    columns: list[str],
+    chunk_rows: int | None = None,
+) -> tuple[pd.DataFrame, PrefilterStats]:
+    """Lit un CSV Etalab (.csv ou .csv.gz) et retourne les seules lignes utiles a core.
+
+    Args:
+        csv_path: Fichier a lire.
+        columns: Colonnes a garder (absentes du CSV : chaines vides).
+        chunk_rows: Lignes par bloc (defaut: LOAD_PREFILTER_CHUNK_ROWS).
+
+    Returns:
+        (lignes retenues, en texte brut comme dans le CSV ; volumes)
+    """
+    stats = PrefilterStats()
+    chunks = list(iter_prefiltered(csv_path, columns, chunk_rows, stats))
+    kept = pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame(columns=columns)
+    return kept, stats
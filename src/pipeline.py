@@ -0,0 +1,282 @@
+"""Execution du pipeline ETL en DAG avec checkpoints dans staging.ingestion_log.
+
+Chaque etape declare ses entrees (hash du manifest, registre des fichiers
+charges dans core, SQL...). Une etape dont les entrees n'ont pas change
+depuis son dernier succes est sautee ; un run en echec peut etre repris, les
+etapes deja reussies dans ce run ne sont alors pas re-executees.
+"""
+
+import hashlib
+import json
+import time
+from dataclasses import dataclass
+from typing import Callable
+
+from sqlalchemy import text
+
+from src.config import SQL_DIR, CORE_PARTITIONING, DVF_YEARS, DVF_DEPARTEMENTS
+from src.db import get_engine
+from src.ingestion import metadata
+
+PIPELINE_STEP = "full_pipeline"
+
+
+@dataclass
+class Step:
+    """Etape du pipeline."""
+    name: str
+    run: Callable[[], int | None]                   # Retourne un nombre de lignes (optionnel)
+    inputs: Callable[[], object] | None = None      # None : toujours executee
+    depends_on: tuple[str, ...] = ()
+
+
+@dataclass
+class StepOutcome:
+    """Resultat d'une etape dans un run."""
+    name: str
+    status: str                 # "success", "skipped" ou "failed"
+    duration_s: float = 0.0
+    reason: str | None = None
+
+
+class LogCheckpoints:
+    """Checkpoints des etapes dans staging.ingestion_log."""
+
+    def last_success_hash(self, step: str) -> str | None:
+        return metadata.last_success_hash(step)
+
+    def succeeded_steps(self, run_id: str) -> set[str]:
+        return metadata.succeeded_steps(run_id)
+
+    def start(self, run_id: str, step: str, input_hash: str | None) -> int:
+        return metadata.log_start(run_id, step, input_hash=input_hash)
+
+    def finish(self, log_id: int, status: str, row_count: int | None = None,
+               notes: str | None = None, input_hash: str | None = None):
+        metadata.log_finish(log_id, status, row_count=row_count, notes=notes, input_hash=input_hash)
+
+
+def fingerprint(value) -> str:
+    """Hash stable (SHA256) d'une structure JSON-serialisable."""
+    payload = json.dumps(value, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def topological_order(steps: list[Step]) -> list[Step]:
+    """Ordonne les etapes selon depends_on (ordre de declaration a egalite)."""
+    by_name = {s.name: s for s in steps}
+    for s in steps:
+        unknown = [d for d in s.depends_on if d not in by_name]
+        if unknown:
+            raise ValueError(f"Etape {s.name} : dependances inconnues {unknown}")
+
+    ordered, done = [], set()
+    while len(ordered) < len(steps):
+        ready = [s for s in steps if s.name not in done and all(d in done for d in s.depends_on)]
+        if not ready:
+            raise ValueError("Cycle dans les dependances du pipeline")
+        ordered.append(ready[0])
+        done.add(ready[0].name)
+    return ordered
+
+
+def run_dag(
+    steps: list[Step],
+    run_id: str,
+    checkpoints=None,
+    force: bool = False,
+    resume: bool = False,
+) -> list[StepOutcome]:
+    """Execute les etapes dans l'ordre du DAG.
+
+    Args:
+        steps: Etapes du pipeline.
+        run_id: Identifiant du run (celui du run en echec pour une reprise).
+        checkpoints: Stockage des checkpoints (defaut: staging.ingestion_log).
+        force: Executer toutes les etapes, meme a entrees inchangees.
+        resume: Ne pas re-executer les etapes deja reussies dans run_id.
+
+    Une etape en echec est journalisee puis l'exception est propagee.
+    """
+    checkpoints = checkpoints or LogCheckpoints()
+    already_done = checkpoints.succeeded_steps(run_id) if resume else set()
+    outcomes = []
+
+    for step in topological_order(steps):
+        if step.name in already_done:
+            print(f"[RESUME] {step.name} deja reussie dans le run {run_id}")
+            outcomes.append(StepOutcome(step.name, "skipped", reason="resume"))
+            continue
+
+        t0 = time.perf_counter()
+        input_hash = fingerprint(step.inputs()) if step.inputs else None
+        if not force and input_hash is not None and input_hash == checkpoints.last_success_hash(step.name):
+            log_id = checkpoints.start(run_id, step.name, input_hash)
+            checkpoints.finish(log_id, "skipped", notes="entrees inchangees")
+            print(f"[SKIP] {step.name} : entrees inchangees")
+            outcomes.append(StepOutcome(step.name, "skipped", time.perf_counter() - t0, "unchanged"))
+            continue
+
+        print(f"\n=== {step.name} ===")
+        log_id = checkpoints.start(run_id, step.name, input_hash)
+        try:
+            row_count = step.run()
+        except Exception as e:
+            checkpoints.finish(log_id, "failed", notes=f"{type(e).__name__}: {e}")
+            outcomes.append(StepOutcome(step.name, "failed", time.perf_counter() - t0, str(e)))
+            raise
+
+        # Entrees relues apres execution : une etape qui modifie ses propres
+        # entrees (ex: load -> registre des fichiers charges) n'est pas relancee au run suivant
+        output_hash = fingerprint(step.inputs()) if step.inputs else None
+        checkpoints.finish(
+            log_id, "success",
+            row_count=row_count if isinstance(row_count, int) else None,
+            input_hash=output_hash,
+        )
+        outcomes.append(StepOutcome(step.name, "success", time.perf_counter() - t0))
+
+    return outcomes
+
+
+# ---------------------------------------------------------------------------
+# Entrees des etapes ETL
+# ---------------------------------------------------------------------------
+
+def sql_fingerprint(*relative_paths: str) -> dict[str, str]:
+    """Hash des fichiers SQL (relatifs a SQL_DIR)."""
+    return {
+        p: hashlib.sha256((SQL_DIR / p).read_bytes()).hexdigest()
+        for p in relative_paths
+    }
+
+
+def manifest_fingerprint(years: list[int], departements: list[str]) -> dict[str, str | None]:
+    """SHA256 du manifest pour chaque fichier departement x annee selectionne."""
+    from src.ingestion.download import load_manifest
+
+    manifest = load_manifest()
+    return {
+        f"{year}/{dep}.csv.gz": manifest.get(f"{year}/{dep}.csv.gz", {}).get("sha256")
+        for year in years
+        for dep in departements
+    }
+
+
+# Tables creees par l'etape init (hors partitions, creees au chargement)
+INIT_TABLES = (
+    "staging.dvf",
+    "core.transactions",
+    "mart.stats_commune",
+    "mart.stats_departement",
+    "mart.zone_stats",
+    "mart.indices_temporels",
+    "mart.data_generation",
+)
+
+
+def existing_tables(tables: tuple[str, ...] = INIT_TABLES) -> list[str]:
+    """Tables presentes parmi celles creees par init."""
+    engine = get_engine()
+    with engine.connect() as conn:
+        return [
+            t for t in tables
+            if conn.execute(text("SELECT to_regclass(:t)"), {"t": t}).scalar() is not None
+        ]
+
+
+def ledger_fingerprint() -> list[list]:
+    """Empreinte de core.transactions lue dans le registre des fichiers charges.
+
+    (SHA256 source, lignes inserees, date de chargement) par departement x annee :
+    un chargement, un rechargement ou un init (registre vide) la modifie, sans
+    parcourir core.transactions.
+    """
+    engine = get_engine()
+    with engine.connect() as conn:
+        if conn.execute(text("SELECT to_regclass('staging.ingestion_files')")).scalar() is None:
+            return []
+        rows = conn.execute(text("""
+            SELECT code_departement, annee, source_sha256, rows_inserted, loaded_at
+            FROM staging.ingestion_files
+            ORDER BY code_departement, annee
+        """)).fetchall()
+    return [list(r) for r in rows]
+
+
+def step_marker(step: str) -> int | None:
+    """Id du dernier succes d'une etape (change a chaque execution effective)."""
+    engine = get_engine()
+    with engine.connect() as conn:
+        return conn.execute(
+            text("""
+                SELECT MAX(id) FROM staging.ingestion_log
+                WHERE step = :step AND status = 'success'
+            """),
+            {"step": step},
+        ).scalar()
+
+
+def build_etl_steps(
+    years: list[int] | None = None,
+    departements: list[str] | None = None,
+) -> list[Step]:
+    """Etapes du pipeline complet : init -> download -> load -> outliers -> cluster -> mart -> quality."""
+    from src.ingestion.download import download_dvf_etalab
+    from src.ingestion.load_csv import create_staging_table, load_and_transform, detect_outliers
+    from src.transform.staging_to_core import create_core_tables, cluster_core_transactions
+    from src.transform.core_to_mart import create_mart_tables, refresh_marts
+    from src.transform.quality import run_quality_checks
+
+    years = years or DVF_YEARS
+    departements = departements or DVF_DEPARTEMENTS
+
+    def init():
+        create_staging_table()
+        create_core_tables()
+        create_mart_tables()
+
+    transactions_ddl = (
+        "core/create_core_transactions.sql"
+        if CORE_PARTITIONING == "none"
+        else "core/create_core_transactions_partitioned.sql"
+    )
+
+    return [
+        # create_core_tables recree core.transactions : uniquement si le schema change
+        Step("init", init, inputs=lambda: {
+            "tables": existing_tables(),
+            "partitioning": CORE_PARTITIONING,
+            "sql": sql_fingerprint("staging/create_staging_dvf.sql", transactions_ddl),
+        }),
+        # Toujours executee : revalidation conditionnelle (ETag), rapide sans nouveaute
+        Step("download", lambda: download_dvf_etalab(years=years, departements=departements),
+             depends_on=("init",)),
+        Step("load", lambda: load_and_transform(years=years, departements=departements),
+             inputs=lambda: {
+                 "files": manifest_fingerprint(years, departements),
+                 "core": ledger_fingerprint(),
+                 "sql": sql_fingerprint("core/transform_staging_to_core.sql"),
+             },
+             depends_on=("download",)),
+        Step("outliers", detect_outliers, inputs=lambda: ledger_fingerprint(), depends_on=("load",)),
+        Step("cluster", cluster_core_transactions,
+             inputs=lambda: {"core": ledger_fingerprint(), "sql": sql_fingerprint("core/cluster_core.sql")},
+             depends_on=("outliers",)),
+        Step("mart", refresh_marts,
+             inputs=lambda: {
+                 "core": ledger_fingerprint(),
+                 "outliers": step_marker("outliers"),
+                 "sql": sql_fingerprint(*[
+                     f"mart/{p.name}" for p in sorted((SQL_DIR / "mart").glob("*.sql"))
+                 ]),
+             },
+             depends_on=("outliers",)),
+        Step("quality", run_quality_checks,
+             inputs=lambda: {
+                 "core": ledger_fingerprint(),
+                 "outliers": step_marker("outliers"),
+                 "sql": sql_fingerprint("quality/quality_checks.sql"),
+             },
+             depends_on=("mart",)),
+    ]
@@ -13,6 +13,7 @@ def create_mart_tables():
         "create_mart_prix_m2.sql",
         "create_mart_zone_stats.sql",
         "create_mart_indices.sql",
+        "create_mart_generation.sql",
     ]:
         path = SQL_DIR / "mart" / sql_file
         sql = path.read_text(encoding="utf-8")
@@ -62,12 +63,14 @@ def refresh_marts():
         dep = conn.execute(text("SELECT COUNT(*) FROM mart.stats_departement")).scalar()
         zones = conn.execute(text("SELECT COUNT(*) FROM mart.zone_stats")).scalar()
         indices = conn.execute(text("SELECT COUNT(*) FROM mart.indices_temporels")).scalar()
+        generation = conn.execute(text("SELECT generation FROM mart.data_generation WHERE id = 1")).scalar()
 
     print(f"\n=== Marts rafraichis ===")
     print(f"  stats_commune       : {commune:,} lignes")
     print(f"  stats_departement   : {dep:,} lignes")
     print(f"  zone_stats          : {zones:,} lignes")
     print(f"  indices_temporels   : {indices:,} lignes")
+    print(f"  generation          : {generation}")
 
 
 if __name__ == "__main__":
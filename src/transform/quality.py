@@ -1,24 +1,23 @@
 """Rapport de qualite des donnees."""
 
+from concurrent.futures import ThreadPoolExecutor
+
 import pandas as pd
 from sqlalchemy import text
 
 from src.config import SQL_DIR
 from src.db import get_engine
 
+QUANTILE_COLUMNS = ["p01", "p10", "p25", "p50", "p75", "p90", "p99"]
 
-def run_quality_checks() -> dict[str, pd.DataFrame]:
-    """
-    Execute les controles qualite et retourne les resultats.
+# Valeurs de GROUPING(code_departement, type_bien, annee)
+GRP_DEPARTEMENT_TYPE = 1
+GRP_ANNEE_TYPE = 4
+GRP_TOTAL = 7
 
-    Returns:
-        Dictionnaire de DataFrames avec les resultats par controle.
-    """
-    engine = get_engine()
-    sql_path = SQL_DIR / "quality" / "quality_checks.sql"
-    sql_content = sql_path.read_text(encoding="utf-8")
 
-    # Separer les requetes (chaque SELECT est un controle)
+def _split_queries(sql_content: str) -> list[str]:
+    """Separe le fichier SQL en requetes (un bloc de commentaires = une requete)."""
     queries = []
     current = []
     for line in sql_content.split("\n"):
@@ -37,25 +36,109 @@ def run_quality_checks() -> dict[str, pd.DataFrame]:
     query = "\n".join(current).strip().rstrip(";")
     if query:
         queries.append(query)
+    return queries
+
+
+def _pct(part: pd.Series, total: pd.Series, decimals: int) -> pd.Series:
+    return (100.0 * part / total.where(total > 0)).round(decimals)
+
+
+def build_report(metrics: pd.DataFrame, staging_count: int) -> dict[str, pd.DataFrame]:
+    """Decoupe le resultat GROUPING SETS en rapports par controle."""
+    by_dep = metrics[metrics["grp"] == GRP_DEPARTEMENT_TYPE].reset_index(drop=True)
+    by_year = metrics[metrics["grp"] == GRP_ANNEE_TYPE]
+    total = metrics[metrics["grp"] == GRP_TOTAL]
+    total = total.iloc[0] if len(total) else pd.Series(0, index=metrics.columns)
+
+    comptages = pd.DataFrame({
+        "table_name": ["staging.dvf", "core.transactions", "core.transactions (hors outliers)"],
+        "row_count": [int(staging_count), int(total["total"]), int(total["total_hors_outliers"])],
+    })
+
+    surfaces = by_dep[["code_departement", "type_bien", "total", "null_surface"]].copy()
+    surfaces["pct_null"] = _pct(surfaces["null_surface"], surfaces["total"], 2)
+    surfaces = surfaces.sort_values("pct_null", ascending=False, kind="stable")
+
+    distribution = by_dep[by_dep["total_hors_outliers"] > 0]
+    quantiles = pd.DataFrame(
+        distribution["quantiles"].tolist(), columns=QUANTILE_COLUMNS, index=distribution.index
+    )
+    distribution = pd.concat([
+        distribution[["code_departement", "type_bien"]],
+        distribution["total_hors_outliers"].rename("nb"),
+        quantiles,
+    ], axis=1)
+
+    annees = by_year[by_year["total_hors_outliers"] > 0][["annee", "type_bien", "total_hors_outliers"]]
+    annees = annees.rename(columns={"total_hors_outliers": "nb_transactions"})
+    annees["annee"] = annees["annee"].astype(int)
+    annees = annees.sort_values(["annee", "type_bien"])
+
+    couverture = pd.DataFrame([{
+        "communes_avec_transactions": int(total["communes"]),
+        "departements_couverts": int(total["departements"]),
+        "transactions_geolocalisees": int(total["geolocalisees"]),
+        "transactions_total": int(total["total_hors_outliers"]),
+        "pct_geolocalisees": (
+            round(100.0 * total["geolocalisees"] / total["total_hors_outliers"], 1)
+            if total["total_hors_outliers"] else None
+        ),
+    }])
+
+    outliers = by_dep[["code_departement", "type_bien", "total", "nb_outliers"]].copy()
+    outliers["pct_outliers"] = _pct(outliers["nb_outliers"], outliers["total"], 2)
+    outliers = outliers.sort_values("pct_outliers", ascending=False, kind="stable")
+
+    return {
+        "comptages": comptages,
+        "surfaces_nulles": surfaces.reset_index(drop=True),
+        "distribution_prix": distribution.reset_index(drop=True),
+        "transactions_annee": annees.reset_index(drop=True),
+        "couverture_geo": couverture,
+        "taux_outliers": outliers.reset_index(drop=True),
+    }
+
+
+def run_quality_checks(sample_pct: float | None = None) -> dict[str, pd.DataFrame]:
+    """
+    Execute les controles qualite et retourne les resultats.
+
+    Les metriques de core sont calculees en un seul scan (GROUPING SETS) ;
+    le comptage staging s'execute en parallele sur une autre connexion.
+
+    Args:
+        sample_pct: Pourcentage de pages lues (TABLESAMPLE SYSTEM) pour un
+            rapport rapide. Les comptages portent alors sur l'echantillon.
+
+    Returns:
+        Dictionnaire de DataFrames avec les resultats par controle.
+    """
+    engine = get_engine()
+    sql_path = SQL_DIR / "quality" / "quality_checks.sql"
+    staging_sql, metrics_sql = _split_queries(sql_path.read_text(encoding="utf-8"))
+
+    params = {}
+    if sample_pct is not None:
+        metrics_sql = metrics_sql.replace("/*sample*/", "TABLESAMPLE SYSTEM (:sample_pct)")
+        params["sample_pct"] = sample_pct
+
+    def _read(sql: str, sql_params: dict) -> pd.DataFrame:
+        with engine.connect() as conn:
+            return pd.read_sql(text(sql), conn, params=sql_params)
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        staging_future = pool.submit(_read, staging_sql, {})
+        metrics_future = pool.submit(_read, metrics_sql, params)
+        staging_count = int(staging_future.result()["row_count"].iloc[0])
+        metrics = metrics_future.result()
+
+    results = build_report(metrics, staging_count)
 
-    check_names = [
-        "comptages",
-        "surfaces_nulles",
-        "distribution_prix",
-        "transactions_annee",
-        "couverture_geo",
-        "taux_outliers",
-    ]
-
-    results = {}
-    for name, query in zip(check_names, queries):
-        try:
-            df = pd.read_sql(query, engine)
-            results[name] = df
-            print(f"\n=== {name.upper()} ===")
-            print(df.to_string(index=False))
-        except Exception as e:
-            print(f"\n=== {name.upper()} === ERREUR: {e}")
+    if sample_pct is not None:
+        print(f"\n[ECHANTILLON] TABLESAMPLE SYSTEM ({sample_pct}%) : comptages sur l'echantillon")
+    for name, df in results.items():
+        print(f"\n=== {name.upper()} ===")
+        print(df.to_string(index=False))
 
     return results
 
@@ -1,15 +1,48 @@
 """Transformation staging -> core."""
 
+import re
+
 from sqlalchemy import text
 
-from src.config import SQL_DIR
+from src.config import SQL_DIR, CORE_PARTITIONING
 from src.db import get_engine
+from src.ingestion.metadata import clear_ingested_files
+
+PARTITIONING_MODES = ("none", "departement", "departement_annee")
+
+# Bases creees avant l'ajout des colonnes (propage aux partitions)
+CORE_TRANSACTIONS_MIGRATIONS = [
+    "ALTER TABLE core.transactions ADD COLUMN IF NOT EXISTS geo_key TEXT",
+]
+
+# Codes departement acceptes dans un nom de partition (01..95, 2A/2B, 971..976)
+_DEP_PATTERN = re.compile(r"^(\d{2,3}|2[AB])$")
+
+
+def _check_partitioning(partitioning: str) -> str:
+    if partitioning not in PARTITIONING_MODES:
+        raise ValueError(
+            f"CORE_PARTITIONING invalide: {partitioning!r} "
+            f"(attendu: {', '.join(PARTITIONING_MODES)})"
+        )
+    return partitioning
+
 
+def create_core_tables(partitioning: str | None = None):
+    """Cree les tables core si elles n'existent pas.
+
+    Args:
+        partitioning: Layout de core.transactions (defaut: CORE_PARTITIONING).
+    """
+    partitioning = _check_partitioning(partitioning or CORE_PARTITIONING)
+    transactions_sql = (
+        "create_core_transactions.sql"
+        if partitioning == "none"
+        else "create_core_transactions_partitioned.sql"
+    )
 
-def create_core_tables():
-    """Cree les tables core si elles n'existent pas."""
     engine = get_engine()
-    for sql_file in ["create_core_transactions.sql", "create_core_geo.sql"]:
+    for sql_file in [transactions_sql, "create_core_indexes.sql", "create_core_geo.sql"]:
         path = SQL_DIR / "core" / sql_file
         sql = path.read_text(encoding="utf-8")
         with engine.begin() as conn:
@@ -19,6 +52,158 @@ def create_core_tables():
                     conn.execute(text(stmt))
         print(f"[DDL] {sql_file} execute")
 
+    # core.transactions recreee vide : plus aucun fichier charge
+    clear_ingested_files()
+
+
+def migrate_core_tables():
+    """Ajoute a core.transactions les colonnes des versions posterieures a sa creation."""
+    engine = get_engine()
+    with engine.begin() as conn:
+        if conn.execute(text("SELECT to_regclass('core.transactions')")).scalar() is None:
+            return
+        for stmt in CORE_TRANSACTIONS_MIGRATIONS:
+            conn.execute(text(stmt))
+
+
+def create_core_indexes():
+    """(Re)applique les index de core.transactions sans recreer la table."""
+    migrate_core_tables()
+    engine = get_engine()
+    sql = (SQL_DIR / "core" / "create_core_indexes.sql").read_text(encoding="utf-8")
+    with engine.begin() as conn:
+        for stmt in sql.split(";"):
+            stmt = stmt.strip()
+            if stmt:
+                conn.execute(text(stmt))
+    print("[DDL] create_core_indexes.sql execute")
+
+
+def vacuum_analyze_core():
+    """VACUUM ANALYZE de core.transactions.
+
+    Met a jour la visibility map (necessaire aux index-only scans sur les
+    index couvrants) et les statistiques du planner apres chargement/outliers.
+    """
+    engine = get_engine()
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("VACUUM (ANALYZE) core.transactions"))
+    print("[VACUUM] core.transactions analysee")
+
+
+def cluster_core_transactions():
+    """Reordonne physiquement core.transactions par (type_bien, geohash).
+
+    Reecrit la table (CLUSTER) puis VACUUM ANALYZE. Bloque les lectures
+    pendant l'operation : a lancer en maintenance, apres chargement.
+    Layouts partitionnes : PostgreSQL 15+ (CLUSTER sur table partitionnee).
+    """
+    migrate_core_tables()
+    engine = get_engine()
+    sql = (SQL_DIR / "core" / "cluster_core.sql").read_text(encoding="utf-8")
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for stmt in sql.split(";"):
+            stmt = stmt.strip()
+            if stmt:
+                conn.execute(text(stmt))
+    print("[CLUSTER] core.transactions reordonnee par (type_bien, geo_key)")
+    vacuum_analyze_core()
+
+
+def partition_name(departement: str, year: int | None = None) -> str:
+    """Nom (qualifie) de la partition d'un departement ou d'un departement x annee."""
+    if not _DEP_PATTERN.match(departement):
+        raise ValueError(f"Code departement invalide: {departement!r}")
+    name = f"core.transactions_{departement.lower()}"
+    if year is not None:
+        name += f"_{int(year)}"
+    return name
+
+
+def get_core_partitioning() -> str:
+    """Detecte le layout effectif de core.transactions depuis le catalogue."""
+    engine = get_engine()
+    with engine.connect() as conn:
+        row = conn.execute(text("""
+            SELECT
+                EXISTS (
+                    SELECT 1 FROM pg_partitioned_table
+                    WHERE partrelid = 'core.transactions'::regclass
+                ),
+                EXISTS (
+                    SELECT 1
+                    FROM pg_inherits i
+                    JOIN pg_partitioned_table p ON p.partrelid = i.inhrelid
+                    WHERE i.inhparent = 'core.transactions'::regclass
+                )
+        """)).fetchone()
+    if not row[0]:
+        return "none"
+    return "departement_annee" if row[1] else "departement"
+
+
+def ensure_core_partitions(
+    departements: list[str],
+    years: list[int],
+    partitioning: str | None = None,
+):
+    """Cree les partitions departement (et annee) manquantes.
+
+    Sans effet si core.transactions n'est pas partitionnee.
+    """
+    partitioning = _check_partitioning(partitioning or get_core_partitioning())
+    if partitioning == "none":
+        return
+
+    engine = get_engine()
+    with engine.begin() as conn:
+        for dep in departements:
+            dep_table = partition_name(dep)
+            sub = " PARTITION BY LIST (annee)" if partitioning == "departement_annee" else ""
+            conn.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {dep_table} "
+                f"PARTITION OF core.transactions FOR VALUES IN ('{dep}'){sub}"
+            ))
+            if partitioning != "departement_annee":
+                continue
+            conn.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {dep_table}_default "
+                f"PARTITION OF {dep_table} DEFAULT"
+            ))
+            for year in years:
+                conn.execute(text(
+                    f"CREATE TABLE IF NOT EXISTS {partition_name(dep, year)} "
+                    f"PARTITION OF {dep_table} FOR VALUES IN ({int(year)})"
+                ))
+
+
+def reset_core_partition(departement: str, year: int):
+    """Vide les transactions d'un departement x annee avant rechargement.
+
+    - departement_annee : TRUNCATE de la partition feuille (instantane)
+    - departement       : DELETE limite a la partition du departement
+    - none              : DELETE sur la table complete
+    """
+    partitioning = get_core_partitioning()
+    if partitioning == "departement_annee":
+        ensure_core_partitions([departement], [year], partitioning)
+
+    engine = get_engine()
+    with engine.begin() as conn:
+        if partitioning == "departement_annee":
+            conn.execute(text(f"TRUNCATE {partition_name(departement, year)}"))
+        elif partitioning == "departement":
+            conn.execute(
+                text(f"DELETE FROM {partition_name(departement)} WHERE annee = :year"),
+                {"year": year},
+            )
+        else:
+            conn.execute(
+                text("DELETE FROM core.transactions WHERE code_departement = :dep AND annee = :year"),
+                {"dep": departement, "year": year},
+            )
+    print(f"[RESET] core.transactions {year}/{departement} vide ({partitioning})")
+
 
 def run_transform():
     """Execute la transformation staging -> core (hors chargement CSV).
@@ -1,5 +1,10 @@
 """Tests unitaires du moteur d'ajustement."""
 
+from dataclasses import asdict
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
 import pytest
 
 from src.app.models.property_input import (
@@ -10,7 +15,9 @@ from src.app.models.property_input import (
     PropertyCondition,
 )
 from src.app.models.adjustments import (
+    compile_coefficients,
     compute_adjustments,
+    compute_adjustments_batch,
     _compute_floor_adjustment,
     TYPE_COEFFICIENTS,
     QUALITY_COEFFICIENTS,
@@ -328,3 +335,98 @@ class TestCoefficientOverrides:
         assert "zone" in defaults
         assert defaults["zone"]["radius_1_km"] == 1.0
         assert defaults["zone"]["weight_1"] == 0.60
+
+
+class TestBatchAdjustments:
+    """compute_adjustments_batch reproduit compute_adjustments bien par bien."""
+
+    def _props(self) -> list[PropertyInput]:
+        return [
+            _default_prop(),
+            _default_prop(property_type=PropertyType.MAISON, quality=QualityLevel.SUPERIEURE),
+            _default_prop(etage=0),
+            _default_prop(etage=6, nb_etages_immeuble=6, ascenseur=True),
+            _default_prop(etage=9, ascenseur=False),
+            _default_prop(etage=15, ascenseur=True, balcon=True, terrasse=True),
+            _default_prop(
+                property_type=PropertyType.LOFT, vue_exceptionnelle=True, parking=True,
+                condition=PropertyCondition.REFAIT_A_NEUF, quality=QualityLevel.SUPERIEURE,
+                construction_period=ConstructionPeriod.P1850_1913,
+            ),
+            _default_prop(condition=PropertyCondition.A_RENOVER, quality=QualityLevel.INFERIEURE,
+                          construction_period=ConstructionPeriod.P1948_1969, etage=12),
+        ]
+
+    def _frame(self, props):
+        return pd.DataFrame([asdict(p) for p in props])
+
+    @pytest.mark.parametrize("overrides", [
+        None,
+        CoefficientOverrides(
+            type_coefficients={"loft": 1.20},
+            characteristic_adjustments={"balcon": 0.05},
+            floor_params=FloorParams(ground_floor_discount=0.10, last_floor_bonus=0.05),
+        ),
+    ])
+    def test_matches_scalar(self, overrides):
+        """Cas choisis + lot aleatoire (graine fixe) : valeurs identiques au bit pres."""
+        rng = np.random.default_rng(20241)
+        chars = ["ascenseur", "balcon", "terrasse", "cave", "parking", "chambre_service",
+                 "vue_exceptionnelle", "parties_communes_renovees", "ravalement_recent"]
+        props = self._props()
+        for _ in range(5000):
+            nb_etages = int(rng.integers(1, 20))
+            etage = None if rng.random() < 0.2 else int(rng.integers(0, nb_etages + 1))
+            props.append(_default_prop(
+                property_type=rng.choice(list(PropertyType)),
+                etage=etage,
+                nb_etages_immeuble=nb_etages,
+                condition=rng.choice(list(PropertyCondition)),
+                quality=rng.choice(list(QualityLevel)),
+                construction_period=rng.choice(list(ConstructionPeriod)),
+                **{c: bool(rng.random() < 0.3) for c in chars},
+            ))
+        bases = rng.uniform(50_000, 2_000_000, len(props)).round(2)
+        batch = compute_adjustments_batch(self._frame(props), bases, overrides)
+
+        fields = ["type_adjustment", "floor_adjustment", "characteristics_adjustment",
+                  "condition_adjustment", "quality_adjustment", "construction_adjustment",
+                  "total_multiplier", "adjusted_price"]
+        for i, prop in enumerate(props):
+            scalar = compute_adjustments(prop, float(bases[i]), overrides)
+            assert [float(getattr(batch, f)[i]) for f in fields] == [getattr(scalar, f) for f in fields], i
+
+    def test_string_columns_and_defaults(self):
+        """Valeurs str acceptees, colonnes absentes = defauts PropertyInput."""
+        df = pd.DataFrame({"property_type": ["maison", "appartement"], "etage": [None, 0]})
+        batch = compute_adjustments_batch(df, 100_000)
+        assert list(batch.total_multiplier) == pytest.approx([1.0, 0.93])
+        assert list(batch.adjusted_price) == [100_000, 93_000]
+
+    def test_clamping(self):
+        props = [_default_prop(
+            property_type=PropertyType.HOTEL_PARTICULIER, vue_exceptionnelle=True,
+            terrasse=True, parking=True, condition=PropertyCondition.REFAIT_A_NEUF,
+            quality=QualityLevel.SUPERIEURE,
+        )]
+        batch = compute_adjustments_batch(self._frame(props), 100_000)
+        assert batch.total_multiplier[0] == 1.40
+
+    def test_compiled_coefficients_reused(self):
+        compiled = compile_coefficients(CoefficientOverrides(type_coefficients={"duplex": 1.10}))
+        df = pd.DataFrame({"property_type": ["duplex"]})
+        assert compute_adjustments_batch(df, 100_000, compiled).total_multiplier[0] == 1.10
+        assert compute_adjustments_batch(df, 200_000, compiled).adjusted_price[0] == 220_000
+
+    def test_explanations_lazy(self):
+        props = self._props()
+        batch = compute_adjustments_batch(self._frame(props), 300_000)
+        with patch("src.app.models.adjustments.compute_adjustments",
+                   wraps=compute_adjustments) as scalar:
+            frame = batch.to_frame()
+            assert scalar.call_count == 0
+            assert list(frame["adjusted_price"]) == list(batch.adjusted_price)
+
+            expl = batch.explanations(6)
+            assert scalar.call_count == 1
+        assert expl == compute_adjustments(props[6], 300_000).explanations
@@ -25,6 +25,118 @@ class TestHealth:
         assert "database" in data
 
 
+class TestProbes:
+    DB = {
+        "postgis_version": "3.4",
+        "transactions_count": 796620,
+        "transactions_count_source": "stats",
+        "data_generation": 12,
+        "refreshed_at": "2024-06-01T00:00:00+00:00",
+    }
+
+    @pytest.fixture(autouse=True)
+    def clear_cache(self):
+        from src.api.health import reset_cache
+        reset_cache()
+        yield
+        reset_cache()
+
+    @patch("src.api.health._probe_database")
+    def test_liveness_without_database(self, mock_probe):
+        resp = client.get("/api/v1/health/live")
+        assert resp.status_code == 200
+        assert resp.json() == {"status": "ok"}
+        mock_probe.assert_not_called()
+
+    @patch("src.api.health._probe_database")
+    def test_readiness_cached(self, mock_probe):
+        """Les sondes successives reutilisent l'etat base en cache."""
+        mock_probe.return_value = self.DB
+        for _ in range(3):
+            resp = client.get("/api/v1/health/ready")
+            assert resp.status_code == 200
+        data = resp.json()
+        assert data["status"] == "ready"
+        assert data["data_generation"] == 12
+        assert data["transactions_count"] == 796620
+        assert "saturation" in data["pool"]
+        assert mock_probe.call_count == 1
+
+        assert client.get("/api/v1/health").json()["transactions_count"] == 796620
+        assert mock_probe.call_count == 1
+
+    @patch("src.api.health._probe_database")
+    def test_readiness_database_down(self, mock_probe):
+        mock_probe.side_effect = ConnectionError("refused")
+        resp = client.get("/api/v1/health/ready")
+        assert resp.status_code == 503
+        assert resp.json()["status"] == "not_ready"
+        assert client.get("/api/v1/health").json()["status"] == "error"
+
+    @patch("src.api.health._probe_database")
+    def test_probe_outside_lock_single_flight(self, mock_probe):
+        """Pendant une sonde lente, les autres appels renvoient l'ancienne mesure sans sonder."""
+        import threading
+        from src.api.health import database_status
+
+        mock_probe.return_value = self.DB
+        database_status()
+        started, release = threading.Event(), threading.Event()
+
+        def slow_probe():
+            started.set()
+            release.wait(5)
+            return {**self.DB, "data_generation": 13}
+
+        mock_probe.side_effect = slow_probe
+        refresher = threading.Thread(target=database_status, kwargs={"max_age_s": 0})
+        refresher.start()
+        assert started.wait(5)
+        assert database_status(max_age_s=0)["data_generation"] == 12
+        release.set()
+        refresher.join(5)
+        assert mock_probe.call_count == 2
+        assert database_status()["data_generation"] == 13
+
+    @patch("src.api.health._probe_database")
+    def test_not_ready_during_warmup(self, mock_probe):
+        mock_probe.return_value = self.DB
+        with patch("src.api.main.warmup") as mock_warmup:
+            mock_warmup.ready = False
+            mock_warmup.state.return_value = {"status": "running", "total_s": None, "steps": {"imports": 0.4}, "errors": {}}
+            resp = client.get("/api/v1/health/ready")
+        assert resp.status_code == 503
+        assert resp.json()["warmup"]["status"] == "running"
+        assert client.get("/api/v1/health/live").status_code == 200
+
+
+class TestWarmup:
+
+    def test_app_import_is_lazy(self):
+        """L'application se charge sans pandas / NumPy (importes au warm-up)."""
+        import subprocess
+        import sys
+        code = "import sys, src.api.main; print('pandas' in sys.modules, 'numpy' in sys.modules)"
+        out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+        assert out.stdout.split() == ["False", "False"]
+
+    def test_steps_timed_and_errors_kept(self):
+        from src.api.warmup import Warmup
+        warmup = Warmup()
+        with patch("src.api.warmup._import_modules"), \
+                patch("src.api.warmup._open_pool", side_effect=ConnectionError("refused")), \
+                patch("src.api.warmup._warm_geocoder"), \
+                patch("src.api.warmup._load_marts") as mock_marts, \
+                patch("src.api.warmup.API_MART_MIRROR", True):
+            warmup.start()
+            assert warmup.wait(timeout=5)
+        state = warmup.state()
+        assert state["status"] == "done"
+        assert set(state["steps"]) == {"imports", "pool", "geocoder", "mart_mirror"}
+        assert "refused" in state["errors"]["pool"]
+        mock_marts.assert_called_once()
+
+
 class TestDefaults:
     def test_defaults_structure(self):
         """Defaults retourne les 7 categories de coefficients."""
@@ -375,6 +487,292 @@ class TestComparables:
         assert "surface" in item
 
 
+# ---------------------------------------------------------------------------
+# Rezone (re-decoupage sans nouvelle recherche)
+# ---------------------------------------------------------------------------
+
+def _real_search_result(comparables_df):
+    """Cree un ComparableSearch avec candidats (re-decoupable en memoire)."""
+    from src.estimation.comparables import ComparableSearch, assign_zones
+    from src.estimation.zone_config import ZoneConfig
+    candidates = comparables_df.drop(columns="zone")
+    return ComparableSearch(
+        latitude=48.856, longitude=2.359, code_commune="75101", code_departement="75",
+        type_bien="appartement", surface=50, nb_pieces=None, level=1, level_desc="zones",
+        comparables=assign_zones(candidates, ZoneConfig()), zone_config=ZoneConfig(),
+        min_comparables=3, candidates=candidates, search_radius_km=10, candidates_limit=500,
+    )
+
+
+class TestCoordinates:
+    BODY = {"latitude": 48.856, "longitude": 2.359, "property_type": "appartement", "surface": 50}
+
+    @patch("src.api.service.geocode_best")
+    @patch("src.api.service.find_comparables")
+    @patch("src.api.service.get_zone_stats")
+    @patch("src.api.service.pd.read_sql")
+    @patch("src.estimation.estimator.read_df")
+    def test_citycode_given(self, mock_read_df, mock_read_sql, mock_zone_stats, mock_find, mock_geocode):
+        """Avec citycode : ni geocodeur ni recherche de commune."""
+        import pandas as pd
+        mock_find.return_value = _mock_search_result(_mock_comparables_df())
+        mock_zone_stats.return_value = None
+        mock_read_sql.return_value = pd.DataFrame()
+
+        resp = client.post("/api/v1/estimate/coordinates", json={
+            **self.BODY, "citycode": "75104", "include": ["geocoding", "estimation"],
+        })
+        assert resp.status_code == 200
+        data = resp.json()
+        assert data["status"] == "ok"
+        assert data["geocoding"]["citycode"] == "75104"
+        assert data["geocoding"]["latitude"] == 48.856
+        mock_geocode.assert_not_called()
+        mock_read_df.assert_not_called()
+        assert mock_find.call_args.kwargs["code_commune"] == "75104"
+
+    @patch("src.api.service.find_comparables")
+    @patch("src.api.service.get_zone_stats")
+    @patch("src.api.service.pd.read_sql")
+    @patch("src.estimation.estimator.read_df")
+    def test_citycode_from_nearest_transaction(self, mock_read_df, mock_read_sql, mock_zone_stats, mock_find):
+        import pandas as pd
+        mock_read_df.return_value = pd.DataFrame([{
+            "code_commune": "75104", "nom_commune": "Paris 4e Arrondissement",
+            "code_postal": None, "code_departement": "75", "distance_m": 35.0,
+        }])
+        mock_find.return_value = _mock_search_result(_mock_comparables_df())
+        mock_zone_stats.return_value = None
+        mock_read_sql.return_value = pd.DataFrame()
+
+        resp = client.post("/api/v1/estimate/coordinates", json={
+            **self.BODY, "address": "Chez le client", "include": ["geocoding"],
+        })
+        geocoding = resp.json()["geocoding"]
+        assert geocoding["citycode"] == "75104"
+        assert geocoding["city"] == "Paris 4e Arrondissement"
+        assert geocoding["postcode"] == ""
+        assert geocoding["label"] == "Chez le client"
+        assert mock_read_df.call_args.args[1] == {"lat": 48.856, "lon": 2.359}
+
+    @patch("src.api.service.find_comparables")
+    @patch("src.estimation.estimator.read_df")
+    def test_no_transaction_nearby(self, mock_read_df, mock_find):
+        import pandas as pd
+        mock_read_df.return_value = pd.DataFrame([{
+            "code_commune": "29019", "nom_commune": "Brest", "code_postal": "29200",
+            "code_departement": "29", "distance_m": 42_000.0,
+        }])
+        resp = client.post("/api/v1/estimate/coordinates", json=self.BODY)
+        assert resp.json()["status"] == "geocoding_failed"
+        mock_find.assert_not_called()
+
+    @pytest.mark.parametrize("update", [{"citycode": "7510"}, {"latitude": 95}, {"longitude": None}])
+    def test_validation(self, update):
+        resp = client.post("/api/v1/estimate/coordinates", json={**self.BODY, **update})
+        assert resp.status_code == 422
+
+
+class TestRezone:
+    @patch("src.api.service.geocode_best")
+    @patch("src.api.service.find_comparables")
+    @patch("src.api.service.get_zone_stats")
+    @patch("src.api.service.pd.read_sql")
+    def test_rezone_without_new_search(self, mock_read_sql, mock_zone_stats, mock_find, mock_geocode):
+        """Le rezone re-decoupe les comparables d'origine sans geocodage ni recherche."""
+        import pandas as pd
+        mock_geocode.return_value = _mock_geocode_result()
+        mock_find.return_value = _real_search_result(_mock_comparables_df())
+        mock_zone_stats.return_value = None
+        mock_read_sql.return_value = pd.DataFrame()
+
+        resp = client.post("/api/v1/estimate", json={
+            "address": "12 rue de Rivoli, Paris",
+            "property_type": "appartement",
+            "surface": 50,
+            "include": ["estimation"],
+        })
+        search_id = resp.json()["search_id"]
+        assert search_id
+
+        resp = client.post("/api/v1/estimate/rezone", json={
+            "search_id": search_id,
+            "zone_config": {"radius_1_km": 0.15, "radius_2_km": 0.25, "radius_3_km": 0.35},
+        })
+        assert resp.status_code == 200
+        data = resp.json()
+        assert data["status"] == "ok"
+        assert data["search_id"] == search_id
+        assert data["estimation"]["nb_comparables"] == 3
+        assert data["estimation"]["zone_config"]["radius_3_km"] == 0.35
+        assert data["geocoding"] is None  # include de l'estimation d'origine
+        assert mock_geocode.call_count == 1
+        assert mock_find.call_count == 1
+
+    def test_rezone_unknown_search_id(self):
+        resp = client.post("/api/v1/estimate/rezone", json={
+            "search_id": "inconnu",
+            "zone_config": {"radius_1_km": 1, "radius_2_km": 2, "radius_3_km": 3},
+        })
+        assert resp.status_code == 404
+
+
+# ---------------------------------------------------------------------------
+# Stream (Server-Sent Events)
+# ---------------------------------------------------------------------------
+
+def _sse_events(body: str) -> list[tuple[str, dict]]:
+    import json
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+class TestStream:
+    PAYLOAD = {"address": "12 rue de Rivoli, Paris", "property_type": "appartement", "surface": 50}
+
+    @patch("src.api.service.geocode_best")
+    @patch("src.api.service.find_comparables")
+    @patch("src.api.service.get_zone_stats")
+    @patch("src.api.service.pd.read_sql")
+    def test_stream_sections(self, mock_read_sql, mock_zone_stats, mock_find, mock_geocode):
+        """Un evenement par section (geocodage d'abord), puis le statut ; memes valeurs que /estimate."""
+        import pandas as pd
+        mock_geocode.return_value = _mock_geocode_result()
+        mock_find.return_value = _mock_search_result(_mock_comparables_df())
+        mock_zone_stats.return_value = None
+        mock_read_sql.return_value = pd.DataFrame()
+
+        resp = client.post("/api/v1/estimate/stream", json=self.PAYLOAD)
+        assert resp.status_code == 200
+        assert resp.headers["content-type"].startswith("text/event-stream")
+        events = _sse_events(resp.text)
+        names = [name for name, _ in events]
+        assert names == [
+            "geocoding", "estimation", "adjustments", "zone_stats", "evolution", "comparables", "status",
+        ]
+        status = events[-1][1]
+        assert status["status"] == "ok"
+        assert status["search_id"]
+
+        full = client.post("/api/v1/estimate", json=self.PAYLOAD).json()
+        for name, data in events[:-1]:
+            assert data == full[name]
+
+    @patch("src.api.service.geocode_best")
+    def test_stream_geocoding_failed(self, mock_geocode):
+        mock_geocode.return_value = None
+        events = _sse_events(client.post("/api/v1/estimate/stream", json=self.PAYLOAD).text)
+        assert events == [("status", {"status": "geocoding_failed", "search_id": None})]
+
+    def test_stream_invalid_property_type(self):
+        resp = client.post("/api/v1/estimate/stream", json={**self.PAYLOAD, "property_type": "chateau"})
+        assert resp.status_code == 422
+
+
+# ---------------------------------------------------------------------------
+# Sweep (grille de sensibilite)
+# ---------------------------------------------------------------------------
+
+class TestSweep:
+    PAYLOAD = {
+        "address": "12 rue de Rivoli, Paris",
+        "property_type": "appartement",
+        "surface": 50,
+        "etage": 5,
+    }
+
+    @patch("src.api.service.geocode_best")
+    @patch("src.api.service.find_comparables")
+    @patch("src.api.service.get_zone_stats")
+    @patch("src.api.service.pd.read_sql")
+    def test_sweep_single_search(self, mock_read_sql, mock_zone_stats, mock_find, mock_geocode):
+        """Toutes les combinaisons sont evaluees sur une seule recherche."""
+        import pandas as pd
+        mock_geocode.return_value = _mock_geocode_result()
+        mock_find.return_value = _real_search_result(_mock_comparables_df())
+        mock_zone_stats.return_value = None
+        mock_read_sql.return_value = pd.DataFrame()
+
+        resp = client.post("/api/v1/estimate/sweep", json={
+            **self.PAYLOAD,
+            "conditions": ["a_renover", "standard", "refait_a_neuf"],
+            "qualities": ["comparable", "superieure"],
+            "floor_params_grid": [{}, {"no_elevator_penalty_per_floor": 0.05}],
+            "zone_configs": [
+                {"radius_1_km": 1, "radius_2_km": 2, "radius_3_km": 3},
+                {"radius_1_km": 0.15, "radius_2_km": 0.25, "radius_3_km": 0.35},
+            ],
+        })
+        assert resp.status_code == 200
+        data = resp.json()
+        assert data["status"] == "ok"
+        assert mock_find.call_count == 1
+        assert len(data["rows"]) == 2 * 3 * 2 * 2
+        assert [z["nb_comparables"] for z in data["zones"]] == [5, 3]
+
+        # Chaque ligne = meme resultat qu'un /estimate avec ces parametres
+        cols = data["columns"]
+        row = next(r for r in data["rows"] if r[:4] == [0, 2, 1, 1])
+        single = client.post("/api/v1/estimate", json={
+            **self.PAYLOAD,
+            "condition": "refait_a_neuf",
+            "quality": "superieure",
+            "coefficient_overrides": {"floor_params": {"no_elevator_penalty_per_floor": 0.05}},
+            "include": ["estimation"],
+        }).json()["estimation"]
+        assert row[cols.index("total_multiplier")] == pytest.approx(single["total_multiplier"])
+        assert row[cols.index("prix_total_ajuste")] == single["prix_total_ajuste"]
+        assert row[cols.index("low_estimate")] == single["confidence"]["low_estimate"]
+
+    @patch("src.api.service.geocode_best")
+    @patch("src.api.service.find_comparables")
+    @patch("src.api.service.get_zone_stats")
+    @patch("src.api.service.pd.read_sql")
+    def test_sweep_rows_equal_estimate(self, mock_read_sql, mock_zone_stats, mock_find, mock_geocode):
+        """Chaque ligne du sweep vaut exactement /estimate (arrondis compris)."""
+        import pandas as pd
+        mock_geocode.return_value = _mock_geocode_result()
+        mock_find.return_value = _real_search_result(_mock_comparables_df())
+        mock_zone_stats.return_value = None
+        mock_read_sql.return_value = pd.DataFrame()
+
+        conditions = ["a_renover", "standard", "bon_etat", "refait_a_neuf"]
+        qualities = ["inferieure", "comparable", "superieure"]
+        # parking + a_renover x superieure : 1.03 * 0.85 * 1.10 = 0.96305, arrondi a 0.9631
+        payload = {**self.PAYLOAD, "surface": 47.3, "etage": None, "parking": True}
+        data = client.post("/api/v1/estimate/sweep", json={
+            **payload, "conditions": conditions, "qualities": qualities,
+        }).json()
+        cols = data["columns"]
+        for row in data["rows"]:
+            single = client.post("/api/v1/estimate", json={
+                **payload,
+                "condition": conditions[int(row[1])],
+                "quality": qualities[int(row[2])],
+                "include": ["estimation"],
+            }).json()["estimation"]
+            assert row[4:] == [
+                single["total_multiplier"], single["prix_m2_ajuste"], single["prix_total_ajuste"],
+                single["confidence"]["low_estimate"], single["confidence"]["high_estimate"],
+            ]
+
+    def test_sweep_too_many_combinations(self):
+        with patch("src.api.service.API_SWEEP_MAX_COMBINATIONS", 4):
+            resp = client.post("/api/v1/estimate/sweep", json={
+                **self.PAYLOAD,
+                "conditions": ["a_renover", "standard", "bon_etat"],
+                "qualities": ["comparable", "superieure"],
+            })
+        assert resp.status_code == 422
+
+    def test_sweep_invalid_condition(self):
+        resp = client.post("/api/v1/estimate/sweep", json={**self.PAYLOAD, "conditions": ["neuf"]})
+        assert resp.status_code == 422
+
+
 # ---------------------------------------------------------------------------
 # Integration tests (real DB, skipped without DB)
 # ---------------------------------------------------------------------------
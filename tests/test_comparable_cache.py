@@ -0,0 +1,202 @@
+"""Tests du cache de candidats comparables par cellule spatiale (sans base)."""
+
+from datetime import date
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.estimation.comparable_cache import (
+    CandidateCache,
+    CellKey,
+    bucket_band,
+    grid_cell,
+    level1_candidates,
+    local_distance_m,
+    surface_bucket,
+)
+from src.estimation.queries import surface_band
+
+PARIS = (48.8417, 2.2994)
+
+
+def _transactions(n: int = 3000, seed: int = 0) -> pd.DataFrame:
+    """Transactions synthetiques dans un carre de ~25 km autour de Paris 15e."""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "id_mutation": [f"m{i}" for i in range(n)],
+        "latitude": PARIS[0] + rng.uniform(-0.12, 0.12, n),
+        "longitude": PARIS[1] + rng.uniform(-0.17, 0.17, n),
+        "surface": rng.uniform(10, 250, n),
+        "prix_m2": rng.uniform(5000, 15000, n),
+    })
+
+
+def _fake_read_df(transactions: pd.DataFrame):
+    """Emule COMPARABLES_ZONES (rayon, bande de surface, tri par distance, LIMIT)."""
+    def read_df(query, params, conn=None):
+        distance = local_distance_m(params["lat"], params["lon"],
+                                    transactions["latitude"], transactions["longitude"])
+        df = transactions.assign(distance_m=distance)
+        df = df[(df["distance_m"] <= params["radius_m"])
+                & df["surface"].between(params["surface_min"], params["surface_max"])]
+        return df.sort_values("distance_m").head(params["max_comp"]).reset_index(drop=True)
+    return MagicMock(side_effect=read_df)
+
+
+def _params(lat: float, lon: float, surface: float | None, radius_m: float = 3000, max_comp: int = 500):
+    surface_min, surface_max = surface_band(surface)
+    return {
+        "lat": lat, "lon": lon, "type_bien": "appartement", "radius_m": radius_m,
+        "surface": surface, "surface_min": surface_min, "surface_max": surface_max,
+        "max_comp": max_comp,
+    }
+
+
+def _key(generation: int = 1, cell=(0, 0)) -> CellKey:
+    return CellKey(generation, cell, "appartement", 10, "2024-06-01", 10)
+
+
+class TestGeometry:
+
+    def test_distance_matches_meridian_arc(self):
+        # 0.01 deg de latitude a 45 deg N = 1111.33 m sur l'ellipsoide WGS84
+        assert local_distance_m(45.0, 0.0, [45.01], [0.0])[0] == pytest.approx(1111.33, abs=1)
+
+    def test_point_close_to_cell_center(self):
+        cell, lat, lon = grid_cell(*PARIS, cell_km=0.5)
+        assert grid_cell(lat, lon, cell_km=0.5)[0] == cell
+        assert local_distance_m(*PARIS, [lat], [lon])[0] <= 0.5 * 1000 * np.sqrt(2) / 2 + 1
+
+    @pytest.mark.parametrize("surface", [9.5, 30, 47.3, 80, 125, 999])
+    def test_bucket_band_covers_surface_band(self, surface):
+        low, high = bucket_band(surface_bucket(surface))
+        band_low, band_high = surface_band(surface)
+        assert low <= band_low and band_high <= high
+
+    def test_no_surface(self):
+        assert surface_bucket(None) is None
+        assert bucket_band(None) == surface_band(None)
+
+
+class TestLevel1Candidates:
+
+    @pytest.fixture
+    def cache(self):
+        cache = CandidateCache(max_bytes=64 * 1024 * 1024)
+        cache.generation = MagicMock(return_value=1)
+        cache.window_end = MagicMock(return_value="2024-06-01")
+        with patch("src.estimation.comparable_cache.candidate_cache", cache):
+            yield cache
+
+    def test_same_rows_as_direct_query(self, cache):
+        """Les candidats filtres en memoire sont ceux de la requete directe."""
+        transactions = _transactions()
+        fake = _fake_read_df(transactions)
+        rng = np.random.default_rng(1)
+        with patch("src.estimation.comparable_cache.read_df", fake):
+            for _ in range(30):
+                params = _params(
+                    PARIS[0] + rng.uniform(-0.003, 0.003),
+                    PARIS[1] + rng.uniform(-0.004, 0.004),
+                    rng.choice([None, rng.uniform(20, 120)]),
+                    max_comp=int(rng.choice([50, 500])),
+                )
+                direct = fake.side_effect(None, params)
+                cached = level1_candidates(params, conn=None)
+                assert list(cached["id_mutation"]) == list(direct["id_mutation"])
+                np.testing.assert_allclose(cached["distance_m"], direct["distance_m"])
+
+        stats = cache.stats()
+        assert stats["hits"] > 0
+        assert stats["hits"] + stats["misses"] == 30
+        assert fake.call_count == stats["misses"]
+
+    def test_neighbour_search_hits(self, cache):
+        fake = _fake_read_df(_transactions())
+        with patch("src.estimation.comparable_cache.read_df", fake):
+            level1_candidates(_params(*PARIS, 50), conn=None)
+            level1_candidates(_params(PARIS[0] + 0.0001, PARIS[1], 51), conn=None)
+        assert fake.call_count == 1
+        assert cache.stats()["hit_ratio"] == 0.5
+
+    def test_truncated_superset_bypassed(self, cache):
+        fake = _fake_read_df(_transactions())
+        with patch("src.estimation.comparable_cache.read_df", fake), \
+                patch("src.estimation.comparable_cache.COMPARABLE_CACHE_MAX_ROWS", 10):
+            df = level1_candidates(_params(*PARIS, 50, max_comp=5), conn=None)
+        assert len(df) == 5
+        assert cache.stats()["entries"] == 0
+        assert cache.stats()["bypassed"] == 1
+
+    def test_dense_cell_goes_straight_to_direct_query(self, cache):
+        fake = _fake_read_df(_transactions())
+        with patch("src.estimation.comparable_cache.read_df", fake), \
+                patch("src.estimation.comparable_cache.COMPARABLE_CACHE_MAX_ROWS", 10):
+            level1_candidates(_params(*PARIS, 50, max_comp=5), conn=None)
+            assert fake.call_count == 2  # sur-ensemble tronque + requete directe
+            df = level1_candidates(_params(PARIS[0] + 0.0001, PARIS[1], 51, max_comp=5), conn=None)
+        assert fake.call_count == 3  # requete directe seule
+        assert fake.call_args.args[1]["max_comp"] == 5
+        assert len(df) == 5
+        stats = cache.stats()
+        assert (stats["dense_cells"], stats["bypassed"]) == (1, 2)
+
+    def test_dense_cells_forgotten_on_new_generation(self, cache):
+        cache.mark_dense(_key(generation=1))
+        assert cache.is_dense(_key(generation=1))
+        assert not cache.is_dense(_key(generation=2))
+        assert cache.stats()["dense_cells"] == 0
+
+
+class TestCandidateCache:
+
+    def _df(self, n: int) -> pd.DataFrame:
+        return pd.DataFrame({"x": np.arange(n, dtype=float)})
+
+    def test_lru_eviction_by_bytes(self):
+        entry_bytes = int(self._df(100).memory_usage(deep=True).sum())
+        cache = CandidateCache(max_bytes=2 * entry_bytes)
+        for i in range(3):
+            cache.put(_key(cell=(i, 0)), self._df(100))
+        assert cache.get(_key(cell=(0, 0))) is None
+        assert cache.get(_key(cell=(2, 0))) is not None
+        stats = cache.stats()
+        assert stats["entries"] == 2
+        assert stats["bytes"] == 2 * entry_bytes
+        assert stats["evictions"] == 1
+
+    def test_oversized_entry_not_cached(self):
+        cache = CandidateCache(max_bytes=100)
+        cache.put(_key(), self._df(1000))
+        assert cache.stats()["entries"] == 0
+        assert cache.stats()["bypassed"] == 1
+
+    def test_new_generation_invalidates(self):
+        cache = CandidateCache(max_bytes=1024 * 1024)
+        cache.put(_key(generation=1), self._df(10))
+        cache.put(_key(generation=1, cell=(1, 0)), self._df(10))
+        assert cache.get(_key(generation=2)) is None
+        stats = cache.stats()
+        assert (stats["entries"], stats["bytes"], stats["invalidations"]) == (0, 0, 1)
+
+    def test_generation_read_with_ttl(self):
+        cache = CandidateCache(max_bytes=1)
+        conn = MagicMock()
+        conn.execute.return_value.scalar.side_effect = ["mart.data_generation", 7]
+        assert cache.generation(conn) == 7
+        assert cache.generation(conn) == 7
+        assert conn.execute.call_count == 2
+
+    def test_window_end_from_server_clock(self):
+        cache = CandidateCache(max_bytes=1)
+        conn = MagicMock()
+        conn.execute.return_value.one.side_effect = [
+            (date(2024, 6, 1), 0.0),       # minuit serveur : a relire aussitot
+            (date(2024, 6, 2), 86399.0),
+        ]
+        assert cache.window_end(conn) == "2024-06-01"
+        assert cache.window_end(conn) == "2024-06-02"
+        assert cache.window_end(conn) == "2024-06-02"
+        assert conn.execute.call_count == 2
@@ -166,6 +166,15 @@ class TestCoreTransactions:
         pct = 100 * geo / total
         assert pct >= 95, f"Taux geolocalisation = {pct:.1f}%, attendu >= 95%"
 
+    def test_geo_key_matches_geom(self, conn):
+        """geo_key = geohash du point pour toute transaction geolocalisee."""
+        n = _scalar(conn, """
+            SELECT COUNT(*) FROM core.transactions
+            WHERE geom IS NOT NULL
+              AND geo_key IS DISTINCT FROM ST_GeoHash(geom, 12)
+        """)
+        assert n == 0, f"{n} transactions avec geo_key absent ou incoherent"
+
     def test_outlier_rate_reasonable(self, conn):
         """Taux d'outliers entre 1% et 15%."""
         total = _scalar(conn, "SELECT COUNT(*) FROM core.transactions")
@@ -562,6 +571,21 @@ class TestEstimationEndToEnd:
             med = result.comparables["prix_m2"].median()
             assert 5000 <= med <= 20000, f"Median comparables Paris = {med:.0f}"
 
+    def test_comparables_knn_mode(self):
+        """Le mode knn retourne les ventes les plus proches, triees par distance."""
+        from src.estimation.comparables import find_comparables
+        result = find_comparables(
+            latitude=48.8606,
+            longitude=2.3376,
+            code_commune="75101",
+            type_bien="appartement",
+            surface=50,
+            mode="knn",
+        )
+        assert len(result.comparables) >= 5
+        assert result.level <= 2
+        assert result.comparables["distance_m"].is_monotonic_increasing
+
     def test_zone_stats_accessible(self):
         """Les zone_stats sont accessibles via l'estimateur."""
         from src.estimation.estimator import get_zone_stats
@@ -571,6 +595,15 @@ class TestEstimationEndToEnd:
         assert stats["total_transactions"] > 100
         assert stats["median_prix_m2_12m"] > 5000
 
+    def test_locate_commune_paris(self):
+        """Geocodage inverse local : la transaction la plus proche est a Paris 4e."""
+        from src.estimation.estimator import locate_commune
+        commune = locate_commune(48.8553, 2.3587)
+        assert commune is not None
+        assert commune["code_commune"].startswith("751")
+        assert commune["distance_m"] < 500
+        assert locate_commune(45.0, -5.0) is None  # Ocean Atlantique
+
     def test_historical_stats_accessible(self):
         """Les historiques stats sont accessibles."""
         from src.estimation.estimator import get_historical_stats
@@ -631,7 +664,81 @@ class TestEstimationEndToEnd:
 
 
 # ============================================================
-# 9. STAGING — Doit etre vide apres pipeline
+# 9. INDEX — Plans des fallbacks de find_comparables
+# ============================================================
+
+def _plan_nodes(plan):
+    nodes = [plan]
+    for child in plan.get("Plans", []):
+        nodes.extend(_plan_nodes(child))
+    return nodes
+
+
+def _explain(conn, sql, params):
+    import json
+    raw = conn.execute(text(f"EXPLAIN (FORMAT JSON) {sql}"), params).scalar()
+    plan = (raw if isinstance(raw, list) else json.loads(raw))[0]["Plan"]
+    return _plan_nodes(plan)
+
+
+def _index_family(conn, index_name):
+    """Nom de l'index + ses index de partition (layout partitionne)."""
+    rows = conn.execute(text("""
+        WITH RECURSIVE fam AS (
+            SELECT c.oid, c.relname FROM pg_class c WHERE c.relname = :name
+            UNION ALL
+            SELECT c.oid, c.relname
+            FROM pg_inherits i
+            JOIN fam f ON i.inhparent = f.oid
+            JOIN pg_class c ON c.oid = i.inhrelid
+        )
+        SELECT relname FROM fam
+    """), {"name": index_name}).fetchall()
+    return {r[0] for r in rows}
+
+
+class TestComparablesIndexes:
+
+    PARAMS = {
+        "lat": 48.8417, "lon": 2.2994,
+        "code_commune": "75115", "code_departement": "75",
+        "type_bien": "appartement", "max_comp": 500,
+        "surface_min": 25, "surface_max": 100,
+    }
+
+    @pytest.mark.parametrize("level, index_name", [
+        (2, "idx_tx_cmp_commune"),
+        (3, "idx_tx_cmp_commune"),
+        (4, "idx_tx_cmp_departement"),
+    ])
+    def test_fallback_uses_covering_index(self, conn, level, index_name):
+        """Les fallbacks 2-4 lisent l'index couvrant, sans tri explicite."""
+        from src.estimation.queries import FALLBACK_LEVELS
+        lvl = next(l for l in FALLBACK_LEVELS if l["level"] == level)
+        nodes = _explain(conn, lvl["query"].sql, self.PARAMS)
+
+        index_names = {n.get("Index Name", "") for n in nodes}
+        assert index_names & _index_family(conn, index_name), (
+            f"niveau {level} : index {index_name} non utilise ({index_names})"
+        )
+        assert not any(n["Node Type"] == "Sort" for n in nodes), (
+            f"niveau {level} : tri explicite dans le plan"
+        )
+
+    def test_prepared_matches_text(self, conn):
+        """EXECUTE d'un statement prepare retourne les memes lignes que le SQL texte."""
+        from src.estimation.queries import ESTIMATION_QUERIES, prepare
+        params = {**self.PARAMS, "radius_m": 10_000}
+        for query in ESTIMATION_QUERIES:
+            prepare(conn, query)
+            args = {name: params[name] for name in query.param_names}
+            direct = conn.execute(query.statement, args).fetchall()
+            prepared = conn.execute(text(query.execute_sql()), args).fetchall()
+            assert direct == prepared, f"{query.name} : resultats differents"
+
+
+# ============================================================
+# 10. STAGING — Doit etre vide apres pipeline
 # ============================================================
 
 class TestStaging:
@@ -642,5 +749,95 @@ class TestStaging:
         assert n == 0, f"staging.dvf contient encore {n} lignes"
 
 
+# ============================================================
+# 11. QUALITE — Rapport en un seul scan
+# ============================================================
+
+class TestQualityReport:
+
+    def test_report_matches_direct_queries(self, conn):
+        """Le rapport GROUPING SETS retrouve les comptages des requetes separees."""
+        from src.transform.quality import run_quality_checks
+        report = run_quality_checks()
+
+        comptages = report["comptages"].set_index("table_name")["row_count"]
+        assert comptages["core.transactions"] == _scalar(conn, "SELECT COUNT(*) FROM core.transactions")
+
+        outliers = report["taux_outliers"]
+        assert outliers["nb_outliers"].sum() == _scalar(
+            conn, "SELECT COUNT(*) FROM core.transactions WHERE is_outlier"
+        )
+
+        annees = report["transactions_annee"]
+        assert annees["nb_transactions"].sum() == comptages["core.transactions (hors outliers)"]
+
+    def test_sample_mode(self):
+        from src.transform.quality import run_quality_checks
+        report = run_quality_checks(sample_pct=5)
+        assert set(report) == {
+            "comptages", "surfaces_nulles", "distribution_prix",
+            "transactions_annee", "couverture_geo", "taux_outliers",
+        }
+
+
+# ============================================================
+# 12. EXPORT — COPY TO STDOUT et curseur serveur
+# ============================================================
+
+class TestExport:
+
+    def test_csv_and_ndjson_same_rows(self, conn):
+        import json
+        from src.api.export import ExportFilters, export_transactions
+
+        filters = ExportFilters(departements=["75"], type_bien="appartement", limit=200)
+        csv_chunks, _, _ = export_transactions(filters, "csv")
+        csv_lines = b"".join(csv_chunks).decode().splitlines()
+        ndjson_chunks, _, _ = export_transactions(filters, "ndjson")
+        records = [json.loads(line) for line in b"".join(ndjson_chunks).decode().splitlines()]
+
+        assert len(csv_lines) == len(records) + 1 == 201
+        assert all(r["code_departement"] == "75" for r in records)
+
+
+# ============================================================
+# 13. API — Copie en memoire des marts
+# ============================================================
+
+class TestMartMirror:
+
+    def test_mirror_matches_database(self):
+        from src.api.mart_mirror import MartMirror
+        from src.api.service import _get_evolution_data
+        from src.estimation.estimator import get_zone_stats
+
+        snapshot = MartMirror().load()
+        assert snapshot.rows > 0
+        for commune, dep in [("75115", "75"), ("13055", "13")]:
+            assert snapshot.zone_stats.get((commune, "appartement")) == get_zone_stats(commune, "appartement")
+            assert _get_evolution_data(commune, dep, "appartement", snapshot) == \
+                _get_evolution_data(commune, dep, "appartement")
+
+
+# ============================================================
+# 14. INGESTION — Registre des fichiers charges
+# ============================================================
+
+class TestIngestionLedger:
+
+    def test_ledger_matches_core(self, conn):
+        if _scalar(conn, "SELECT to_regclass('staging.ingestion_files')") is None:
+            pytest.skip("staging.ingestion_files absente (aucun chargement depuis son ajout)")
+        rows = conn.execute(text("""
+            SELECT f.annee, f.code_departement, f.rows_inserted, f.rows_staged,
+                   (SELECT COUNT(*) FROM core.transactions t
+                    WHERE t.code_departement = f.code_departement AND t.annee = f.annee) AS in_core
+            FROM staging.ingestion_files f
+        """)).fetchall()
+        for annee, dep, inserted, staged, in_core in rows:
+            assert inserted == in_core, f"{annee}/{dep}: registre {inserted} != core {in_core}"
+            assert staged is None or staged >= inserted  # None : inscrit depuis core (mise a niveau)
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v", "--tb=short"])
@@ -0,0 +1,88 @@
+"""Tests de la configuration du pool de connexions (sans base PostgreSQL)."""
+
+from unittest.mock import MagicMock
+
+import pytest
+from sqlalchemy import create_engine, exc, text
+from sqlalchemy.pool import NullPool
+
+import src.db as db
+from src.db import POOL_PROFILES, TimedQueuePool, pool_metrics, resolve_pool_profile
+
+
+@pytest.fixture(autouse=True)
+def fresh_metrics():
+    pool_metrics.reset()
+    yield
+    pool_metrics.reset()
+
+
+class TestPoolProfiles:
+
+    def test_profiles(self):
+        assert set(POOL_PROFILES) == {"api", "pipeline", "streamlit"}
+        assert resolve_pool_profile("pipeline") == POOL_PROFILES["pipeline"]
+
+    def test_env_override(self, monkeypatch):
+        monkeypatch.setenv("DB_POOL_SIZE", "1")
+        monkeypatch.setenv("DB_MAX_OVERFLOW", "0")
+        profile = resolve_pool_profile("api")
+        assert (profile.pool_size, profile.max_overflow) == (1, 0)
+        assert profile.pool_timeout == POOL_PROFILES["api"].pool_timeout
+
+    def test_unknown_profile(self):
+        with pytest.raises(ValueError):
+            resolve_pool_profile("batch")
+
+    def test_pgbouncer_uses_null_pool(self, monkeypatch):
+        monkeypatch.setattr(db, "DB_PGBOUNCER", True)
+        engine = db._create_engine("api")
+        assert isinstance(engine.pool, NullPool)
+
+    def test_profile_sizes_pool(self, monkeypatch):
+        monkeypatch.setattr(db, "DB_PGBOUNCER", False)
+        engine = db._create_engine("streamlit")
+        assert isinstance(engine.pool, TimedQueuePool)
+        assert engine.pool.size() == POOL_PROFILES["streamlit"].pool_size
+        assert engine.pool._pre_ping is False
+
+
+class TestPoolMetrics:
+
+    def test_checkout_and_timeout_counted(self):
+        pool = TimedQueuePool(creator=MagicMock, pool_size=1, max_overflow=0, timeout=0.01)
+        conn = pool.connect()
+        with pytest.raises(exc.TimeoutError):
+            pool.connect()
+        conn.close()
+
+        stats = pool_metrics.snapshot()
+        assert stats["checkouts"] == 1
+        assert stats["timeouts"] == 1
+
+    def test_overflow_counted(self):
+        pool = TimedQueuePool(creator=MagicMock, pool_size=1, max_overflow=1)
+        first, second = pool.connect(), pool.connect()
+        assert pool_metrics.snapshot()["overflow_checkouts"] == 1
+        first.close()
+        second.close()
+
+    def test_pooled_checkout_not_counted_while_overflow_open(self):
+        """Reprendre la connexion du pool pendant un debordement n'est pas un debordement."""
+        pool = TimedQueuePool(creator=MagicMock, pool_size=1, max_overflow=2)
+        first, second = pool.connect(), pool.connect()
+        first.close()
+        third = pool.connect()
+        assert pool_metrics.snapshot()["overflow_checkouts"] == 1
+        second.close()
+        third.close()
+
+    def test_idle_connection_validated(self):
+        """Une connexion inactive au-dela de l'intervalle est validee au checkout."""
+        engine = create_engine("sqlite://", poolclass=TimedQueuePool)
+        db._install_validation(engine, interval_s=0)
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        with engine.connect() as conn:
+            assert conn.execute(text("SELECT 1")).scalar() == 1
+        assert pool_metrics.snapshot()["validation_failures"] == 0
@@ -0,0 +1,220 @@
+"""Tests du telechargement (reprise Range, revalidation ETag) contre un serveur HTTP local."""
+
+import hashlib
+import json
+import os
+import threading
+from email.utils import parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src.ingestion import download
+from src.ingestion.download import (
+    DownloadResult,
+    download_dvf_etalab,
+    download_file,
+    part_path,
+)
+
+
+CONTENT = bytes(range(256)) * 400  # ~100 Ko
+LAST_MODIFIED = "Mon, 01 Jan 2024 00:00:00 GMT"
+
+
+class _DvfHandler(BaseHTTPRequestHandler):
+    """Sert CONTENT sur toute URL, avec ETag, If-Modified-Since, Range et If-Range."""
+
+    def do_GET(self):
+        server = self.server
+        server.requests.append(dict(self.headers))
+        body, etag = server.content, server.etag
+
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        # If-Modified-Since ignore en presence de If-None-Match (RFC 9110)
+        since = self.headers.get("If-Modified-Since")
+        if since and "If-None-Match" not in self.headers and parsedate_to_datetime(since) >= parsedate_to_datetime(LAST_MODIFIED):
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+
+        start = 0
+        range_header = self.headers.get("Range")
+        if_range = self.headers.get("If-Range")
+        if range_header and (if_range is None or if_range == etag):
+            start = 0 if server.ignore_range_start else int(range_header.split("=")[1].rstrip("-"))
+            if start >= len(body):
+                self.send_response(416)
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{len(body) - 1}/{len(body)}")
+        else:
+            self.send_response(200)
+
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", LAST_MODIFIED)
+        self.send_header("Content-Length", str(len(body) - start))
+        self.end_headers()
+        self.wfile.write(body[start:])
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def http_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _DvfHandler)
+    server.content = CONTENT
+    server.etag = '"v1"'
+    server.requests = []
+    server.ignore_range_start = False
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    server.url = f"http://127.0.0.1:{server.server_address[1]}"
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+class TestDownloadFile:
+
+    def test_full_download_hash_while_streaming(self, http_server, tmp_path):
+        dest = tmp_path / "75.csv.gz"
+        result = download_file(f"{http_server.url}/75.csv.gz", dest)
+
+        assert result.status == "downloaded"
+        assert dest.read_bytes() == CONTENT
+        assert result.sha256 == hashlib.sha256(CONTENT).hexdigest()
+        assert result.etag == '"v1"'
+        assert not part_path(dest).exists()
+
+    def test_resume_partial_file(self, http_server, tmp_path):
+        dest = tmp_path / "75.csv.gz"
+        part_path(dest).write_bytes(CONTENT[:30_000])
+        dest.with_name(dest.name + ".part.json").write_text(json.dumps({"etag": '"v1"'}))
+
+        result = download_file(f"{http_server.url}/75.csv.gz", dest)
+
+        assert http_server.requests[-1]["Range"] == "bytes=30000-"
+        assert result.resumed_from == 30_000
+        assert dest.read_bytes() == CONTENT
+        assert result.sha256 == hashlib.sha256(CONTENT).hexdigest()
+
+    def test_resume_restarts_when_resource_changed(self, http_server, tmp_path):
+        """If-Range different de l'ETag courant : le serveur renvoie tout (200)."""
+        dest = tmp_path / "75.csv.gz"
+        part_path(dest).write_bytes(b"x" * 30_000)
+        dest.with_name(dest.name + ".part.json").write_text(json.dumps({"etag": '"v0"'}))
+
+        result = download_file(f"{http_server.url}/75.csv.gz", dest)
+
+        assert result.resumed_from == 0
+        assert dest.read_bytes() == CONTENT
+
+    def test_resume_restarts_on_unexpected_content_range(self, http_server, tmp_path):
+        """206 qui ne commence pas a la fin du .part : rien n'est ajoute, on repart de zero."""
+        http_server.ignore_range_start = True
+        dest = tmp_path / "75.csv.gz"
+        part_path(dest).write_bytes(CONTENT[:30_000])
+        dest.with_name(dest.name + ".part.json").write_text(json.dumps({"etag": '"v1"'}))
+
+        result = download_file(f"{http_server.url}/75.csv.gz", dest)
+
+        assert result.status == "downloaded"
+        assert result.resumed_from == 0
+        assert "Range" not in http_server.requests[-1]
+        assert dest.read_bytes() == CONTENT
+        assert result.sha256 == hashlib.sha256(CONTENT).hexdigest()
+
+    def test_not_modified(self, http_server, tmp_path):
+        dest = tmp_path / "75.csv.gz"
+        dest.write_bytes(b"ancien")
+
+        result = download_file(f"{http_server.url}/75.csv.gz", dest, etag='"v1"')
+
+        assert result.status == "not_modified"
+        assert dest.read_bytes() == b"ancien"
+
+    def test_error_keeps_partial(self, tmp_path):
+        dest = tmp_path / "75.csv.gz"
+        part_path(dest).write_bytes(b"debut")
+
+        result = download_file("http://127.0.0.1:1/75.csv.gz", dest)
+
+        assert result == DownloadResult(status="error", error=result.error)
+        assert part_path(dest).read_bytes() == b"debut"
+
+
+class TestDownloadDvfEtalab:
+
+    @pytest.fixture(autouse=True)
+    def landing(self, http_server, tmp_path, monkeypatch):
+        monkeypatch.setattr(download, "LANDING_DIR", tmp_path)
+        monkeypatch.setattr(download, "MANIFEST_PATH", tmp_path / "manifest.json")
+        monkeypatch.setattr(download, "ETALAB_BASE_URL", http_server.url)
+
+    def test_concurrent_then_revalidated(self, http_server, tmp_path):
+        download_dvf_etalab(years=[2023, 2024], departements=["75", "92"], concurrency=3)
+
+        manifest = json.loads((tmp_path / "manifest.json").read_text())
+        assert len(manifest) == 4
+        for filename, entry in manifest.items():
+            assert (tmp_path / filename).read_bytes() == CONTENT
+            assert entry["etag"] == '"v1"'
+            assert entry["sha256"] == hashlib.sha256(CONTENT).hexdigest()
+
+        # Deuxieme passage : un 304 par fichier, rien de re-ecrit
+        http_server.requests.clear()
+        download_dvf_etalab(years=[2023, 2024], departements=["75", "92"], concurrency=3)
+        assert len(http_server.requests) == 4
+        assert all(r.get("If-None-Match") == '"v1"' for r in http_server.requests)
+
+    def test_changed_resource_is_downloaded_again(self, http_server, tmp_path):
+        download_dvf_etalab(years=[2024], departements=["75"], concurrency=1)
+
+        http_server.content = CONTENT[::-1]
+        http_server.etag = '"v2"'
+        download_dvf_etalab(years=[2024], departements=["75"], concurrency=1)
+
+        manifest = json.loads((tmp_path / "manifest.json").read_text())
+        assert (tmp_path / "2024" / "75.csv.gz").read_bytes() == CONTENT[::-1]
+        assert manifest["2024/75.csv.gz"]["etag"] == '"v2"'
+
+    def test_file_without_manifest_entry_is_adopted(self, http_server, tmp_path):
+        """Fichier deja present hors manifest : GET conditionnel sur sa date, pas de re-telechargement."""
+        dest = tmp_path / "2024" / "75.csv.gz"
+        dest.parent.mkdir()
+        dest.write_bytes(CONTENT)
+        mtime = parsedate_to_datetime("Tue, 02 Jan 2024 00:00:00 GMT").timestamp()
+        os.utime(dest, (mtime, mtime))
+
+        download_dvf_etalab(years=[2024], departements=["75"], concurrency=1)
+
+        assert http_server.requests[-1]["If-Modified-Since"] == "Tue, 02 Jan 2024 00:00:00 GMT"
+        entry = json.loads((tmp_path / "manifest.json").read_text())["2024/75.csv.gz"]
+        assert entry["size_bytes"] == len(CONTENT)
+        assert entry["sha256"] == hashlib.sha256(CONTENT).hexdigest()
+        assert entry["etag"] == '"v1"'
+
+        # Passage suivant : revalidation par l'ETag adopte
+        download_dvf_etalab(years=[2024], departements=["75"], concurrency=1)
+        assert http_server.requests[-1].get("If-None-Match") == '"v1"'
+
+    def test_stale_file_without_manifest_entry_is_replaced(self, http_server, tmp_path):
+        dest = tmp_path / "2024" / "75.csv.gz"
+        dest.parent.mkdir()
+        dest.write_bytes(b"ancien")
+        mtime = parsedate_to_datetime("Sun, 31 Dec 2023 00:00:00 GMT").timestamp()
+        os.utime(dest, (mtime, mtime))
+
+        download_dvf_etalab(years=[2024], departements=["75"], concurrency=1)
+
+        assert dest.read_bytes() == CONTENT
+        entry = json.loads((tmp_path / "manifest.json").read_text())["2024/75.csv.gz"]
+        assert entry["sha256"] == hashlib.sha256(CONTENT).hexdigest()
@@ -1,13 +1,16 @@
 """Tests du moteur d'estimation."""
 
 import math
+from unittest.mock import MagicMock, patch
 
 import numpy as np
 import pandas as pd
 import pytest
 
-from src.estimation.estimator import compute_surface_adjustment, compute_weighted_median
-from src.estimation.confidence import compute_confidence
+from src.estimation.comparables import ComparableSearch, assign_zones, find_comparables, rezone_comparables
+from src.estimation.estimator import build_estimation, compute_surface_adjustment, compute_weighted_median
+from src.estimation.geocoder import GeocodingResult
+from src.estimation.confidence import SEARCH_LEVEL_KNN, compute_confidence
 from src.estimation.zone_config import ZoneConfig
 from src.app.utils.formatting import format_distance
 
@@ -68,6 +71,11 @@ class TestConfidence:
         result = compute_confidence(sample_comparables_sparse, search_level=4, surface=100.0)
         assert result.level == "low"
 
+    def test_knn_level_not_scored_as_fallback(self, sample_comparables):
+        """Voisins knn hors zones : au mieux confiance moyenne, quel que soit le nombre."""
+        assert compute_confidence(sample_comparables, search_level=SEARCH_LEVEL_KNN, surface=50.0).level == "medium"
+        assert compute_confidence(sample_comparables.head(5), search_level=SEARCH_LEVEL_KNN, surface=50.0).level == "low"
+
     def test_confidence_interval_ordered(self, sample_comparables):
         """La borne basse < borne haute."""
         result = compute_confidence(sample_comparables, search_level=1, surface=50.0)
@@ -170,6 +178,178 @@ class TestWeightedMedian:
         assert prix_m2 == pytest.approx(6000, abs=1)
 
 
+class TestBuildEstimation:
+    """Estimation a partir de comparables deja recherches (chemin cache)."""
+
+    GEO = GeocodingResult(
+        label="10 Rue de Rivoli 75001 Paris", score=0.95,
+        latitude=48.8606, longitude=2.3376, housenumber="10", street="Rue de Rivoli",
+        postcode="75001", city="Paris", citycode="75101", context="75, Paris",
+    )
+
+    def _search(self, df, zone_config):
+        return ComparableSearch(
+            latitude=48.8606, longitude=2.3376, code_commune="75101",
+            code_departement="75", type_bien="appartement", surface=60, nb_pieces=3,
+            level=1, level_desc="zones", comparables=df, zone_config=zone_config,
+        )
+
+    def test_weights_change_without_new_search(self, sample_comparables):
+        """Changer les poids ne change que la mediane ponderee."""
+        default = build_estimation(self.GEO, self._search(sample_comparables, ZoneConfig()), 60)
+        zone1_only = build_estimation(
+            self.GEO,
+            self._search(sample_comparables, ZoneConfig(weight_1=1, weight_2=0, weight_3=0)),
+            60,
+        )
+        expected, _ = compute_weighted_median(sample_comparables, ZoneConfig(weight_1=1, weight_2=0, weight_3=0))
+        adj = compute_surface_adjustment(60, sample_comparables)
+        assert zone1_only.prix_m2_estime == pytest.approx(expected * adj, abs=0.01)
+        assert zone1_only.nb_comparables == default.nb_comparables
+
+    def test_empty_comparables(self):
+        result = build_estimation(self.GEO, self._search(pd.DataFrame(), None), 60, zone_stats={"x": 1})
+        assert result.prix_m2_estime == 0
+        assert result.zone_stats is None
+
+
+class TestRezone:
+    """Re-decoupage des zones a partir des candidats deja recuperes."""
+
+    def _search(self, candidates, zone_config=None, level=1):
+        zone_config = zone_config or ZoneConfig()
+        return ComparableSearch(
+            latitude=48.8606, longitude=2.3376, code_commune="75101",
+            code_departement="75", type_bien="appartement", surface=60, nb_pieces=3,
+            level=level, level_desc="zones", comparables=assign_zones(candidates, zone_config),
+            zone_config=zone_config, candidates=candidates,
+            search_radius_km=10, candidates_limit=500,
+        )
+
+    def test_assign_zones_matches_radii(self, sample_comparables):
+        candidates = sample_comparables.drop(columns="zone")
+        df = assign_zones(candidates, ZoneConfig(radius_1_km=0.5, radius_2_km=1.5, radius_3_km=2.5))
+        assert (df.loc[df["distance_m"] <= 500, "zone"] == 1).all()
+        assert (df.loc[df["distance_m"] > 1500, "zone"] == 3).all()
+        assert df["distance_m"].max() <= 2500
+
+    def test_assign_zones_keeps_nearest(self, sample_comparables):
+        candidates = sample_comparables.sort_values("distance_m")
+        df = assign_zones(candidates, ZoneConfig(max_comparables=10))
+        assert list(df["id_mutation"]) == list(candidates["id_mutation"].head(10))
+
+    def test_rezone_in_memory(self, sample_comparables):
+        candidates = sample_comparables.sort_values("distance_m").drop(columns="zone")
+        search = self._search(candidates)
+        narrow = ZoneConfig(radius_1_km=0.5, radius_2_km=1.0, radius_3_km=1.5)
+
+        rezoned = rezone_comparables(search, narrow)
+
+        assert rezoned.level == 1
+        assert rezoned.zone_config == narrow
+        assert rezoned.comparables["distance_m"].max() <= 1500
+        assert len(rezoned.comparables) < len(search.comparables)
+
+    def test_rezone_beyond_search_radius(self, sample_comparables):
+        search = self._search(sample_comparables.drop(columns="zone"))
+        assert rezone_comparables(search, ZoneConfig(radius_3_km=15)) is None
+        assert rezone_comparables(search, ZoneConfig(max_comparables=1000)) is None
+
+    def test_fetch_radius_is_r3(self, sample_comparables):
+        """Le niveau 1 ne recupere que jusqu'a R3 : un R3 plus grand relance la recherche."""
+        candidates = sample_comparables.sort_values("distance_m").drop(columns="zone")
+        level1 = MagicMock(return_value=candidates)
+        with patch("src.estimation.comparables.get_engine", MagicMock()), \
+                patch("src.estimation.comparables.level1_candidates", level1):
+            search = find_comparables(48.8606, 2.3376, "75101", "appartement", surface=60,
+                                      zone_config=ZoneConfig(radius_3_km=2.5))
+        assert level1.call_args[0][0]["radius_m"] == 2500
+        assert search.search_radius_km == 2.5
+        assert rezone_comparables(search, ZoneConfig(radius_1_km=0.5, radius_2_km=1, radius_3_km=2)).level == 1
+        assert rezone_comparables(search, ZoneConfig(radius_3_km=3)) is None
+
+    def test_rezone_needs_fallback(self, sample_comparables):
+        """Niveau 1 devenu insuffisant : le fallback n'a pas ete calcule."""
+        search = self._search(sample_comparables.drop(columns="zone"))
+        tiny = ZoneConfig(radius_1_km=0.01, radius_2_km=0.02, radius_3_km=0.05)
+        assert rezone_comparables(search, tiny) is None
+
+
+class TestKnnSearch:
+    """Mode knn : une requete ordonnee par distance, sans fallback commune/departement."""
+
+    def _find(self, candidates, knn_rows=None, **kwargs):
+        """knn_rows : lignes de la sous-requete KNN avant le filtre en metres."""
+        candidates = candidates.assign(knn_rows=len(candidates) if knn_rows is None else knn_rows)
+        read_df = MagicMock(return_value=candidates)
+        with patch("src.estimation.comparables.get_engine", MagicMock()), \
+                patch("src.estimation.comparables.read_df", read_df):
+            search = find_comparables(48.8606, 2.3376, "75101", "appartement", surface=60,
+                                      mode="knn", **kwargs)
+        return search, read_df
+
+    def test_dense_area_uses_zones(self, sample_comparables):
+        candidates = sample_comparables.sort_values("distance_m").drop(columns="zone")
+        search, read_df = self._find(candidates)
+        assert read_df.call_count == 1
+        assert read_df.call_args[0][0].name == "stta_comparables_knn"
+        assert search.level == 1
+        assert len(search.comparables) == 50
+
+    def test_sparse_area_takes_nearest(self, sample_comparables):
+        """Aucune vente dans les zones : les plus proches, zone 3 etendue."""
+        far = sample_comparables.sort_values("distance_m").drop(columns="zone")
+        far["distance_m"] += 8000
+        search, read_df = self._find(far)
+        assert read_df.call_count == 1  # ni commune ni departement
+        assert search.level == SEARCH_LEVEL_KNN
+        assert search.level_desc.startswith("20 ventes les plus proches")
+        assert len(search.comparables) == 20
+        assert list(search.comparables["id_mutation"]) == list(far["id_mutation"].head(20))
+        assert (search.comparables["zone"] == 3).all()
+        assert search.zone_config is not None
+
+        rezoned = rezone_comparables(search, ZoneConfig(radius_1_km=9, radius_2_km=9.5, radius_3_km=10))
+        assert rezoned.level == 1
+
+    def test_complete_radius_when_limit_reached(self, sample_comparables):
+        candidates = sample_comparables.sort_values("distance_m").drop(columns="zone")
+        search, _ = self._find(candidates, zone_config=ZoneConfig(max_comparables=50))
+        farthest_km = candidates["distance_m"].iloc[-1] / 1000
+        assert search.search_radius_km == pytest.approx(farthest_km * math.cos(math.radians(48.8606)))
+
+    def test_limit_reached_with_rows_dropped_in_metres(self, sample_comparables):
+        """LIMIT atteinte mais lignes ecartees par ST_DWithin : pas exhaustif jusqu'au rayon."""
+        candidates = sample_comparables.sort_values("distance_m").drop(columns="zone")
+        search, _ = self._find(candidates, knn_rows=500)
+        farthest_km = candidates["distance_m"].iloc[-1] / 1000
+        assert search.search_radius_km == pytest.approx(farthest_km * math.cos(math.radians(48.8606)))
+        assert "knn_rows" not in search.candidates
+
+    def test_complete_radius_when_limit_not_reached(self, sample_comparables):
+        candidates = sample_comparables.sort_values("distance_m").drop(columns="zone")
+        search, read_df = self._find(candidates)
+        assert search.search_radius_km == read_df.call_args[0][1]["radius_m"] / 1000
+
+    def test_invalid_mode(self):
+        with pytest.raises(ValueError):
+            find_comparables(48.86, 2.34, "75101", "appartement", mode="grid")
+
+
+class TestDomDepartement:
+    """Communes des DOM : departement sur 3 caracteres (97411 -> 974)."""
+
+    def test_fallback_uses_dom_departement(self):
+        empty = pd.DataFrame({"distance_m": pd.Series(dtype=float)})
+        read_df = MagicMock(return_value=empty)
+        with patch("src.estimation.comparables.get_engine", MagicMock()), \
+                patch("src.estimation.comparables.level1_candidates", return_value=empty), \
+                patch("src.estimation.comparables.read_df", read_df):
+            search = find_comparables(-20.8789, 55.4481, "97411", "appartement", surface=60)
+        assert search.code_departement == "974"
+        assert {c.args[1]["code_departement"] for c in read_df.call_args_list} == {"974"}
+
+
 class TestFormatDistance:
     """Tests de format_distance."""
 
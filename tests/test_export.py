@@ -0,0 +1,223 @@
+"""Tests de l'export en flux des transactions (sans base PostgreSQL)."""
+
+import asyncio
+import datetime as dt
+import gzip
+import io
+import json
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src.api.export import (
+    EXPORT_COLUMNS,
+    ExportFilters,
+    ExportSlots,
+    arrow_chunks,
+    build_export_query,
+    gzip_chunks,
+    iter_copy_csv,
+    parse_bbox,
+)
+from src.api.main import _ExportResponse, app
+
+client = TestClient(app)
+
+COLUMNS = [name for name, _, _ in EXPORT_COLUMNS]
+
+
+def _row(i: int) -> tuple:
+    return (
+        f"2024-{i}", dt.date(2024, 1, 1 + i % 28), 2024, 250000.0 + i, "appartement", 50.0, 2,
+        "75", "75115", "Paris 15e", "75015", f"{i} rue \"Test\"", 48.84, 2.29, 5000.0,
+    )
+
+
+def _join_producers():
+    for thread in threading.enumerate():
+        if thread.name == "export-copy":
+            thread.join(5)
+
+
+def _raw_connection(rows: list[tuple], batch_rows: int = 2):
+    """Connexion psycopg2 factice : COPY ligne a ligne et curseur serveur par lots."""
+    conn = MagicMock()
+
+    def cursor(name=None):
+        cur = MagicMock()
+        cur.mogrify.side_effect = lambda sql, params: sql.encode()
+
+        def copy_expert(sql, file):
+            file.write(",".join(COLUMNS) + "\n")
+            for row in rows:
+                file.write(",".join(str(v) for v in row).encode() + b"\n")
+        cur.copy_expert.side_effect = copy_expert
+
+        batches = [rows[i:i + batch_rows] for i in range(0, len(rows), batch_rows)] + [[]]
+        cur.fetchmany.side_effect = batches
+        cur.description = [(c,) for c in COLUMNS]
+        return cur
+
+    conn.cursor.side_effect = cursor
+    return conn
+
+
+class TestQuery:
+
+    def test_no_filter_excludes_outliers(self):
+        sql, params = build_export_query(ExportFilters())
+        assert sql.endswith("FROM core.transactions t WHERE NOT t.is_outlier")
+        assert params == {}
+
+    def test_filters_bound(self):
+        sql, params = build_export_query(ExportFilters(
+            departements=["75", "92"], type_bien="maison",
+            date_min=dt.date(2023, 1, 1), bbox=(2.2, 48.8, 2.4, 48.9),
+            include_outliers=True, limit=10,
+        ))
+        assert "is_outlier" not in sql
+        assert "ANY(%(departements)s)" in sql and "ST_MakeEnvelope" in sql
+        assert sql.endswith("LIMIT %(limit)s")
+        assert params["departements"] == ["75", "92"]
+        assert (params["lon_min"], params["lat_max"], params["limit"]) == (2.2, 48.9, 10)
+
+    @pytest.mark.parametrize("value", ["1,2,3", "2.4,48.8,2.2,48.9", "a,b,c,d"])
+    def test_invalid_bbox(self, value):
+        with pytest.raises(ValueError):
+            parse_bbox(value)
+
+
+class TestStreams:
+
+    def test_copy_csv_chunked(self):
+        rows = [_row(i) for i in range(50)]
+        conn = _raw_connection(rows)
+        with patch("src.api.export.get_raw_connection", return_value=conn), \
+                patch("src.api.export.EXPORT_CHUNK_BYTES", 256), \
+                patch("src.api.export.EXPORT_QUEUE_CHUNKS", 2):
+            chunks = list(iter_copy_csv("SELECT 1", {}))
+        assert len(chunks) > 1
+        assert all(len(c) < 512 for c in chunks)
+        lines = b"".join(chunks).decode().splitlines()
+        assert lines[0] == ",".join(COLUMNS)
+        assert len(lines) == 51
+        conn.close.assert_called_once()
+
+    def test_copy_interrupted_invalidates_connection(self):
+        conn = _raw_connection([_row(i) for i in range(500)])
+        with patch("src.api.export.get_raw_connection", return_value=conn), \
+                patch("src.api.export.EXPORT_CHUNK_BYTES", 64), \
+                patch("src.api.export.EXPORT_QUEUE_CHUNKS", 1):
+            stream = iter_copy_csv("SELECT 1", {})
+            next(stream)
+            stream.close()
+            _join_producers()
+        conn.invalidate.assert_called_once()
+        conn.close.assert_not_called()
+
+    def test_abandoned_stream_cancels_copy(self):
+        """Client parti pendant que le serveur produit : fermeture immediate, COPY annule."""
+        conn = MagicMock()
+        server = threading.Event()
+
+        def copy_expert(sql, file):
+            file.write(b"a" * 100)
+            file.flush()
+            server.wait(5)  # en attente des lignes suivantes du serveur
+            raise RuntimeError("canceling statement due to user request")
+
+        conn.cursor.return_value.mogrify.side_effect = lambda sql, params: sql.encode()
+        conn.cursor.return_value.copy_expert.side_effect = copy_expert
+        conn.cancel.side_effect = server.set
+        with patch("src.api.export.get_raw_connection", return_value=conn):
+            stream = iter_copy_csv("SELECT 1", {})
+            assert next(stream) == b"a" * 100
+            start = time.perf_counter()
+            stream.close()
+            assert time.perf_counter() - start < 0.5
+            _join_producers()
+        conn.cancel.assert_called_once()
+        conn.invalidate.assert_called_once()
+        conn.close.assert_not_called()
+
+    def test_response_closes_stream_on_disconnect(self):
+        closed = []
+
+        def body():
+            try:
+                yield b"a"
+                yield b"b"
+            finally:
+                closed.append(True)
+
+        async def receive():
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            if message.get("body"):
+                raise OSError("client parti")
+
+        response = _ExportResponse(body(), media_type="text/csv")
+        with pytest.raises(Exception):
+            asyncio.run(response({"type": "http", "asgi": {"spec_version": "2.4"}}, receive, send))
+        assert closed == [True]
+
+    def test_arrow_roundtrip(self):
+        pa = pytest.importorskip("pyarrow")
+        rows = [_row(i) for i in range(5)]
+        body = b"".join(arrow_chunks([(COLUMNS, rows[:3]), (COLUMNS, rows[3:])]))
+        table = pa.ipc.open_stream(body).read_all()
+        assert table.num_rows == 5
+        assert table.column_names == COLUMNS
+        assert table["date_mutation"][0].as_py() == dt.date(2024, 1, 1)
+
+    def test_gzip(self):
+        chunks = [b"a" * 1000, b"b" * 1000]
+        assert gzip.decompress(b"".join(gzip_chunks(chunks))) == b"".join(chunks)
+
+    def test_slots(self):
+        slots = ExportSlots(1)
+        release = slots.acquire()
+        assert slots.acquire() is None
+        release()
+        release()
+        assert slots.active == 0
+
+
+class TestEndpoint:
+
+    def _get(self, rows, **params):
+        with patch("src.api.export.get_raw_connection", return_value=_raw_connection(rows)):
+            return client.get("/api/v1/export/transactions", params=params)
+
+    def test_ndjson(self):
+        response = self._get([_row(i) for i in range(5)], format="ndjson", departement="75")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        records = [json.loads(line) for line in response.text.splitlines()]
+        assert len(records) == 5
+        assert records[0]["date_mutation"] == "2024-01-01"
+        assert records[0]["adresse"] == '0 rue "Test"'
+
+    def test_csv_gzip(self):
+        response = self._get([_row(i) for i in range(3)], gzip="true")
+        assert response.status_code == 200
+        assert 'filename="transactions.csv.gz"' in response.headers["content-disposition"]
+        lines = gzip.GzipFile(fileobj=io.BytesIO(response.content)).read().decode().splitlines()
+        assert len(lines) == 4
+
+    def test_invalid_format(self):
+        response = self._get([], format="xlsx")
+        assert response.status_code == 422
+
+    def test_invalid_bbox(self):
+        response = self._get([], bbox="2.4,48.8,2.2")
+        assert response.status_code == 422
+
+    def test_too_many_exports(self):
+        with patch("src.api.main.export_slots", ExportSlots(0)):
+            response = self._get([])
+        assert response.status_code == 429
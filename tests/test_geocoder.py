@@ -4,7 +4,7 @@ from unittest.mock import patch, MagicMock
 
 import pytest
 
-from src.estimation.geocoder import geocode, geocode_best, GeocodingResult
+from src.estimation.geocoder import departement_of, geocode, geocode_best, GeocodingResult
 
 
 MOCK_RESPONSE = {
@@ -94,3 +94,20 @@ def test_geocode_best_returns_result(mock_get):
     assert result is not None
     assert result.score >= 0.4
     assert result.citycode == "75101"
+
+
+def test_geocode_uses_given_session():
+    session = MagicMock()
+    session.get.return_value.json.return_value = MOCK_RESPONSE
+
+    results = geocode("10 rue de Rivoli, Paris", session=session)
+
+    session.get.assert_called_once()
+    assert results[0].citycode == "75101"
+
+
+@pytest.mark.parametrize("code_commune, departement", [
+    ("75115", "75"), ("2A004", "2A"), ("97411", "974"), ("97101", "971"),
+])
+def test_departement_of(code_commune, departement):
+    assert departement_of(code_commune) == departement
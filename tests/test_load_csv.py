@@ -0,0 +1,115 @@
+"""Tests du registre des fichiers charges (sans base PostgreSQL)."""
+
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from src.ingestion.load_csv import load_and_transform
+from src.ingestion.metadata import INGESTION_FILES_BACKFILL, init_ingestion_log
+
+
+@pytest.fixture
+def loader(tmp_path):
+    """load_and_transform avec landing dans tmp_path et base simulee."""
+    for dep in ("75", "92", "93"):
+        (tmp_path / "2024").mkdir(exist_ok=True)
+        (tmp_path / "2024" / f"{dep}.csv.gz").write_bytes(b"")
+
+    conn = MagicMock()
+    conn.execute.return_value.rowcount = 1234
+    engine = MagicMock()
+    engine.begin.return_value.__enter__.return_value = conn
+    mocks = {"conn": conn}
+
+    module = "src.ingestion.load_csv"
+    patches = {
+        "LANDING_DIR": patch(f"{module}.LANDING_DIR", tmp_path),
+        "get_engine": patch(f"{module}.get_engine", return_value=engine),
+        "load_manifest": patch(f"{module}.load_manifest", return_value={
+            "2024/75.csv.gz": {"sha256": "aaa"},
+            "2024/92.csv.gz": {"sha256": "new"},
+        }),
+        "compute_sha256": patch(f"{module}.compute_sha256", return_value="ccc"),
+        "ingested_files": patch(f"{module}.ingested_files", return_value={
+            (2024, "75"): {"source_sha256": "aaa", "rows_inserted": 5000},
+            (2024, "92"): {"source_sha256": "old", "rows_inserted": 4000},
+        }),
+        "load_single_csv": patch(f"{module}.load_single_csv", return_value=9000),
+    }
+    for name in ("create_staging_table", "ensure_core_partitions", "migrate_core_tables",
+                 "init_ingestion_log", "truncate_staging", "reset_core_partition",
+                 "adopt_ingested_file", "forget_ingested_file", "record_ingested_file"):
+        patches[name] = patch(f"{module}.{name}")
+
+    for name, p in patches.items():
+        mocks[name] = p.start()
+    yield mocks
+    patch.stopall()
+
+
+class TestLedger:
+
+    def test_skip_reload_and_new_files(self, loader):
+        total = load_and_transform(years=[2024], departements=["75", "92", "93"])
+
+        # 75 : meme SHA256 -> saute ; 92 : SHA256 change ; 93 : absent du registre
+        reloaded = [c.args for c in loader["reset_core_partition"].call_args_list]
+        assert reloaded == [("92", 2024), ("93", 2024)]
+        loader["forget_ingested_file"].assert_called_once_with(loader["conn"], 2024, "92")
+        loader["compute_sha256"].assert_called_once()  # 93 absent du manifest
+
+        records = loader["record_ingested_file"].call_args_list
+        assert [c.args[1:4] for c in records] == [(2024, "92", "new"), (2024, "93", "ccc")]
+        assert records[0].kwargs["rows_staged"] == 9000
+        assert records[0].kwargs["rows_inserted"] == 1234  # rowcount de l'INSERT
+        assert total == 2 * 1234
+
+    def test_no_count_probe(self, loader):
+        load_and_transform(years=[2024], departements=["75", "92", "93"])
+        statements = [str(c.args[0]) for c in loader["conn"].execute.call_args_list]
+        assert not any("COUNT(*) FROM core.transactions" in s for s in statements)
+
+    def test_force_reloads_unchanged_file(self, loader):
+        load_and_transform(years=[2024], departements=["75"], force=True)
+        loader["forget_ingested_file"].assert_called_once_with(loader["conn"], 2024, "75")
+        loader["reset_core_partition"].assert_called_once_with("75", 2024)
+        loader["record_ingested_file"].assert_called_once()
+
+    def test_upgrade_keeps_partitions_already_in_core(self, loader):
+        """Registre initialise depuis core (sans SHA256) : rien n'est recharge."""
+        loader["ingested_files"].return_value = {
+            (2024, dep): {"source_sha256": None, "rows_inserted": 5000} for dep in ("75", "92", "93")
+        }
+        assert load_and_transform(years=[2024], departements=["75", "92", "93"]) == 0
+        loader["reset_core_partition"].assert_not_called()
+        loader["record_ingested_file"].assert_not_called()
+        adopted = [c.args[1:] for c in loader["adopt_ingested_file"].call_args_list]
+        assert adopted == [(2024, "75", "aaa"), (2024, "92", "new"), (2024, "93", "ccc")]
+
+    def test_upgrade_force_reloads(self, loader):
+        loader["ingested_files"].return_value = {(2024, "75"): {"source_sha256": None, "rows_inserted": 5000}}
+        load_and_transform(years=[2024], departements=["75"], force=True)
+        loader["adopt_ingested_file"].assert_not_called()
+        loader["reset_core_partition"].assert_called_once_with("75", 2024)
+
+
+class TestLedgerBackfill:
+
+    def _init(self, ledger_exists: bool, core_exists: bool) -> list[str]:
+        conn = MagicMock()
+        conn.execute.side_effect = lambda stmt, *a: MagicMock(scalar=MagicMock(return_value=(
+            ("x" if ledger_exists else None) if "staging.ingestion_files" in str(stmt)
+            else ("x" if core_exists else None)
+        )))
+        engine = MagicMock()
+        engine.begin.return_value.__enter__.return_value = conn
+        with patch("src.ingestion.metadata.get_engine", return_value=engine):
+            init_ingestion_log()
+        return [str(c.args[0]) for c in conn.execute.call_args_list]
+
+    def test_backfill_on_creation(self):
+        assert INGESTION_FILES_BACKFILL in self._init(ledger_exists=False, core_exists=True)
+
+    @pytest.mark.parametrize("ledger_exists, core_exists", [(True, True), (False, False)])
+    def test_no_backfill(self, ledger_exists, core_exists):
+        assert INGESTION_FILES_BACKFILL not in self._init(ledger_exists, core_exists)
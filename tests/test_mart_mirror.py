@@ -0,0 +1,127 @@
+"""Tests de la copie en memoire des marts (sans base PostgreSQL)."""
+
+from unittest.mock import MagicMock, patch
+
+import pandas as pd
+import pytest
+
+from src.api.mart_mirror import KeyedRows, MartMirror, MartSnapshot
+from src.api.service import _get_evolution_data
+
+
+def _mart_frames() -> dict[str, pd.DataFrame]:
+    return {
+        "mart.zone_stats": pd.DataFrame({
+            "code_commune": ["75115", "75115"], "type_bien": ["appartement", "maison"],
+            "total_transactions": [1200, 3], "last_12m_transactions": [300, 1],
+            "median_prix_m2_12m": [10250.0, None], "stddev_prix_m2_12m": [1800.0, None],
+            "trend_12m": [0.0, None], "data_quality_flag": ["OK", "LOW_VOLUME"],
+        }),
+        "mart.stats_commune": pd.DataFrame({
+            "code_commune": ["75115"] * 3 + ["75116"],
+            "type_bien": ["appartement"] * 4,
+            "annee": [2023, 2023, 2024, 2024], "semestre": [1, 2, 1, 1],
+            "nb_transactions": [150, 140, 160, 90],
+            "median_prix_m2": [10100.0, 10200.0, 10300.0, 11000.0],
+            "q1_prix_m2": [9000.0, None, 9200.0, 9800.0], "q3_prix_m2": [11000.0, 11100.0, 11200.0, 12000.0],
+        }),
+        "mart.stats_departement": pd.DataFrame({
+            "code_departement": ["75", "75"], "type_bien": ["maison", "maison"],
+            "annee": [2023, 2024], "semestre": [2, 1], "nb_transactions": [40, 45],
+            "median_prix_m2": [9000.0, 9100.0], "q1_prix_m2": [8000.0, 8100.0], "q3_prix_m2": [10000.0, 10100.0],
+        }),
+        "mart.indices_temporels": pd.DataFrame({
+            "code_commune": ["75115", "75115"], "type_bien": ["appartement"] * 2,
+            "annee_mois": ["2024-01", "2024-02"], "nb_transactions": [25, 30],
+            "median_prix_m2": [10300.0, 10350.0], "rolling_median_6m": [None, 10320.0],
+        }),
+    }
+
+
+def _fake_read_sql(frames):
+    def read_sql(sql, conn, **kwargs):
+        table = next(name for name in frames if f"FROM {name}" in str(sql))
+        return frames[table].copy()
+    return read_sql
+
+
+@pytest.fixture
+def snapshot():
+    with patch("src.api.mart_mirror.pd.read_sql", side_effect=_fake_read_sql(_mart_frames())):
+        return MartSnapshot.load(MagicMock(), generation=7)
+
+
+class TestKeyedRows:
+
+    def test_slices_by_key(self):
+        rows = KeyedRows(_mart_frames()["mart.stats_commune"], ["code_commune", "type_bien"])
+        records = rows.records(("75115", "appartement"))
+        assert [r["semestre"] for r in records] == [1, 2, 1]
+        assert set(records[0]) == {"annee", "semestre", "nb_transactions", "median_prix_m2", "q1_prix_m2", "q3_prix_m2"}
+        assert rows.records(("13055", "appartement")) == []
+
+    def test_empty_table(self):
+        rows = KeyedRows(_mart_frames()["mart.stats_commune"].head(0), ["code_commune", "type_bien"])
+        assert rows.rows == 0
+        assert rows.records(("75115", "appartement")) == []
+
+
+class TestSnapshot:
+
+    def test_zone_stats_like_database_lookup(self, snapshot):
+        stats = snapshot.zone_stats[("75115", "appartement")]
+        assert stats["total_transactions"] == 1200
+        assert stats["median_prix_m2_12m"] == 10250.0
+        assert stats["trend_12m"] is None  # 0 -> None comme get_zone_stats
+        assert snapshot.zone_stats[("75115", "maison")]["median_prix_m2_12m"] is None
+        assert snapshot.rows == 2 + 4 + 2 + 2
+
+    @patch("src.api.service.read_df")
+    def test_evolution_without_queries(self, mock_read_df, snapshot):
+        evolution = _get_evolution_data("75115", "75", "appartement", snapshot)
+        assert evolution.source == "commune"
+        assert [s.median_prix_m2 for s in evolution.semester] == [10100.0, 10200.0, 10300.0]
+        assert evolution.semester[1].q1_prix_m2 is None
+        assert [m.annee_mois for m in evolution.monthly] == ["2024-01", "2024-02"]
+        assert evolution.monthly[0].rolling_median_6m is None
+        mock_read_df.assert_not_called()
+
+    def test_evolution_departement_fallback(self, snapshot):
+        evolution = _get_evolution_data("75115", "75", "maison", snapshot)
+        assert evolution.source == "departement"
+        assert len(evolution.semester) == 2
+        assert evolution.monthly == []
+
+    @patch("src.api.service.read_df")
+    def test_same_sections_as_database(self, mock_read_df, snapshot):
+        """Sans instantane, les memes lignes lues en base donnent la meme section."""
+        frames = _mart_frames()
+        commune = frames["mart.stats_commune"]
+        mock_read_df.side_effect = [
+            commune[commune["code_commune"] == "75115"].drop(columns=["code_commune", "type_bien"]),
+            frames["mart.indices_temporels"].drop(columns=["code_commune", "type_bien"]),
+        ]
+        from_db = _get_evolution_data("75115", "75", "appartement")
+        assert from_db == _get_evolution_data("75115", "75", "appartement", snapshot)
+
+
+class TestMirror:
+
+    def test_reload_on_new_generation(self, snapshot):
+        mirror = MartMirror()
+        mirror.snapshot = snapshot
+        with patch("src.api.mart_mirror.get_engine"), \
+                patch("src.api.mart_mirror._read_generation", side_effect=[7, 8]), \
+                patch.object(mirror, "load") as mock_load:
+            assert mirror.refresh_if_stale() is False
+            assert mirror.refresh_if_stale() is True
+        mock_load.assert_called_once()
+
+    def test_start_without_database(self):
+        mirror = MartMirror()
+        with patch("src.api.mart_mirror.get_engine", side_effect=ConnectionError("refused")):
+            mirror.start(interval_s=3600)
+        mirror.stop()
+        status = mirror.status()
+        assert status["loaded"] is False
+        assert "refused" in status["last_error"]
@@ -0,0 +1,120 @@
+"""Tests de l'ingestion nationale (sans base PostgreSQL ni reseau)."""
+
+import json
+from unittest.mock import patch
+
+import pytest
+
+from src.config import DEPARTEMENTS_DVF
+from src.ingestion.download import DownloadResult
+from src.ingestion.load_csv import FileLoad
+from src.ingestion.national import run_national, save_report
+
+
+@pytest.fixture
+def national(tmp_path):
+    """run_national avec telechargement et chargement simules."""
+    module = "src.ingestion.national"
+    mocks = {}
+    patches = {
+        "LANDING_DIR": patch(f"{module}.LANDING_DIR", tmp_path),
+        "load_manifest": patch(f"{module}.load_manifest", return_value={}),
+        "compute_sha256": patch(f"{module}.compute_sha256", return_value="sha"),
+        "ingested_files": patch(f"{module}.ingested_files", return_value={}),
+        "get_core_partitioning": patch(f"{module}.get_core_partitioning", return_value="departement_annee"),
+        "download_dvf_file": patch(f"{module}.download_dvf_file"),
+        "load_departement_year": patch(f"{module}.load_departement_year",
+                                       return_value=FileLoad(1000, 300, 2.0, 0.5)),
+    }
+    for name in ("create_staging_table", "ensure_core_partitions", "migrate_core_tables",
+                 "init_ingestion_log",
+                 "read_transform_sql", "detect_outliers", "vacuum_analyze_core", "refresh_marts"):
+        patches[name] = patch(f"{module}.{name}")
+    for name, p in patches.items():
+        mocks[name] = p.start()
+    mocks["download_dvf_file"].side_effect = lambda year, dep, *args, **kwargs: (
+        f"{year}/{dep}.csv.gz", DownloadResult(status="downloaded", sha256="sha", size_bytes=2_000_000)
+    )
+    yield mocks
+    patch.stopall()
+
+
+def _units(report) -> dict:
+    return {u.name: u for u in report.units}
+
+
+class TestNational:
+
+    def test_all_units_loaded(self, national):
+        report = run_national(years=[2023, 2024], departements=["01", "2A"], backoff_s=0)
+        assert report.counts() == {"loaded": 4}
+        assert report.totals()["rows_staged"] == 4000
+        assert report.totals()["rows_inserted"] == 1200
+        assert report.totals()["downloaded_mb"] == 8.0
+        assert list(report.post_steps) == ["outliers", "vacuum", "mart"]
+        national["refresh_marts"].assert_called_once()
+
+    def test_download_retry(self, national):
+        results = iter([
+            DownloadResult(status="error", error="Connection reset"),
+            DownloadResult(status="downloaded", sha256="sha", size_bytes=10),
+        ])
+        national["download_dvf_file"].side_effect = lambda year, dep, *a, **k: (f"{year}/{dep}.csv.gz", next(results))
+        report = run_national(years=[2024], departements=["75"], backoff_s=0)
+        unit = _units(report)["2024/75"]
+        assert (unit.status, unit.attempts, unit.error) == ("loaded", 2, None)
+
+    def test_missing_file_not_retried(self, national):
+        national["download_dvf_file"].side_effect = lambda year, dep, *a, **k: (
+            f"{year}/{dep}.csv.gz", DownloadResult(status="error", error="404", http_status=404)
+        )
+        report = run_national(years=[2025], departements=["976"], backoff_s=0)
+        assert _units(report)["2025/976"].attempts == 1
+        assert report.counts() == {"missing": 1}
+        national["load_departement_year"].assert_not_called()
+        assert report.post_steps == {}  # rien de charge : marts inchanges
+
+    def test_failed_unit_does_not_block_others(self, national, capsys):
+        def load(year, dep, *args, **kwargs):
+            if dep == "13":
+                raise ConnectionError("server closed the connection")
+            return FileLoad(1000, 300, 2.0, 0.5)
+
+        national["load_departement_year"].side_effect = load
+        report = run_national(years=[2024], departements=["13", "75", "92"], max_attempts=3, backoff_s=0)
+        units = _units(report)
+        assert (units["2024/13"].status, units["2024/13"].attempts) == ("failed", 3)
+        assert "server closed" in units["2024/13"].error
+        assert units["2024/75"].status == units["2024/92"].status == "loaded"
+
+        # L'echec definitif compte dans la progression : 3/3 unites terminees
+        progress = [line for line in capsys.readouterr().out.splitlines() if line.startswith("[UNIT]")]
+        assert len(progress) == 3
+        assert any("2024/13 failed" in line and "server closed" in line for line in progress)
+        assert "(3/3," in progress[-1]
+
+    def test_skipped_by_ledger(self, national):
+        national["load_departement_year"].return_value = None
+        report = run_national(years=[2024], departements=["75"], backoff_s=0)
+        assert report.counts() == {"skipped": 1}
+
+    def test_landing_only(self, national, tmp_path):
+        (tmp_path / "2024").mkdir()
+        (tmp_path / "2024" / "75.csv.gz").write_bytes(b"")
+        report = run_national(years=[2024], departements=["75", "92"], download=False, backoff_s=0)
+        assert report.counts() == {"loaded": 1, "missing": 1}
+        national["download_dvf_file"].assert_not_called()
+
+    def test_report_json(self, national, tmp_path):
+        report = run_national(years=[2024], departements=["75"], post_load=False, backoff_s=0)
+        save_report(report, tmp_path / "report.json")
+        data = json.loads((tmp_path / "report.json").read_text(encoding="utf-8"))
+        assert data["counts"] == {"loaded": 1}
+        assert data["units"][0]["rows_inserted"] == 300
+        assert "not_before" not in data["units"][0]
+
+
+def test_departements_dvf():
+    assert len(DEPARTEMENTS_DVF) == len(set(DEPARTEMENTS_DVF)) == 97
+    assert {"01", "2A", "2B", "95", "971", "974"} <= set(DEPARTEMENTS_DVF)
+    assert not {"20", "57", "67", "68", "976"} & set(DEPARTEMENTS_DVF)
@@ -0,0 +1,120 @@
+"""Tests du runner DAG du pipeline (checkpoints en memoire)."""
+
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from src.pipeline import Step, build_etl_steps, fingerprint, run_dag, topological_order
+
+
+class MemoryCheckpoints:
+    """Equivalent en memoire de staging.ingestion_log."""
+
+    def __init__(self):
+        self.rows = []
+
+    def last_success_hash(self, step):
+        for row in reversed(self.rows):
+            if row["step"] == step and row["status"] == "success":
+                return row["input_hash"]
+        return None
+
+    def succeeded_steps(self, run_id):
+        return {r["step"] for r in self.rows if r["run_id"] == run_id and r["status"] in ("success", "skipped")}
+
+    def start(self, run_id, step, input_hash):
+        self.rows.append({"run_id": run_id, "step": step, "status": "running", "input_hash": input_hash})
+        return len(self.rows) - 1
+
+    def finish(self, log_id, status, row_count=None, notes=None, input_hash=None):
+        self.rows[log_id]["status"] = status
+        if input_hash is not None:
+            self.rows[log_id]["input_hash"] = input_hash
+
+
+def _steps(state, calls, fail=()):
+    """load modifie core ; mart depend de core."""
+    def load():
+        calls.append("load")
+        if "load" in fail:
+            raise RuntimeError("echec load")
+        state["core"] = state["files"]
+
+    def mart():
+        calls.append("mart")
+        if "mart" in fail:
+            raise RuntimeError("echec mart")
+
+    return [
+        Step("mart", mart, inputs=lambda: state["core"], depends_on=("load",)),
+        Step("download", lambda: calls.append("download")),
+        Step("load", load, inputs=lambda: [state["files"], state["core"]], depends_on=("download",)),
+    ]
+
+
+class TestRunDag:
+
+    def test_order_follows_dependencies(self):
+        steps = _steps({"files": 1, "core": 0}, [])
+        assert [s.name for s in topological_order(steps)] == ["download", "load", "mart"]
+
+    def test_cycle_rejected(self):
+        steps = [Step("a", lambda: None, depends_on=("b",)), Step("b", lambda: None, depends_on=("a",))]
+        with pytest.raises(ValueError):
+            topological_order(steps)
+
+    def test_unchanged_inputs_skipped(self):
+        state, calls, cp = {"files": "v1", "core": None}, [], MemoryCheckpoints()
+        run_dag(_steps(state, calls), "run1", cp)
+        assert calls == ["download", "load", "mart"]
+
+        # Deuxieme run sans nouvelles donnees : seul download (sans entrees) s'execute
+        calls.clear()
+        outcomes = run_dag(_steps(state, calls), "run2", cp)
+        assert calls == ["download"]
+        assert [o.status for o in outcomes] == ["success", "skipped", "skipped"]
+
+    def test_changed_inputs_rerun(self):
+        state, calls, cp = {"files": "v1", "core": None}, [], MemoryCheckpoints()
+        run_dag(_steps(state, calls), "run1", cp)
+
+        state["files"] = "v2"
+        calls.clear()
+        run_dag(_steps(state, calls), "run2", cp)
+        assert calls == ["download", "load", "mart"]
+
+    def test_resume_from_failed_step(self):
+        state, calls, cp = {"files": "v1", "core": None}, [], MemoryCheckpoints()
+        with pytest.raises(RuntimeError):
+            run_dag(_steps(state, calls, fail=("mart",)), "run1", cp)
+        assert cp.rows[-1]["status"] == "failed"
+
+        calls.clear()
+        run_dag(_steps(state, calls), "run1", cp, resume=True)
+        assert calls == ["mart"]
+
+    def test_force_runs_everything(self):
+        state, calls, cp = {"files": "v1", "core": None}, [], MemoryCheckpoints()
+        run_dag(_steps(state, calls), "run1", cp)
+        calls.clear()
+        run_dag(_steps(state, calls), "run2", cp, force=True)
+        assert calls == ["download", "load", "mart"]
+
+
+def test_fingerprint_stable():
+    assert fingerprint({"b": [1, 2], "a": "x"}) == fingerprint({"a": "x", "b": [1, 2]})
+    assert fingerprint([["75", 2024, 10]]) != fingerprint([["75", 2024, 11]])
+
+
+@patch("src.pipeline.get_engine")
+def test_step_inputs_do_not_scan_core(mock_engine):
+    """Les entrees des etapes se lisent dans les tables de suivi, pas dans core."""
+    conn = mock_engine.return_value.connect.return_value.__enter__.return_value
+    conn.execute.return_value.scalar.return_value = "staging.ingestion_files"
+    conn.execute.return_value.fetchall.return_value = [("75", 2024, "abc", 1200, "2024-06-01")]
+    for step in build_etl_steps(years=[2024], departements=["75"]):
+        if step.inputs:
+            fingerprint(step.inputs())
+    statements = [str(c.args[0]) for c in conn.execute.call_args_list]
+    assert any("staging.ingestion_files" in s for s in statements)
+    assert not any("core.transactions" in s for s in statements)
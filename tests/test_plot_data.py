@@ -0,0 +1,63 @@
+"""Tests de la preparation vectorisee des comparables (carte / nuage de points)."""
+
+import numpy as np
+import pandas as pd
+
+from src.app.utils.formatting import format_distance
+from src.app.utils.plot_data import (
+    ZONE_COLORS,
+    comparables_geojson,
+    downsample,
+    format_distances,
+    hover_texts,
+    marker_colors,
+)
+
+
+class TestDownsample:
+
+    def test_small_frame_unchanged(self, sample_comparables):
+        assert downsample(sample_comparables, 100) is sample_comparables
+
+    def test_keeps_distance_spread(self, sample_comparables):
+        df = sample_comparables.sort_values("distance_m")
+        sampled = downsample(df, 10)
+        assert len(sampled) == 10
+        assert sampled.iloc[0]["id_mutation"] == df.iloc[0]["id_mutation"]
+        assert sampled.iloc[-1]["id_mutation"] == df.iloc[-1]["id_mutation"]
+        assert set(sampled["zone"]) == {1, 2, 3}
+
+
+class TestHoverTexts:
+
+    def test_distances_match_scalar_format(self):
+        values = pd.Series([850.0, 1234.0, None])
+        expected = [format_distance(850.0), format_distance(1234.0), "N/A"]
+        assert format_distances(values).tolist() == expected
+
+    def test_hover_content(self, sample_comparables):
+        texts = hover_texts(sample_comparables)
+        row = sample_comparables.iloc[0]
+        assert len(texts) == len(sample_comparables)
+        assert texts.iloc[0].startswith(f"<b>{row['nom_commune']}</b><br>{row['adresse']}<br>Zone 1")
+        assert f"{row['prix_m2']:,.0f} EUR" in texts.iloc[0]
+
+
+class TestGeoJson:
+
+    def test_zone_colors(self, sample_comparables):
+        colors = marker_colors(sample_comparables, 4500, by_zone=True)
+        assert colors[0] == ZONE_COLORS[1]
+        assert colors[-1] == ZONE_COLORS[3]
+
+    def test_unlocated_rows_skipped(self, sample_comparables):
+        df = sample_comparables.copy()
+        df.loc[df.index[0], "latitude"] = np.nan
+        colors = marker_colors(df, 4500, by_zone=False)
+
+        geojson = comparables_geojson(df, colors)
+
+        assert len(geojson["features"]) == len(df) - 1
+        feature = geojson["features"][0]
+        assert feature["geometry"]["coordinates"] == [df.iloc[1]["longitude"], df.iloc[1]["latitude"]]
+        assert set(feature["properties"]) == {"color", "popup"}
@@ -0,0 +1,88 @@
+"""Tests du pre-filtrage des lots DVF avant staging (sans base PostgreSQL)."""
+
+import csv
+import gzip
+from unittest.mock import patch
+
+import pytest
+
+from src.ingestion.load_csv import ETALAB_COLUMNS_MAP, load_single_csv
+from src.ingestion.prefilter import prefilter_csv
+
+COLUMNS = list(ETALAB_COLUMNS_MAP)
+
+# (id_mutation, nature_mutation, valeur_fonciere, code_type_local, surface_reelle_bati)
+LOTS = [
+    ("m1", "Vente", "250000.0", "2", "45"),       # mono-bien appartement : garde
+    ("m2", "Vente", "400000", "1", "120"),        # maison + dependance : garde
+    ("m2", "Vente", "400000", "3", ""),
+    ("m3", "Vente", "500000", "2", "40"),         # deux appartements : exclue
+    ("m3", "Vente", "500000", "2", "35"),
+    ("m4", "Vente", "300000", "2", "60"),         # appartement + lot de 5 m2 : garde
+    ("m4", "Vente", "300000", "2", "5"),
+    ("m5", "Echange", "200000", "2", "50"),       # pas une vente
+    ("m6", "Vente", "99.99", "2", "30"),          # valeur < 100
+    ("m7", "Vente", "150000", "4", "200"),        # local commercial
+    ("m8", "Vente", "", "2", "30"),               # valeur manquante
+    ("m9", "Vente", "180000", "2", "8.996"),      # 9.00 apres arrondi NUMERIC(10,2)
+]
+
+
+def _write_csv(path, lots, drop=()):
+    columns = [c for c in COLUMNS if c not in drop]
+    opener = gzip.open if path.suffix == ".gz" else open
+    with opener(path, "wt", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=columns + ["autre_colonne"])
+        writer.writeheader()
+        for id_mutation, nature, valeur, code_type, surface in lots:
+            row = {c: "" for c in columns}
+            row.update({
+                "id_mutation": id_mutation, "nature_mutation": nature, "valeur_fonciere": valeur,
+                "code_type_local": code_type, "surface_reelle_bati": surface,
+                "date_mutation": "2024-03-01", "code_departement": "75", "autre_colonne": "x",
+            })
+            writer.writerow({k: v for k, v in row.items() if k in columns or k == "autre_colonne"})
+
+
+class TestPrefilter:
+
+    def test_same_rules_as_transform(self, tmp_path):
+        path = tmp_path / "75.csv.gz"
+        _write_csv(path, LOTS)
+        kept, stats = prefilter_csv(path, COLUMNS, chunk_rows=3)
+        assert sorted(kept["id_mutation"]) == ["m1", "m2", "m4", "m9"]
+        assert list(kept.columns) == COLUMNS
+        assert (stats.rows_read, stats.residential_lots, stats.rows_kept) == (len(LOTS), 6, 4)
+
+    def test_multi_lot_mutation_across_chunks(self, tmp_path):
+        path = tmp_path / "75.csv"
+        _write_csv(path, [LOTS[3], LOTS[0], LOTS[4]])
+        kept, _ = prefilter_csv(path, COLUMNS, chunk_rows=1)
+        assert list(kept["id_mutation"]) == ["m1"]
+
+    def test_missing_column(self, tmp_path):
+        path = tmp_path / "75.csv"
+        _write_csv(path, LOTS[:1], drop=("lot2_surface_carrez",))
+        kept, _ = prefilter_csv(path, COLUMNS)
+        assert kept["lot2_surface_carrez"].tolist() == [""]
+
+    def test_empty_file(self, tmp_path):
+        path = tmp_path / "75.csv"
+        _write_csv(path, [])
+        kept, stats = prefilter_csv(path, COLUMNS)
+        assert len(kept) == 0 and stats.kept_ratio == 0.0
+
+
+class TestLoadPrefiltered:
+
+    @pytest.mark.parametrize("prefilter, expected", [(False, len(LOTS)), (True, 4)])
+    def test_records_sent_to_staging(self, tmp_path, prefilter, expected):
+        path = tmp_path / "75.csv.gz"
+        _write_csv(path, LOTS)
+        sent = []
+        with patch("src.ingestion.load_csv._insert_staging", side_effect=lambda records: len(sent.extend(records) or sent)):
+            assert load_single_csv(path, 2024, prefilter=prefilter) == expected
+        assert len(sent) == expected
+        assert set(sent[0]) == set(ETALAB_COLUMNS_MAP.values()) | {"annee_fichier"}
+        assert sent[0]["annee_fichier"] == 2024
+        assert sent[0]["adresse_numero"] is None  # "" -> NULL comme sans pre-filtre
@@ -1,7 +1,10 @@
 """Tests des fonctions utilitaires de qualite et formatage."""
 
+import pandas as pd
 import pytest
 
+from src.transform.quality import _split_queries, build_report
+from src.config import SQL_DIR
 from src.app.utils.formatting import (
     format_price,
     format_price_m2,
@@ -61,3 +64,54 @@ class TestConfidenceColor:
 
     def test_unknown(self):
         assert confidence_color("unknown") == "#8B949E"
+
+
+class TestQualityReport:
+    """Decoupage du resultat GROUPING SETS en rapports par controle."""
+
+    QUANTILES = [1000.0, 2000.0, 3000.0, 4000.0, 5000.0, 6000.0, 7000.0]
+
+    def _metrics(self):
+        cols = ["grp", "code_departement", "type_bien", "annee", "total", "total_hors_outliers",
+                "null_surface", "nb_outliers", "geolocalisees", "communes", "departements", "quantiles"]
+        rows = [
+            (1, "75", "appartement", None, 100, 90, 2, 10, 85, 20, 1, self.QUANTILES),
+            (1, "92", "maison", None, 50, 50, 0, 0, 50, 30, 1, self.QUANTILES),
+            (1, "93", "maison", None, 4, 0, 1, 4, 0, 1, 0, None),
+            (4, None, "appartement", 2024.0, 100, 90, 2, 10, 85, 20, 1, self.QUANTILES),
+            (4, None, "maison", 2023.0, 54, 50, 1, 4, 50, 31, 2, self.QUANTILES),
+            (7, None, None, None, 154, 140, 3, 14, 135, 51, 2, self.QUANTILES),
+        ]
+        return pd.DataFrame(rows, columns=cols)
+
+    def test_same_checks_as_before(self):
+        report = build_report(self._metrics(), staging_count=0)
+        assert list(report) == [
+            "comptages", "surfaces_nulles", "distribution_prix",
+            "transactions_annee", "couverture_geo", "taux_outliers",
+        ]
+
+    def test_values(self):
+        report = build_report(self._metrics(), staging_count=12)
+
+        assert report["comptages"]["row_count"].tolist() == [12, 154, 140]
+        assert report["surfaces_nulles"].iloc[0]["code_departement"] == "93"
+        assert report["surfaces_nulles"].iloc[0]["pct_null"] == 25.0
+
+        distribution = report["distribution_prix"]
+        assert distribution["code_departement"].tolist() == ["75", "92"]  # 93 : que des outliers
+        assert distribution.iloc[0]["p50"] == 4000.0
+
+        annees = report["transactions_annee"]
+        assert annees["annee"].tolist() == [2023, 2024]
+
+        couverture = report["couverture_geo"].iloc[0]
+        assert couverture["pct_geolocalisees"] == pytest.approx(96.4)
+
+        assert report["taux_outliers"].iloc[0]["pct_outliers"] == 100.0
+
+    def test_sql_file_has_two_queries(self):
+        queries = _split_queries((SQL_DIR / "quality" / "quality_checks.sql").read_text(encoding="utf-8"))
+        assert len(queries) == 2
+        assert "GROUPING SETS" in queries[1]
+        assert "/*sample*/" in queries[1]
@@ -0,0 +1,62 @@
+"""Tests des requetes parametrees du chemin d'estimation."""
+
+import re
+
+import pytest
+
+from src.estimation.queries import (
+    ESTIMATION_QUERIES,
+    FALLBACK_LEVELS,
+    SURFACE_ANY,
+    surface_band,
+)
+
+
+class TestPreparedSql:
+    """Conversion des parametres nommes en PREPARE / EXECUTE."""
+
+    @pytest.mark.parametrize("query", ESTIMATION_QUERIES, ids=lambda q: q.name)
+    def test_all_params_declared(self, query):
+        """Chaque :param du SQL est declare (et type) dans params."""
+        used = set(re.findall(r"(?<![:\w]):(\w+)", query.sql))
+        assert used == set(query.param_names)
+
+    @pytest.mark.parametrize("query", ESTIMATION_QUERIES, ids=lambda q: q.name)
+    def test_prepare_sql_positional(self, query):
+        """PREPARE n'utilise que des $n et conserve les casts ::geography."""
+        sql = query.prepare_sql()
+        assert sql.startswith(f"PREPARE {query.name} (")
+        assert not re.search(r"(?<![:\w]):(\w+)", sql)
+        positions = {int(n) for n in re.findall(r"\$(\d+)", sql)}
+        assert positions == set(range(1, len(query.params) + 1))
+        if "::geography" in query.sql:
+            assert "::geography" in sql
+
+    def test_execute_sql_order(self):
+        """EXECUTE passe les parametres dans l'ordre du PREPARE."""
+        query = FALLBACK_LEVELS[0]["query"]
+        assert query.execute_sql() == (
+            "EXECUTE stta_comparables_commune_24m(:lon, :lat, :type_bien, "
+            ":code_commune, :surface_min, :surface_max, :max_comp)"
+        )
+
+
+class TestFallbackDistance:
+
+    @pytest.mark.parametrize("lvl", FALLBACK_LEVELS, ids=lambda l: l["query"].name)
+    def test_distance_after_limit(self, lvl):
+        """La distance est calculee hors de la sous-requete limitee."""
+        sql = lvl["query"].sql
+        inner = sql[sql.index("FROM ("):sql.index(") t")]
+        assert "LIMIT :max_comp" in inner
+        assert "ST_Distance" not in inner
+        assert "ST_Distance" in sql
+
+
+class TestSurfaceBand:
+
+    def test_band(self):
+        assert surface_band(60) == (30.0, 120.0)
+
+    def test_no_surface(self):
+        assert surface_band(None) == SURFACE_ANY